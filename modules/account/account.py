@@ -7,7 +7,7 @@ from decimal import Decimal
 from itertools import groupby, zip_longest
 
 from dateutil.relativedelta import relativedelta
-from sql import Column, Literal, Null, Window
+from sql import Column, Literal, Null, Union, Window
 from sql.aggregate import Count, Sum
 from sql.conditionals import Case, Coalesce
 
@@ -23,7 +23,8 @@ from trytond.pyson import Bool, Eval, Id, If, PYSONEncoder
 from trytond.report import Report
 from trytond.tools import (
     is_full_text, lstrip_wildcard, pair, sql_pairing, sqlite_apply_types)
-from trytond.transaction import Transaction, check_access, inactive_records
+from trytond.transaction import (
+    Transaction, check_access, inactive_records, without_check_access)
 from trytond.wizard import (
     Button, StateAction, StateTransition, StateView, Wizard)
 
@@ -1011,19 +1012,24 @@ class Account(
         pool = Pool()
         MoveLine = pool.get('account.move.line')
         FiscalYear = pool.get('account.fiscalyear')
+        Snapshot = pool.get('account.account.snapshot')
         transaction = Transaction()
         cursor = transaction.connection.cursor()
         context = transaction.context
 
         table_a = cls.__table__()
         table_c = cls.__table__()
-        line = MoveLine.__table__()
         balances = defaultdict(Decimal)
         for company, c_accounts in groupby(accounts, key=lambda a: a.company):
             c_accounts = list(c_accounts)
             ids = [a.id for a in c_accounts]
             with transaction.set_context(company=company.id):
-                line_query, fiscalyear_ids = MoveLine.query_get(line)
+                if Snapshot.usable():
+                    line, fiscalyear_ids = Snapshot.query_get()
+                    line_query = Literal(True)
+                else:
+                    line = MoveLine.__table__()
+                    line_query, fiscalyear_ids = MoveLine.query_get(line)
             red_sql = fields.SQL_OPERATORS['in'](table_a.id, ids)
             if context.get('flat_balance'):
                 query = (table_a
@@ -1067,6 +1073,7 @@ class Account(
         pool = Pool()
         MoveLine = pool.get('account.move.line')
         FiscalYear = pool.get('account.fiscalyear')
+        Snapshot = pool.get('account.account.snapshot')
         transaction = Transaction()
         cursor = transaction.connection.cursor()
 
@@ -1079,18 +1086,24 @@ class Account(
             result[name] = defaultdict(col_type)
 
         table = cls.__table__()
-        line = MoveLine.__table__()
 
         for company, c_accounts in groupby(accounts, key=lambda a: a.company):
             c_accounts = list(c_accounts)
             ids = [a.id for a in c_accounts]
             with transaction.set_context(company=company.id):
-                line_query, fiscalyear_ids = MoveLine.query_get(line)
+                if Snapshot.usable():
+                    line, fiscalyear_ids = Snapshot.query_get()
+                    line_query = Literal(True)
+                    line_count = Coalesce(Sum(line.line_count), 0)
+                else:
+                    line = MoveLine.__table__()
+                    line_query, fiscalyear_ids = MoveLine.query_get(line)
+                    line_count = Count()
             columns = [table.id]
             types = [None]
             for name in names:
                 if name == 'line_count':
-                    columns.append(Count())
+                    columns.append(line_count)
                     types.append(None)
                 else:
                     columns.append(
@@ -1535,13 +1548,13 @@ class AccountParty(ActivePeriodMixin, ModelSQL):
         Account = pool.get('account.account')
         MoveLine = pool.get('account.move.line')
         FiscalYear = pool.get('account.fiscalyear')
+        Snapshot = pool.get('account.account.snapshot')
         transaction = Transaction()
         cursor = transaction.connection.cursor()
         context = transaction.context
 
         table_a = Account.__table__()
         table_c = Account.__table__()
-        line = MoveLine.__table__()
         balances = defaultdict(Decimal)
 
         for company, c_records in groupby(records, lambda r: r.company):
@@ -1549,7 +1562,12 @@ class AccountParty(ActivePeriodMixin, ModelSQL):
             account_ids = {a.account.id for a in c_records}
             party_ids = {a.party.id for a in c_records}
             with transaction.set_context(company=company.id):
-                line_query, fiscalyear_ids = MoveLine.query_get(line)
+                if Snapshot.usable():
+                    line, fiscalyear_ids = Snapshot.query_get()
+                    line_query = Literal(True)
+                else:
+                    line = MoveLine.__table__()
+                    line_query, fiscalyear_ids = MoveLine.query_get(line)
             account_sql = fields.SQL_OPERATORS['in'](table_a.id, account_ids)
             party_sql = fields.SQL_OPERATORS['in'](line.party, party_ids)
             if context.get('flat_balance'):
@@ -1594,6 +1612,7 @@ class AccountParty(ActivePeriodMixin, ModelSQL):
         Account = pool.get('account.account')
         MoveLine = pool.get('account.move.line')
         FiscalYear = pool.get('account.fiscalyear')
+        Snapshot = pool.get('account.account.snapshot')
         transaction = Transaction()
         cursor = transaction.connection.cursor()
 
@@ -1606,16 +1625,6 @@ class AccountParty(ActivePeriodMixin, ModelSQL):
             result[name] = defaultdict(column_type)
 
         table = Account.__table__()
-        line = MoveLine.__table__()
-        columns = [line.party, table.id]
-        types = [None, None]
-        for name in names:
-            if name == 'line_count':
-                columns.append(Count().as_(name))
-                types.append(None)
-            else:
-                columns.append(Sum(Coalesce(Column(line, name), 0)).as_(name))
-                types.append('NUMERIC')
 
         for company, c_records in groupby(records, key=lambda r: r.company):
             c_records = list(c_records)
@@ -1623,7 +1632,24 @@ class AccountParty(ActivePeriodMixin, ModelSQL):
             party_ids = {a.party.id for a in c_records}
 
             with transaction.set_context(company=company.id):
-                line_query, fiscalyear_ids = MoveLine.query_get(line)
+                if Snapshot.usable():
+                    line, fiscalyear_ids = Snapshot.query_get()
+                    line_query = Literal(True)
+                    line_count = Coalesce(Sum(line.line_count), 0)
+                else:
+                    line = MoveLine.__table__()
+                    line_query, fiscalyear_ids = MoveLine.query_get(line)
+                    line_count = Count()
+            columns = [line.party, table.id]
+            types = [None, None]
+            for name in names:
+                if name == 'line_count':
+                    columns.append(line_count.as_(name))
+                    types.append(None)
+                else:
+                    columns.append(
+                        Sum(Coalesce(Column(line, name), 0)).as_(name))
+                    types.append('NUMERIC')
 
             account_sql = fields.SQL_OPERATORS['in'](table.id, account_ids)
             party_sql = fields.SQL_OPERATORS['in'](line.party, party_ids)
@@ -1816,6 +1842,254 @@ class AccountDeferral(ModelSQL, ModelView):
         raise AccessError(gettext('account.msg_write_deferral'))
 
 
+class AccountSnapshot(ModelSQL):
+    "Used to store the amounts of the posted moves by account and period"
+    __name__ = 'account.account.snapshot'
+    account = fields.Many2One(
+        'account.account', "Account",
+        required=True, readonly=True, ondelete='CASCADE')
+    period = fields.Many2One(
+        'account.period', "Period",
+        required=True, readonly=True, ondelete='CASCADE')
+    party = fields.Many2One(
+        'party.party', "Party", readonly=True, ondelete='CASCADE')
+    debit = fields.Numeric("Debit", readonly=True)
+    credit = fields.Numeric("Credit", readonly=True)
+    amount_second_currency = fields.Numeric(
+        "Amount Second Currency", readonly=True)
+    line_count = fields.Integer("Line Count", readonly=True)
+
+    @classmethod
+    def __setup__(cls):
+        super().__setup__()
+        t = cls.__table__()
+        cls._sql_indexes.add(
+            Index(
+                t,
+                (t.period, Index.Range()),
+                (t.account, Index.Range()),
+                (t.party, Index.Range()),
+                include=[
+                    t.debit, t.credit, t.amount_second_currency,
+                    t.line_count]))
+
+    @classmethod
+    def enabled(cls):
+        "Test if the snapshots are maintained"
+        pool = Pool()
+        Configuration = pool.get('account.configuration')
+        return bool(Configuration(1).balance_snapshot)
+
+    @classmethod
+    def usable(cls):
+        """Test if the snapshots can be used to compute amounts of the context
+
+        Modules filtering the lines of MoveLine.query_get on other context keys
+        must override it as the snapshots contain all the posted lines."""
+        return cls.enabled() and not Transaction().context.get('journal')
+
+    @classmethod
+    def query_get(cls):
+        """Return the query of the amounts of the move lines per account and
+        party and the fiscal years depending of the context
+
+        The amounts of the posted moves in the periods entirely covered by the
+        context are taken from the snapshots and the others from the lines.
+        """
+        pool = Pool()
+        MoveLine = pool.get('account.move.line')
+        Move = pool.get('account.move')
+        Period = pool.get('account.period')
+        context = Transaction().context
+        table = cls.__table__()
+        line = MoveLine.__table__()
+        move = Move.__table__()
+        period = Period.__table__()
+        move_period = Period.__table__()
+
+        line_query, fiscalyear_ids = MoveLine.query_get(line)
+
+        date = context.get('date')
+        from_date, to_date = context.get('from_date'), context.get('to_date')
+        fiscalyear_id = context.get('fiscalyear')
+        period_ids = context.get('periods')
+
+        def covered(period):
+            if date:
+                return (period.fiscalyear.in_(fiscalyear_ids or [None])
+                    & (period.end_date <= date))
+            elif (fiscalyear_id or period_ids is not None
+                    or from_date or to_date):
+                where = Literal(True)
+                if fiscalyear_id:
+                    where &= period.fiscalyear == fiscalyear_id
+                if period_ids is not None:
+                    where &= period.id.in_(period_ids or [None])
+                if from_date:
+                    where &= period.start_date >= from_date
+                if to_date:
+                    where &= period.end_date <= to_date
+                return where
+            else:
+                return period.fiscalyear.in_(fiscalyear_ids or [None])
+
+        not_snapshot = (move
+            .join(move_period, condition=move.period == move_period.id)
+            .select(
+                move.id,
+                where=(move.state != 'posted') | ~covered(move_period)))
+        query = Union(
+            table.join(period, condition=table.period == period.id).select(
+                table.account.as_('account'),
+                table.party.as_('party'),
+                table.debit.as_('debit'),
+                table.credit.as_('credit'),
+                table.amount_second_currency.as_('amount_second_currency'),
+                table.line_count.as_('line_count'),
+                where=covered(period)),
+            line.select(
+                line.account,
+                line.party,
+                line.debit,
+                line.credit,
+                line.amount_second_currency,
+                Literal(1),
+                where=line_query & line.move.in_(not_snapshot)),
+            all_=True)
+        return query, fiscalyear_ids
+
+    @classmethod
+    def _amounts_query(cls, where):
+        "Return the query of the amounts of the posted lines matching where"
+        pool = Pool()
+        MoveLine = pool.get('account.move.line')
+        Move = pool.get('account.move')
+        line = MoveLine.__table__()
+        move = Move.__table__()
+
+        query = (line
+            .join(move, condition=line.move == move.id)
+            .select(
+                line.account.as_('account'),
+                move.period.as_('period'),
+                line.party.as_('party'),
+                Sum(Coalesce(line.debit, 0)).as_('debit'),
+                Sum(Coalesce(line.credit, 0)).as_('credit'),
+                Sum(Coalesce(line.amount_second_currency, 0)).as_(
+                    'amount_second_currency'),
+                Count().as_('line_count'),
+                where=where(line, move) & (move.state == 'posted'),
+                group_by=[line.account, move.period, line.party],
+                order_by=[line.account, move.period, line.party]))
+        if backend.name == 'sqlite':
+            sqlite_apply_types(
+                query, [None, None, None, 'NUMERIC', 'NUMERIC', 'NUMERIC',
+                    None])
+        return query
+
+    @classmethod
+    @without_check_access
+    def add_moves(cls, moves):
+        "Add the amounts of the lines of the posted moves to the snapshots"
+        transaction = Transaction()
+        cursor = transaction.connection.cursor()
+        table = cls.__table__()
+
+        if not moves or not cls.enabled():
+            return
+
+        def where(line, move):
+            return fields.SQL_OPERATORS['in'](move.id, [m.id for m in moves])
+        cursor.execute(*cls._amounts_query(where))
+        amounts = {
+            (account, period, party): values
+            for account, period, party, *values in cursor}
+
+        def update(keys):
+            missing = []
+            for key in keys:
+                account, period, party = key
+                debit, credit, amount_second_currency, line_count = (
+                    amounts[key])
+                snapshot = cls.__table__()
+                # Rows may have been merged by a party replacement
+                cursor.execute(*table.update(
+                        [table.debit, table.credit,
+                            table.amount_second_currency, table.line_count],
+                        [table.debit + debit, table.credit + credit,
+                            table.amount_second_currency
+                            + amount_second_currency,
+                            table.line_count + line_count],
+                        where=table.id.in_(snapshot.select(
+                                snapshot.id,
+                                where=(snapshot.account == account)
+                                & (snapshot.period == period)
+                                & (snapshot.party == party),
+                                limit=1))))
+                if not cursor.rowcount:
+                    missing.append(key)
+            return missing
+
+        # The increment is atomic so only the creation of the rows needs to be
+        # serialized and the rows are updated in the same order
+        if missing := update(list(amounts)):
+            cls.lock()
+            if missing := update(missing):
+                cls.create([{
+                            'account': account,
+                            'period': period,
+                            'party': party,
+                            'debit': amounts[account, period, party][0],
+                            'credit': amounts[account, period, party][1],
+                            'amount_second_currency': amounts[
+                                account, period, party][2],
+                            'line_count': amounts[account, period, party][3],
+                            } for account, period, party in missing])
+
+    @classmethod
+    @without_check_access
+    def rebuild(cls, periods=None):
+        "Rebuild the snapshots of the periods from the posted moves"
+        cursor = Transaction().connection.cursor()
+        table = cls.__table__()
+
+        cls.lock()
+        if periods is not None:
+            period_ids = [p.id for p in periods]
+            cursor.execute(*table.delete(
+                    where=fields.SQL_OPERATORS['in'](
+                        table.period, period_ids)))
+
+            def where(line, move):
+                return fields.SQL_OPERATORS['in'](move.period, period_ids)
+        else:
+            cursor.execute(*table.delete())
+
+            def where(line, move):
+                return Literal(True)
+        cursor.execute(*cls._amounts_query(where))
+        cls.create([{
+                    'account': account,
+                    'period': period,
+                    'party': party,
+                    'debit': debit,
+                    'credit': credit,
+                    'amount_second_currency': amount_second_currency,
+                    'line_count': line_count,
+                    } for (account, period, party, debit, credit,
+                    amount_second_currency, line_count) in cursor])
+
+    @classmethod
+    @without_check_access
+    def clear(cls):
+        "Remove all the snapshots"
+        cursor = Transaction().connection.cursor()
+        table = cls.__table__()
+
+        cls.lock()
+        cursor.execute(*table.delete())
+
+
 class AccountTax(ModelSQL):
     __name__ = 'account.account-account.tax'
     account = fields.Many2One(
@@ -77,6 +77,10 @@ class Configuration(
                 ('company', '=', Eval('context', {}).get('company', -1)),
                 ('second_currency', '=', None),
                 ]))
+    balance_snapshot = fields.Boolean(
+        "Balance Snapshot",
+        help="Check to maintain the amounts of the posted moves per period "
+        "to speed up the computation of the account balances.")
 
     @classmethod
     def multivalue_model(cls, field):
@@ -108,6 +112,23 @@ class Configuration(
         return cls.multivalue_model(
             'currency_exchange_journal').default_currency_exchange_journal()
 
+    @classmethod
+    def default_balance_snapshot(cls):
+        return False
+
+    @classmethod
+    def on_modification(cls, mode, configurations, field_names=None):
+        pool = Pool()
+        Snapshot = pool.get('account.account.snapshot')
+        super().on_modification(mode, configurations, field_names=field_names)
+        if mode == 'create' or (
+                mode == 'write' and 'balance_snapshot' in field_names):
+            for configuration in configurations:
+                if configuration.balance_snapshot:
+                    Snapshot.rebuild()
+                elif mode == 'write':
+                    Snapshot.clear()
+
 
 class ConfigurationDefaultAccount(ModelSQL, CompanyValueMixin):
     __name__ = 'account.configuration.default_account'
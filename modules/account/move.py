@@ -1,5 +1,6 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
+import logging
 from collections import defaultdict
 from decimal import Decimal
 from itertools import chain, groupby, islice
@@ -21,7 +22,7 @@ from trytond.pool import Pool
 from trytond.pyson import Bool, Eval, If, PYSONEncoder
 from trytond.report import Report
 from trytond.rpc import RPC
-from trytond.tools import firstline, sqlite_apply_types
+from trytond.tools import firstline, grouped_slice, sqlite_apply_types
 from trytond.transaction import Transaction, check_access
 from trytond.wizard import (
     Button, StateAction, StateTransition, StateView, Wizard)
@@ -32,6 +33,8 @@ from .exceptions import (
     PostError, ReconciliationDeleteWarning, ReconciliationError,
     RescheduleLineError)
 
+logger = logging.getLogger(__name__)
+
 _MOVE_STATES = {
     'readonly': Eval('state') == 'posted',
     }
@@ -448,11 +451,13 @@ class Move(DescriptionOriginMixin, ModelSQL, ModelView):
         pool = Pool()
         Date = pool.get('ir.date')
         Line = pool.get('account.move.line')
+        Snapshot = pool.get('account.account.snapshot')
         move = cls.__table__()
         line = Line.__table__()
         cursor = Transaction().connection.cursor()
 
         to_reconcile = []
+        to_snapshot = [m for m in moves if m.state != 'posted']
 
         for company, c_moves in groupby(moves, lambda m: m.company):
             with Transaction().set_context(company=company.id):
@@ -517,6 +522,7 @@ class Move(DescriptionOriginMixin, ModelSQL, ModelView):
                     move.number = number
 
         cls.save(moves)
+        Snapshot.add_moves(to_snapshot)
 
         def keyfunc(line):
             # Set party last to avoid compare party instance and None
@@ -1851,36 +1857,58 @@ class Line(DescriptionOriginMixin, MoveLineMixin, ModelSQL, ModelView):
 
         with Transaction().set_context(_record_cache_size=max(len(lines), 1)):
             lines = cls.browse(sorted(lines, key=cls._reconciliation_sort_key))
-        debit, credit = [], []
+        return cls._find_best_reconciliation(
+            [(l, get_balance(l)) for l in lines], amount=amount)
+
+    @classmethod
+    def _find_best_reconciliation(cls, balances, amount=0):
+        """Return the list of keys to reconcile for the amount with the
+        smallest remaining from the (key, balance) sorted by reconciliation
+        order"""
+        keys, debit, credit = [], [], []
         remaining = -amount
-        for line in list(lines):
-            balance = get_balance(line)
+        for key, balance in balances:
             if balance > 0:
-                debit.append(line)
+                debit.append((key, balance))
             elif balance < 0:
-                credit.append(line)
+                credit.append((key, balance))
             else:
-                lines.remove(line)
+                continue
+            keys.append(key)
             remaining += balance
 
-        best_lines, best_remaining = list(lines), remaining
+        removed = []
+        best_removed, best_remaining = 0, remaining
         if remaining:
-            while lines:
+            while len(removed) < len(keys):
                 try:
-                    line = (debit if remaining > 0 else credit).pop()
+                    key, balance = (debit if remaining > 0 else credit).pop()
                 except IndexError:
                     break
-                lines.remove(line)
-                remaining -= get_balance(line)
-                if lines and abs(remaining) < abs(best_remaining):
-                    best_lines, best_remaining = list(lines), remaining
+                removed.append(key)
+                remaining -= balance
+                if (len(removed) < len(keys)
+                        and abs(remaining) < abs(best_remaining)):
+                    best_removed, best_remaining = len(removed), remaining
                     if not remaining:
                         break
-        return best_lines, best_remaining
+        removed = set(removed[:best_removed])
+        return [k for k in keys if k not in removed], best_remaining
 
     def _reconciliation_sort_key(self):
+        """Return the key to sort the lines in reconciliation order
+
+        The automatic reconciliation sorts the lines in SQL using
+        _reconciliation_order so both must be overridden together."""
         return self.maturity_date or self.date
 
+    @classmethod
+    def _reconciliation_order(cls, line, move):
+        """Return the SQL order of the lines in reconciliation order
+
+        It must follow the same order as _reconciliation_sort_key."""
+        return [Coalesce(line.maturity_date, move.date).asc, line.id.asc]
+
     @classmethod
     def reconcile_automatic(cls):
         pool = Pool()
@@ -1890,26 +1918,27 @@ class Line(DescriptionOriginMixin, MoveLineMixin, ModelSQL, ModelView):
 
         company_id = context.get('company')
 
-        def lines_to_reconcile(account, party, currency):
-            lines, _ = cls.find_best_reconciliation(
-                Reconcile.to_reconcile(account, party, currency),
-                currency)
-            return lines
-
         accounts = Reconcile.accounts_to_reconcile(company=company_id)
-        for account in accounts:
-            if account.party_required:
-                parties = Reconcile.parties_to_reconcile(account)
-            else:
-                parties = [None]
-            for party in parties:
-                currencies = Reconcile.currencies_to_reconcile(
-                    account, party)
-                for currency in currencies:
-                    while lines := lines_to_reconcile(
-                            account, party, currency):
-                        Line.reconcile(lines)
-                        transaction.commit()
+        for i, account in enumerate(accounts, 1):
+            to_reconcile = []
+            candidates = Reconcile.candidates_to_reconcile(account)
+            for balances in candidates.values():
+                while balances:
+                    ids, remaining = cls._find_best_reconciliation(balances)
+                    if not ids or remaining:
+                        break
+                    to_reconcile.append(ids)
+                    ids = set(ids)
+                    balances = [b for b in balances if b[0] not in ids]
+            for lines_list in grouped_slice(
+                    to_reconcile, backend.MAX_QUERY_PARAMS // 10):
+                cls.reconcile(*map(cls.browse, lines_list))
+                transaction.commit()
+            logger.info(
+                "Reconciled %s groups of %s candidates "
+                "on account %s (%s/%s)",
+                len(to_reconcile), len(candidates), account.id,
+                i, len(accounts))
 
 
 class LineReceivablePayableContext(ModelView):
@@ -2306,6 +2335,51 @@ class Reconcile(Wizard):
         cursor.execute(*query)
         return Currency.browse([p for p, in cursor])
 
+    @classmethod
+    def candidates_to_reconcile(cls, account, _balanced=False):
+        """Return the (line id, balance) to reconcile of the account
+        sorted by reconciliation order and grouped by party and currency"""
+        pool = Pool()
+        Line = pool.get('account.move.line')
+        Move = pool.get('account.move')
+        line = Line.__table__()
+        move = Move.__table__()
+        transaction = Transaction()
+        cursor = transaction.connection.cursor()
+
+        balance = Case(
+            (line.second_currency != Null, line.amount_second_currency),
+            else_=line.debit - line.credit)
+        query = (line
+            .join(move, condition=line.move == move.id)
+            .select(
+                line.id.as_('id'),
+                line.party.as_('party'),
+                Coalesce(line.second_currency, account.currency.id).as_(
+                    'currency'),
+                balance.as_('balance'),
+                where=((line.reconciliation == Null)
+                    & (line.state == 'valid')
+                    & (line.account == int(account))),
+                order_by=Line._reconciliation_order(line, move)))
+        if backend.name == 'sqlite':
+            sqlite_apply_types(query, [None, None, None, 'NUMERIC'])
+        cursor.execute(*query)
+        candidates = defaultdict(list)
+        for id_, party, currency, balance in cursor:
+            candidates[party, currency].append((id_, balance))
+
+        def to_reconcile(balances):
+            total = sum(b for _, b in balances)
+            if _balanced:
+                return total == 0
+            return ((any(b > 0 for _, b in balances)
+                    and any(b < 0 for _, b in balances))
+                or (account.type.receivable and total < 0)
+                or (account.type.payable and total > 0))
+        return {
+            k: b for k, b in candidates.items() if to_reconcile(b)}
+
     @classmethod
     def to_reconcile(cls, account, party, currency):
         pool = Pool()
@@ -80,16 +80,20 @@ class Party(CompanyMultiValueMixin, metaclass=PoolMeta):
             'currency.currency', "Currency"), 'get_currency')
     receivable = fields.Function(Monetary(
             "Receivable", currency='currency', digits='currency'),
-        'get_receivable_payable', searcher='search_receivable_payable')
+        'get_receivable_payable', searcher='search_receivable_payable',
+        parallel=True)
     payable = fields.Function(Monetary(
             "Payable", currency='currency', digits='currency'),
-        'get_receivable_payable', searcher='search_receivable_payable')
+        'get_receivable_payable', searcher='search_receivable_payable',
+        parallel=True)
     receivable_today = fields.Function(Monetary(
             "Receivable Today", currency='currency', digits='currency'),
-        'get_receivable_payable', searcher='search_receivable_payable')
+        'get_receivable_payable', searcher='search_receivable_payable',
+        parallel=True)
     payable_today = fields.Function(Monetary(
             "Payable Today", currency='currency', digits='currency'),
-        'get_receivable_payable', searcher='search_receivable_payable')
+        'get_receivable_payable', searcher='search_receivable_payable',
+        parallel=True)
 
     @classmethod
     def multivalue_model(cls, field):
@@ -355,6 +359,7 @@ class PartyReplace(metaclass=PoolMeta):
     def fields_to_replace(cls):
         return super().fields_to_replace() + [
             ('account.move.line', 'party'),
+            ('account.account.snapshot', 'party'),
             ]
 
 
@@ -386,6 +386,7 @@ class Period(Workflow, ModelSQL, ModelView):
         JournalPeriod = pool.get('account.journal.period')
         Move = pool.get('account.move')
         Account = pool.get('account.account')
+        Snapshot = pool.get('account.account.snapshot')
         transaction = Transaction()
 
         # Lock period and move to be sure no new record will be created
@@ -423,6 +424,10 @@ class Period(Workflow, ModelSQL, ModelView):
             ])
         JournalPeriod.close(journal_periods)
 
+        # Compact the snapshots of the periods which can not change anymore
+        if Snapshot.enabled():
+            Snapshot.rebuild(periods)
+
     @classmethod
     @ModelView.button
     @Workflow.transition('open')
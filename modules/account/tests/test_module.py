@@ -360,7 +360,7 @@ class AccountTestCase(
                 period.save()
 
     @with_transaction()
-    def test_account_debit_credit(self):
+    def test_account_debit_credit(self, balance_snapshot=False):
         'Test account debit/credit'
         pool = Pool()
         Party = pool.get('party.party')
@@ -368,6 +368,12 @@ class AccountTestCase(
         Journal = pool.get('account.journal')
         Account = pool.get('account.account')
         Move = pool.get('account.move')
+        Configuration = pool.get('account.configuration')
+
+        if balance_snapshot:
+            Configuration.write([Configuration(1)], {
+                    'balance_snapshot': True,
+                    })
 
         party = Party(name='Party')
         party.save()
@@ -569,6 +575,148 @@ class AccountTestCase(
                 self.assertEqual(
                     cash_cur.amount_second_currency, Decimal(50))
 
+    def test_account_debit_credit_balance_snapshot(self):
+        "Test account debit/credit with balance snapshot"
+        self.test_account_debit_credit(balance_snapshot=True)
+
+    @with_transaction()
+    def test_account_snapshot(self):
+        "Test account snapshot"
+        pool = Pool()
+        Party = pool.get('party.party')
+        FiscalYear = pool.get('account.fiscalyear')
+        Journal = pool.get('account.journal')
+        Account = pool.get('account.account')
+        AccountParty = pool.get('account.account.party')
+        Move = pool.get('account.move')
+        Period = pool.get('account.period')
+        Configuration = pool.get('account.configuration')
+        Snapshot = pool.get('account.account.snapshot')
+
+        party = Party(name="Party")
+        party.save()
+
+        company = create_company()
+        with set_company(company):
+            fiscalyear = get_fiscalyear(company)
+            fiscalyear.save()
+            FiscalYear.create_period([fiscalyear])
+            period1, period2 = fiscalyear.periods[:2]
+            create_chart(company)
+
+            journal, = Journal.search([
+                    ('code', '=', 'REV'),
+                    ])
+            revenue, = Account.search([
+                    ('type.revenue', '=', True),
+                    ('closed', '=', False),
+                    ], limit=1)
+            receivable, = Account.search([
+                    ('type.receivable', '=', True),
+                    ('closed', '=', False),
+                    ], limit=1)
+
+            def create_move(period, date, amount):
+                move, = Move.create([{
+                            'period': period.id,
+                            'journal': journal.id,
+                            'date': date,
+                            'lines': [('create', [{
+                                            'account': revenue.id,
+                                            'credit': amount,
+                                            }, {
+                                            'account': receivable.id,
+                                            'debit': amount,
+                                            'party': party.id,
+                                            }])],
+                            }])
+                return move
+
+            moves = [
+                create_move(period1, period1.start_date, Decimal(10)),
+                create_move(period1, period1.end_date, Decimal(20)),
+                create_move(period2, period2.start_date, Decimal(40)),
+                ]
+            Move.post(moves[:1])
+
+            Configuration.write([Configuration(1)], {
+                    'balance_snapshot': True,
+                    })
+            snapshot, = Snapshot.search([('account', '=', receivable.id)])
+            self.assertEqual(
+                (snapshot.period, snapshot.party, snapshot.debit,
+                    snapshot.line_count),
+                (period1, party, Decimal(10), 1))
+
+            Move.post(moves[1:2])
+            snapshot, = Snapshot.search([('account', '=', receivable.id)])
+            self.assertEqual(
+                (snapshot.debit, snapshot.line_count), (Decimal(30), 2))
+
+            account_party, = AccountParty.search([
+                    ('account', '=', receivable.id),
+                    ('party', '=', party.id),
+                    ])
+            for context, posted_balance, balance, line_count in [
+                    ({}, Decimal(30), Decimal(70), 3),
+                    ({'fiscalyear': fiscalyear.id},
+                        Decimal(30), Decimal(70), 3),
+                    ({'periods': [period1.id]}, Decimal(30), Decimal(30), 2),
+                    ({'periods': [period2.id]}, Decimal(0), Decimal(40), 1),
+                    ({'date': period1.end_date - datetime.timedelta(days=1)},
+                        Decimal(10), Decimal(10), 1),
+                    ({'date': period2.start_date},
+                        Decimal(30), Decimal(70), 3),
+                    ({'from_date': period1.end_date,
+                        'to_date': period2.end_date},
+                        Decimal(20), Decimal(60), 2),
+                    ({'journal': journal.id}, Decimal(30), Decimal(70), 3),
+                    ]:
+                for posted, value in [
+                        (True, posted_balance), (False, balance)]:
+                    with self.subTest(context=context, posted=posted), \
+                            Transaction().set_context(
+                                context, posted=posted):
+                        account = Account(receivable.id)
+                        self.assertEqual(account.balance, value)
+                        self.assertEqual(account.debit, value)
+                        self.assertEqual(
+                            Account(revenue.id).balance, -value)
+                        record = AccountParty(account_party.id)
+                        self.assertEqual(record.balance, value)
+                        self.assertEqual(record.debit, value)
+                        if not posted:
+                            self.assertEqual(account.line_count, line_count)
+                            self.assertEqual(
+                                record.line_count, line_count)
+
+            Move.post(moves[2:])
+            Period.close([period1, period2])
+            self.assertEqual(
+                sorted((s.period, s.debit, s.line_count)
+                    for s in Snapshot.search([
+                            ('account', '=', receivable.id),
+                            ])),
+                [(period1, Decimal(30), 2), (period2, Decimal(40), 1)])
+
+            # The balances are read from the snapshots
+            snapshot, = Snapshot.search([
+                    ('account', '=', receivable.id),
+                    ('period', '=', period2.id),
+                    ])
+            Snapshot.write([snapshot], {'debit': Decimal(50)})
+            with Transaction().set_context(fiscalyear=fiscalyear.id):
+                self.assertEqual(
+                    Account(receivable.id).balance, Decimal(80))
+            with Transaction().set_context(journal=journal.id):
+                self.assertEqual(
+                    Account(receivable.id).balance, Decimal(70))
+
+            Configuration.write([Configuration(1)], {
+                    'balance_snapshot': False,
+                    })
+            self.assertEqual(Snapshot.search([]), [])
+
     @with_transaction()
     def test_account_type_amount(self):
         "Test account type amount"
@@ -838,6 +986,58 @@ class AccountTestCase(
                         Line.find_best_reconciliation(lines, currency, amount),
                         (best, remaining))
 
+    @with_transaction()
+    def test_candidates_to_reconcile_order(self):
+        "Test candidates to reconcile follow the reconciliation sort key"
+        pool = Pool()
+        Account = pool.get('account.account')
+        FiscalYear = pool.get('account.fiscalyear')
+        Journal = pool.get('account.journal')
+        Line = pool.get('account.move.line')
+        Move = pool.get('account.move')
+        Party = pool.get('party.party')
+        Reconcile = pool.get('account.reconcile', type='wizard')
+
+        party = Party(name='Party')
+        party.save()
+
+        company = create_company()
+        with set_company(company):
+            create_chart(company)
+            fiscalyear = get_fiscalyear(company)
+            fiscalyear.save()
+            FiscalYear.create_period([fiscalyear])
+            period = fiscalyear.periods[0]
+            journal_revenue, = Journal.search([
+                    ('code', '=', 'REV'),
+                    ])
+            receivable, = Account.search([
+                    ('type.receivable', '=', True),
+                    ('closed', '=', False),
+                    ], limit=1)
+
+            move = Move(
+                period=period, journal=journal_revenue,
+                date=period.start_date)
+            move.lines = [
+                Line(
+                    party=party, account=receivable,
+                    debit=debit, credit=credit, maturity_date=maturity_date)
+                for debit, credit, maturity_date in [
+                    (Decimal(10), 0, datetime.date(2024, 1, 3)),
+                    (0, Decimal(4), None),
+                    (0, Decimal(6), datetime.date(2024, 1, 1)),
+                    ]]
+            move.save()
+            lines = move.lines
+
+            candidates = Reconcile.candidates_to_reconcile(receivable)
+
+            self.assertEqual(
+                [i for i, _ in candidates[party.id, company.currency.id]],
+                [l.id for l in sorted(
+                        lines, key=Line._reconciliation_sort_key)])
+
     @with_transaction()
     def test_find_best_reconciliation_currency(self):
         "Test find best reconciliation with different currencies"
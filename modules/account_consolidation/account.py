@@ -87,6 +87,17 @@ class MoveLine(metaclass=PoolMeta):
         return query, fiscalyear_id
 
 
+class AccountSnapshot(metaclass=PoolMeta):
+    __name__ = 'account.account.snapshot'
+
+    @classmethod
+    def usable(cls):
+        context = Transaction().context
+        # The snapshots do not exclude the consolidated moves
+        return (super().usable()
+            and not (context.get('consolidated') and context.get('companies')))
+
+
 class Invoice(metaclass=PoolMeta):
     __name__ = 'account.invoice'
 
@@ -1,7 +1,11 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
+from unittest.mock import patch
+
 from trytond.modules.company.tests import CompanyTestMixin
-from trytond.tests.test_tryton import ModuleTestCase
+from trytond.pool import Pool
+from trytond.tests.test_tryton import ModuleTestCase, with_transaction
+from trytond.transaction import Transaction
 
 
 class CompanyAcountConsolidationTestMixin(CompanyTestMixin):
@@ -20,5 +24,16 @@ class AccountConsolidationTestCase(
     module = 'account_consolidation'
     extras = ['account_invoice']
 
+    @with_transaction()
+    def test_snapshot_usable_consolidated(self):
+        "Test snapshots are not used for consolidated amounts"
+        pool = Pool()
+        Snapshot = pool.get('account.account.snapshot')
+
+        with patch.object(Snapshot, 'enabled', return_value=True):
+            self.assertTrue(Snapshot.usable())
+            with Transaction().set_context(consolidated=True, companies=[1]):
+                self.assertFalse(Snapshot.usable())
+
 
 del ModuleTestCase
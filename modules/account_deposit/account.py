@@ -53,6 +53,12 @@ class Reconcile(metaclass=PoolMeta):
         return super().currencies_to_reconcile(
             account, party, _balanced=_balanced)
 
+    @classmethod
+    def candidates_to_reconcile(cls, account, _balanced=False):
+        if account.type.deposit:
+            _balanced = True
+        return super().candidates_to_reconcile(account, _balanced=_balanced)
+
 
 class Payment(metaclass=PoolMeta):
     __name__ = 'account.payment'
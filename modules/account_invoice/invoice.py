@@ -318,7 +318,7 @@ class Invoice(
             })
     untaxed_amount = fields.Function(Monetary(
             "Untaxed", currency='currency', digits='currency'),
-        'get_amount', searcher='search_untaxed_amount')
+        'get_amount', searcher='search_untaxed_amount', parallel=True)
     untaxed_amount_cache = fields.Numeric(
         "Untaxed Cache", digits='currency', readonly=True)
     source_tax_amount = Monetary(
@@ -328,7 +328,7 @@ class Invoice(
             })
     tax_amount = fields.Function(Monetary(
             "Tax", currency='currency', digits='currency'),
-        'get_amount', searcher='search_tax_amount')
+        'get_amount', searcher='search_tax_amount', parallel=True)
     tax_amount_cache = fields.Numeric(
         "Tax Cache", digits='currency', readonly=True)
     source_total_amount = Monetary(
@@ -338,7 +338,7 @@ class Invoice(
             })
     total_amount = fields.Function(Monetary(
             "Total", currency='currency', digits='currency'),
-        'get_amount', searcher='search_total_amount')
+        'get_amount', searcher='search_total_amount', parallel=True)
     total_amount_cache = fields.Numeric(
         "Total Cache", digits='currency', readonly=True)
     reconciled = fields.Function(fields.Date('Reconciled',
@@ -387,10 +387,10 @@ class Invoice(
         'get_reconciliation_lines')
     amount_to_pay_today = fields.Function(Monetary(
             "Amount to Pay Today", currency='currency', digits='currency'),
-        'get_amount_to_pay')
+        'get_amount_to_pay', parallel=True)
     amount_to_pay = fields.Function(Monetary(
             "Amount to Pay", currency='currency', digits='currency'),
-        'get_amount_to_pay')
+        'get_amount_to_pay', parallel=True)
     invoice_report_revisions = fields.One2Many(
         'account.invoice.report.revision', 'invoice',
         "Invoice Report Revisions", readonly=True,
@@ -122,6 +122,10 @@ class Configuration(
                 ],
             help="Leave it empty to prevent periods "
             "from being closed automatically."))
+    quantity_ledger = fields.Boolean(
+        "Quantity Ledger",
+        help="Check to maintain the quantity of the done moves per location "
+        "to speed up the computation of the stock quantities.")
 
     @classmethod
     def multivalue_model(cls, field):
@@ -146,6 +150,23 @@ class Configuration(
     default_shipment_internal_transit = default_func(
         'shipment_internal_transit')
 
+    @classmethod
+    def default_quantity_ledger(cls):
+        return False
+
+    @classmethod
+    def on_modification(cls, mode, configurations, field_names=None):
+        pool = Pool()
+        Ledger = pool.get('stock.quantity.ledger')
+        super().on_modification(mode, configurations, field_names=field_names)
+        if mode == 'create' or (
+                mode == 'write' and 'quantity_ledger' in field_names):
+            for configuration in configurations:
+                if configuration.quantity_ledger:
+                    Ledger.rebuild()
+                elif mode == 'write':
+                    Ledger.clear()
+
 
 class ConfigurationSequence(ModelSQL, CompanyValueMixin):
     __name__ = 'stock.configuration.sequence'
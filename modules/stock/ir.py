@@ -1,7 +1,6 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 
-from itertools import groupby
 from operator import attrgetter
 
 from trytond.pool import Pool, PoolMeta
@@ -28,12 +27,15 @@ class Cron(metaclass=PoolMeta):
                 ('ir.cron|stock_shipment_assign_try', "Assign Shipments"),
                 ('stock.period|auto_create', "Create Stock Periods"),
                 ('stock.period|auto_close', "Close Stock Periods"),
+                ('stock.quantity.ledger|verify',
+                    "Verify Stock Quantity Ledger"),
                 ])
         cls.methods_company_needed.update({
                 'product.product|recompute_cost_price_from_moves',
                 'ir.cron|stock_shipment_assign_try',
                 'stock.period|auto_create',
                 'stock.period|auto_close',
+                'stock.quantity.ledger|verify',
                 })
 
     @classmethod
@@ -60,6 +62,4 @@ class Cron(metaclass=PoolMeta):
                 records.extend(kls.to_assign())
 
         records.sort(key=attrgetter('assign_order_key'))
-
-        for kls, records in groupby(records, key=attrgetter('__class__')):
-            kls.assign_try(list(records))
+        ShipmentAssignMixin.assign_try_wave(records)
@@ -0,0 +1,241 @@
+# This file is part of Tryton.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+import logging
+import math
+from collections import defaultdict
+
+from sql import For, Union, Values
+from sql.aggregate import Sum
+
+from trytond import backend
+from trytond.model import Index, ModelSQL, Unique, fields
+from trytond.pool import Pool
+from trytond.pyson import Eval
+from trytond.tools import grouped_slice
+from trytond.transaction import Transaction, without_check_access
+
+logger = logging.getLogger(__name__)
+
+
+class QuantityLedger(ModelSQL):
+    "It is used to store the quantity of done moves per location"
+    __name__ = 'stock.quantity.ledger'
+    company = fields.Many2One(
+        'company.company', "Company",
+        required=True, readonly=True, ondelete='CASCADE')
+    location = fields.Many2One(
+        'stock.location', "Location",
+        required=True, readonly=True, ondelete='CASCADE')
+    product = fields.Many2One(
+        'product.product', "Product",
+        required=True, readonly=True, ondelete='CASCADE',
+        context={
+            'company': Eval('company', -1),
+            },
+        depends={'company'})
+    internal_quantity = fields.Float("Internal Quantity", readonly=True)
+
+    @classmethod
+    def __setup__(cls):
+        super().__setup__()
+        t = cls.__table__()
+        cls._sql_constraints += [
+            ('company_location_product_unique',
+                Unique(t, t.company, t.location, t.product),
+                'stock.msg_quantity_ledger_unique'),
+            ]
+        cls._sql_indexes.add(
+            Index(
+                t,
+                (t.location, Index.Range()),
+                (t.product, Index.Range()),
+                (t.company, Index.Range()),
+                include=[t.internal_quantity]))
+
+    @classmethod
+    def usable(cls, grouping):
+        "Test if the ledger can be used to compute quantities of the grouping"
+        pool = Pool()
+        Configuration = pool.get('stock.configuration')
+        return bool(
+            all(g == 'product' or g.startswith('product.') for g in grouping)
+            and Configuration(1).quantity_ledger)
+
+    @classmethod
+    def _quantities_query(cls, companies=None):
+        "Return the query of the quantity of done moves per location"
+        pool = Pool()
+        Move = pool.get('stock.move')
+        move = Move.__table__()
+
+        where = move.state == 'done'
+        if companies is not None:
+            where &= move.company.in_([c.id for c in companies])
+        query = Union(
+            move.select(
+                move.company.as_('company'),
+                move.to_location.as_('location'),
+                move.product.as_('product'),
+                move.internal_quantity.as_('quantity'),
+                where=where),
+            move.select(
+                move.company.as_('company'),
+                move.from_location.as_('location'),
+                move.product.as_('product'),
+                (-move.internal_quantity).as_('quantity'),
+                where=where),
+            all_=True)
+        return query.select(
+            query.company, query.location, query.product,
+            Sum(query.quantity),
+            group_by=[query.company, query.location, query.product])
+
+    @classmethod
+    @without_check_access
+    def add_moves(cls, moves, sign=1):
+        """Add the quantities of the moves to the ledger
+        (or remove them if sign is -1)"""
+        pool = Pool()
+        Configuration = pool.get('stock.configuration')
+        transaction = Transaction()
+        database = transaction.database
+        cursor = transaction.connection.cursor()
+        table = cls.__table__()
+
+        if not Configuration(1).quantity_ledger:
+            return
+
+        deltas = defaultdict(float)
+        for move in moves:
+            quantity = sign * (move.internal_quantity or 0)
+            if not quantity:
+                continue
+            company, product = move.company.id, move.product.id
+            deltas[company, move.to_location.id, product] += quantity
+            deltas[company, move.from_location.id, product] -= quantity
+
+        def update(keys):
+            missing = set(keys)
+            for sub_keys in grouped_slice(keys, backend.MAX_QUERY_PARAMS // 4):
+                values = Values([[*k, deltas[k]] for k in sub_keys])
+                where = ((table.company == values.column1)
+                    & (table.location == values.column2)
+                    & (table.product == values.column3))
+                if database.has_select_for():
+                    # Lock the rows in a consistent order to prevent
+                    # deadlocks between concurrent updates
+                    query = table.join(values, condition=where).select(
+                        table.id,
+                        order_by=[
+                            table.company, table.location, table.product])
+                    query.for_ = For('UPDATE', table)
+                    cursor.execute(*query)
+                query = table.update(
+                    [table.internal_quantity],
+                    [table.internal_quantity + values.column4],
+                    from_=[values], where=where)
+                if database.has_returning():
+                    query.returning = [
+                        table.company, table.location, table.product]
+                    cursor.execute(*query)
+                else:
+                    cursor.execute(*query)
+                    cursor.execute(*table.join(values, condition=where).select(
+                            table.company, table.location, table.product))
+                missing.difference_update(map(tuple, cursor))
+            return sorted(missing)
+
+        # The increment is atomic so only the creation of the rows needs to be
+        # serialized
+        if missing := update(sorted(deltas)):
+            cls.lock()
+            if missing := update(missing):
+                cls.create([{
+                            'company': company,
+                            'location': location,
+                            'product': product,
+                            'internal_quantity': deltas[
+                                company, location, product],
+                            } for company, location, product in missing])
+
+    @classmethod
+    @without_check_access
+    def clear(cls, companies=None):
+        "Remove the quantities of the ledger"
+        cursor = Transaction().connection.cursor()
+        table = cls.__table__()
+
+        cls.lock()
+        where = None
+        if companies is not None:
+            where = table.company.in_([c.id for c in companies])
+        cursor.execute(*table.delete(where=where))
+
+    @classmethod
+    @without_check_access
+    def rebuild(cls, companies=None):
+        "Rebuild the ledger from the done moves"
+        cursor = Transaction().connection.cursor()
+
+        cls.clear(companies)
+        cursor.execute(*cls._quantities_query(companies))
+        to_create = []
+        for company, location, product, quantity in cursor:
+            if quantity:
+                to_create.append({
+                        'company': company,
+                        'location': location,
+                        'product': product,
+                        'internal_quantity': quantity,
+                        })
+        if to_create:
+            cls.create(to_create)
+
+    @classmethod
+    @without_check_access
+    def inconsistencies(cls, companies=None):
+        """Return the (company, location, product) keys for which the ledger
+        does not match the done moves"""
+        cursor = Transaction().connection.cursor()
+        table = cls.__table__()
+
+        cursor.execute(*cls._quantities_query(companies))
+        expected = {
+            (company, location, product): quantity
+            for company, location, product, quantity in cursor}
+
+        where = None
+        if companies is not None:
+            where = table.company.in_([c.id for c in companies])
+        cursor.execute(*table.select(
+                table.company, table.location, table.product,
+                table.internal_quantity,
+                where=where))
+        ledger = {
+            (company, location, product): quantity
+            for company, location, product, quantity in cursor}
+
+        keys = []
+        for key in expected.keys() | ledger.keys():
+            if not math.isclose(
+                    expected.get(key) or 0, ledger.get(key) or 0,
+                    abs_tol=1e-9):
+                keys.append(key)
+        return sorted(keys)
+
+    @classmethod
+    def verify(cls):
+        "Rebuild the ledger of the company if it is not consistent"
+        pool = Pool()
+        Company = pool.get('company.company')
+        Configuration = pool.get('stock.configuration')
+
+        company = Transaction().context.get('company')
+        if company is None or not Configuration(1).quantity_ledger:
+            return
+        companies = [Company(company)]
+        if keys := cls.inconsistencies(companies):
+            logger.warning(
+                "Rebuild quantity ledger of company %s "
+                "with %s inconsistencies", company, len(keys))
+            cls.rebuild(companies)
@@ -4,8 +4,10 @@ import copy
 import datetime
 import operator
 from collections import defaultdict
+from contextlib import contextmanager
 from decimal import Decimal
 from itertools import groupby
+from weakref import WeakKeyDictionary
 
 from sql import Column, For, Literal, Null, Table, Union
 from sql.aggregate import Max, Sum
@@ -191,6 +193,7 @@ class StockMixin(object):
 class Move(Workflow, ModelSQL, ModelView):
     __name__ = 'stock.move'
     _order_name = 'product'
+    _assign_try_waves = WeakKeyDictionary()
     product = fields.Many2One(
         'product.product', "Product", required=True, states=STATES,
         context={
@@ -860,6 +863,7 @@ class Move(Workflow, ModelSQL, ModelView):
         Product = pool.get('product.product')
         Date = pool.get('ir.date')
         Warning = pool.get('res.user.warning')
+        Ledger = pool.get('stock.quantity.ledger')
         today_cache = {}
 
         def in_future(move):
@@ -924,6 +928,7 @@ class Move(Workflow, ModelSQL, ModelView):
                     cls.save(to_save)
                 if cost_values:
                     set_cost_values(cost_values)
+        Ledger.add_moves(moves)
 
         future_moves = sorted(filter(in_future, moves))
         if future_moves:
@@ -1005,7 +1010,9 @@ class Move(Workflow, ModelSQL, ModelView):
     @ModelView.button
     @Workflow.transition('cancelled')
     def cancel(cls, moves):
-        pass
+        pool = Pool()
+        Ledger = pool.get('stock.quantity.ledger')
+        Ledger.add_moves([m for m in moves if m.state == 'done'], sign=-1)
 
     @classmethod
     def copy(cls, moves, default=None):
@@ -1150,9 +1157,7 @@ class Move(Workflow, ModelSQL, ModelView):
         Return True if succeed or False if not.
         '''
         pool = Pool()
-        Product = pool.get('product.product')
         Uom = pool.get('product.uom')
-        Date = pool.get('ir.date')
         Location = pool.get('stock.location')
 
         moves = [m for m in moves if m.state in {'draft', 'staging'}]
@@ -1168,27 +1173,11 @@ class Move(Workflow, ModelSQL, ModelView):
             locations = list(set((m.from_location for m in moves)))
         location_ids = [l.id for l in locations]
         product_ids = list(set((m.product.id for m in moves)))
-        stock_date_end = Date.today()
 
         if pblc is None:
-            pblc = {}
-            companies = {m.company for m in moves}
-            for company in companies:
-                with Transaction().set_context(company=company.id):
-                    stock_date_end = Date.today()
-
-                cls._assign_try_lock(
-                    product_ids, location_ids, [company.id],
-                    stock_date_end, grouping)
-
-                with Transaction().set_context(
-                        stock_date_end=stock_date_end,
-                        stock_assign=True,
-                        company=company.id):
-                    pblc[company.id] = Product.products_by_location(
-                        location_ids,
-                        grouping=grouping,
-                        grouping_filter=(product_ids,))
+            pblc = cls._assign_try_quantities(
+                {m.company for m in moves}, location_ids, product_ids,
+                grouping)
 
         def get_key(move, location_id):
             key = [location_id]
@@ -1224,6 +1213,18 @@ class Move(Workflow, ModelSQL, ModelView):
                 default[name] = get_value(name)
             return default
 
+        # Index the keys of the quantities by their first grouping value to
+        # not scan all of them for each move
+        indexes = {}
+
+        def get_index(company_id):
+            if (index := indexes.get(company_id)) is None:
+                index = indexes[company_id] = defaultdict(list)
+                for key in pblc[company_id]:
+                    if len(key) > 1:
+                        index[key[1]].append(key)
+            return index
+
         child_locations = {}
         to_write = []
         to_assign = []
@@ -1235,6 +1236,11 @@ class Move(Workflow, ModelSQL, ModelView):
                     success = False
                 continue
             pbl = pblc[move.company.id]
+            value = get_key(move, None)[1]
+            if value is not None:
+                keys = get_index(move.company.id).get(value, [])
+            else:
+                keys = list(pbl)
             # Keep location order for pick_product
             if with_childs:
                 childs = child_locations.get(move.from_location)
@@ -1259,7 +1265,8 @@ class Move(Workflow, ModelSQL, ModelView):
                 # from_location may be a view
                 pass
             location_qties = []
-            for key, qty in pbl.items():
+            for key in keys:
+                qty = pbl[key]
                 move_key = get_key(move, key[0])
                 if match(key, move_key):
                     qty = Uom.compute_qty(
@@ -1298,6 +1305,8 @@ class Move(Workflow, ModelSQL, ModelView):
                 qty_default_uom = Uom.compute_qty(
                     move.unit, qty, move.product.default_uom, round=False)
 
+                if key not in pbl and len(key) > 1:
+                    get_index(move.company.id)[key[1]].append(key)
                 pbl[key] = pbl.get(key, 0.0) - qty_default_uom
 
         with Transaction().set_context(_stock_move_split=True):
@@ -1317,8 +1326,103 @@ class Move(Workflow, ModelSQL, ModelView):
             cls.write(*to_write)
         if to_assign:
             cls.assign(to_assign)
+        cls._assign_try_wave_invalidate(
+            {m.company for m in moves}, product_ids, pblc)
         return success
 
+    @classmethod
+    @contextmanager
+    def assign_try_wave(cls):
+        """Share the quantities computed by assign_try between all the calls
+        made inside the context"""
+        transaction = Transaction()
+        if transaction in cls._assign_try_waves:
+            yield
+            return
+        cls._assign_try_waves[transaction] = {}
+        try:
+            yield
+        finally:
+            cls._assign_try_waves.pop(transaction, None)
+
+    @classmethod
+    def _assign_try_quantities(
+            cls, companies, location_ids, product_ids, grouping):
+        """Return the quantities by location by company to assign
+        and lock them"""
+        pool = Pool()
+        Date = pool.get('ir.date')
+        Product = pool.get('product.product')
+
+        wave = cls._assign_try_waves.get(Transaction())
+        if wave is not None and grouping[:1] == ('product',):
+            # The quantities per location do not depend on with_childs so they
+            # are computed only for the locations and products not yet covered
+            pblc, covered = wave.setdefault(grouping, ({}, {}))
+        else:
+            pblc, covered = {}, None
+
+        for company in companies:
+            pbl = pblc.setdefault(company.id, {})
+            if covered is not None:
+                company_covered = covered.setdefault(
+                    company.id, defaultdict(set))
+                missing = {
+                    p: set(location_ids) - company_covered[p]
+                    for p in product_ids}
+                fetch_product_ids = [p for p, l in missing.items() if l]
+                if not fetch_product_ids:
+                    continue
+                fetch_location_ids = list(set().union(*missing.values()))
+            else:
+                fetch_product_ids = product_ids
+                fetch_location_ids = location_ids
+
+            with Transaction().set_context(company=company.id):
+                stock_date_end = Date.today()
+
+            cls._assign_try_lock(
+                fetch_product_ids, fetch_location_ids, [company.id],
+                stock_date_end, grouping)
+
+            with Transaction().set_context(
+                    stock_date_end=stock_date_end,
+                    stock_assign=True,
+                    company=company.id):
+                quantities = Product.products_by_location(
+                    fetch_location_ids,
+                    grouping=grouping,
+                    grouping_filter=(fetch_product_ids,))
+            if covered is not None:
+                # Keep the quantities already reduced by the wave
+                for key, quantity in quantities.items():
+                    if key[0] not in company_covered[key[1]]:
+                        pbl[key] = quantity
+                for product_id in fetch_product_ids:
+                    company_covered[product_id].update(fetch_location_ids)
+            else:
+                pbl.update(quantities)
+        return pblc
+
+    @classmethod
+    def _assign_try_wave_invalidate(cls, companies, product_ids, used):
+        """Forget the quantities of the products in the wave except those used
+        for the assignation"""
+        wave = cls._assign_try_waves.get(Transaction())
+        if not wave:
+            return
+        product_ids = set(product_ids)
+        for pblc, covered in wave.values():
+            if pblc is used:
+                continue
+            for company in companies:
+                if company.id in covered:
+                    for product_id in product_ids:
+                        covered[company.id].pop(product_id, None)
+                if pbl := pblc.get(company.id):
+                    for key in [k for k in pbl if k[1] in product_ids]:
+                        del pbl[key]
+
     @classmethod
     def _assign_try_lock(
             cls, product_ids, location_ids, company_ids, date, grouping):
@@ -1398,6 +1502,7 @@ class Move(Workflow, ModelSQL, ModelView):
         Period = pool.get('stock.period')
         Move = pool.get('stock.move')
         Product = pool.get('product.product')
+        Ledger = pool.get('stock.quantity.ledger')
 
         move = Move.__table__()
         today = Date.today()
@@ -1472,6 +1577,29 @@ class Move(Workflow, ModelSQL, ModelView):
                             if company else Literal(True)))
                     .select(*columns))
 
+        if not context.get('stock_date_end'):
+            context['stock_date_end'] = datetime.date.max
+
+        # The ledger contains the quantities of all done moves so it can only
+        # be used without start date and with an end date not in the past
+        use_ledger = (not context.get('stock_date_start')
+            and not context.get('stock_destinations')
+            and context['stock_date_end'] >= today
+            and Ledger.usable(grouping))
+        if use_ledger:
+            ledger = Ledger.__table__()
+            if use_product:
+                product_ledger = Product.__table__()
+                columns = ['internal_quantity', 'company', 'location']
+                columns += [c for c in grouping if c not in columns]
+                columns = [
+                    get_column_product(c, ledger, product_ledger)
+                    for c in columns]
+                ledger = (ledger
+                    .join(product_ledger,
+                        condition=ledger.product == product_ledger.id)
+                    .select(*columns))
+
         if with_childs:
             # Replace tables with union which replaces flat children locations
             # by their parent location.
@@ -1551,8 +1679,24 @@ class Move(Workflow, ModelSQL, ModelView):
                         where=parent_location.flat_childs == Literal(True)),
                     all_=True)
 
-        if not context.get('stock_date_end'):
-            context['stock_date_end'] = datetime.date.max
+            if use_ledger:
+                location = Location.__table__()
+                parent_location = Location.__table__()
+                columns = ['internal_quantity', 'company'] + list(grouping)
+                columns = [Column(ledger, c).as_(c) for c in columns]
+                ledger = Union(
+                    ledger.select(
+                        ledger.location.as_('location'),
+                        *columns),
+                    ledger.join(location,
+                        condition=ledger.location == location.id
+                        ).join(parent_location, type_='LEFT',
+                        condition=location.parent == parent_location.id
+                        ).select(
+                        parent_location.id.as_('location'),
+                        *columns,
+                        where=parent_location.flat_childs == Literal(True)),
+                    all_=True)
 
         move_date = Coalesce(
             move.effective_date,
@@ -1614,6 +1758,15 @@ class Move(Workflow, ModelSQL, ModelView):
                 state_date_clause_in &= state_date_clause(False)
                 state_date_clause_out &= state_date_clause(
                     context.get('stock_assign'))
+        elif use_ledger:
+            # The done moves are read from the ledger so only those after the
+            # end date must be subtracted
+            def state_date_clause(clause):
+                return (((move.state != 'done') & clause)
+                    | ((move.state == 'done')
+                        & (move_date > context['stock_date_end'])))
+            state_date_clause_in = state_date_clause(state_date_clause_in)
+            state_date_clause_out = state_date_clause(state_date_clause_out)
         elif PeriodCache:
             periods = Period.search([
                     ('date', '<=', context['stock_date_end']),
@@ -1639,7 +1792,7 @@ class Move(Workflow, ModelSQL, ModelView):
 
         if PeriodCache:
             from_period = period_cache
-        where = where_period = Literal(True)
+        where = where_period = where_ledger = Literal(True)
         if grouping_filter and any(grouping_filter):
             for fieldname, grouping_ids in zip(grouping, grouping_filter):
                 if not grouping_ids:
@@ -1647,15 +1800,22 @@ class Move(Workflow, ModelSQL, ModelView):
                 column = get_column(fieldname, move)
                 if PeriodCache:
                     cache_column = Column(period_cache, fieldname)
+                if use_ledger:
+                    ledger_column = Column(ledger, fieldname)
                 if isinstance(grouping_ids[0], (int, float, Decimal)):
                     where &= fields.SQL_OPERATORS['in'](column, grouping_ids)
                     if PeriodCache:
                         where_period &= fields.SQL_OPERATORS['in'](
                             cache_column, grouping_ids)
+                    if use_ledger:
+                        where_ledger &= fields.SQL_OPERATORS['in'](
+                            ledger_column, grouping_ids)
                 else:
                     where &= column.in_(grouping_ids)
                     if PeriodCache:
                         where_period &= cache_column.in_(grouping_ids)
+                    if use_ledger:
+                        where_ledger &= ledger_column.in_(grouping_ids)
 
         if context.get('stock_destinations'):
             destinations = context['stock_destinations']
@@ -1681,8 +1841,13 @@ class Move(Workflow, ModelSQL, ModelView):
             company_clause = Literal(True)
         else:
             company_clause = Literal(False)
+        quantity = move.internal_quantity
+        if use_ledger:
+            # Subtract the done moves which are already in the ledger
+            quantity = Case(
+                (move.state == 'done', -quantity), else_=quantity)
         query = move.select(move.to_location.as_('location'),
-            Sum(move.internal_quantity).as_('quantity'),
+            Sum(quantity).as_('quantity'),
             *move_keys,
             where=state_date_clause_in
             & where
@@ -1691,7 +1856,7 @@ class Move(Workflow, ModelSQL, ModelView):
             & dest_clause_from,
             group_by=[move.to_location.as_('location')] + move_keys)
         query = Union(query, move.select(move.from_location.as_('location'),
-                (-Sum(move.internal_quantity)).as_('quantity'),
+                (-Sum(quantity)).as_('quantity'),
                 *move_keys,
                 where=state_date_clause_out
                 & where
@@ -1712,6 +1877,22 @@ class Move(Workflow, ModelSQL, ModelView):
                     & period_cache.location.in_(location_query)
                     & dest_clause_period),
                 all_=True)
+        if use_ledger:
+            if company:
+                ledger_company_clause = ledger.company == company.id
+            elif not transaction.user:
+                ledger_company_clause = Literal(True)
+            else:
+                ledger_company_clause = Literal(False)
+            ledger_keys = [Column(ledger, key).as_(key) for key in grouping]
+            query = Union(query, ledger.select(
+                    ledger.location.as_('location'),
+                    ledger.internal_quantity.as_('quantity'),
+                    *ledger_keys,
+                    where=where_ledger
+                    & ledger.location.in_(location_query)
+                    & ledger_company_clause),
+                all_=True)
         query_keys = [Column(query, key).as_(key) for key in grouping]
         quantity = Sum(query.quantity)
         if context.get('stock_invert'):
@@ -1756,7 +1937,6 @@ class Move(Workflow, ModelSQL, ModelView):
         id_getter = operator.itemgetter(grouping.index(id_name) + 1)
         ids = set()
         quantities = defaultdict(float)
-        keys = set()
         # We can do a quick loop without propagation if the request is for a
         # single location because all the locations are children and we can sum
         # them directly.
@@ -1774,52 +1954,34 @@ class Move(Workflow, ModelSQL, ModelView):
             quantity = line[-1]
             quantities[(location,) + key] += quantity
             ids.add(id_getter(line))
-            keys.add(key)
 
         # Propagate quantities on from child locations to their parents
         if with_childs and len(location_ids) > 1:
             # Fetch all child locations
             locations = _location_children(location_ids)
-            # Generate a set of locations without childs and a dict
-            # giving the parent of each location.
-            leafs = set([l.id for l in locations])
-            parents = {}
-            for location in locations:
+            # Compute for each location its ancestors among the requested
+            # locations by sweeping the tree in left order
+            requested = set(location_ids)
+            ancestors, stack = {}, []
+            for location in sorted(locations, key=operator.attrgetter('left')):
+                while stack and stack[-1].right < location.left:
+                    stack.pop()
+                if location.id in requested:
+                    stack.append(location)
                 parent = location.parent
-                if not parent or parent.flat_childs:
-                    continue
-                if parent.id in leafs:
-                    leafs.remove(parent.id)
-                # Group children under the common requested grand parent
-                # to skip unnecessary intermediary result
-                while parent:
-                    parents[location.id] = parent.id
-                    if parent.id in location_ids:
-                        break
-                    parent = parent.parent
-            locations = set((l.id for l in locations))
-            while leafs:
-                for leaf in leafs:
-                    locations.remove(leaf)
-                    if leaf not in parents:
-                        continue
-                    parent = parents[leaf]
-                    for key in keys:
-                        quantities[(parent, *key)] += quantities[(leaf, *key)]
-                next_leafs = set(locations)
-                for location in locations:
-                    parent = parents.get(location)
-                    if not parent:
-                        continue
-                    if parent in next_leafs and parent in locations:
-                        next_leafs.remove(parent)
-                leafs = next_leafs
-
-            # clean result
-            for key in list(quantities.keys()):
-                location = key[0]
-                if location not in location_ids:
-                    del quantities[key]
+                if parent and parent.flat_childs:
+                    # The quantities of flat children are already included
+                    # in their parent
+                    ancestors[location.id] = (
+                        [location.id] if location.id in requested else [])
+                else:
+                    ancestors[location.id] = [l.id for l in stack]
+
+            propagated = defaultdict(float)
+            for (location, *key), quantity in quantities.items():
+                for ancestor in ancestors.get(location, []):
+                    propagated[(ancestor, *key)] += quantity
+            quantities = propagated
 
         # Round quantities
         default_uom = dict((p.id, p.default_uom) for p in
@@ -1,17 +1,22 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
+import logging
 from itertools import groupby
 
 from sql import For, Literal
 
+from trytond import backend
 from trytond.i18n import gettext
 from trytond.model import Index, ModelSQL, ModelView, Workflow, fields
 from trytond.pool import Pool
 from trytond.pyson import Eval
+from trytond.tools import grouped_slice
 from trytond.transaction import Transaction, inactive_records
 
 from .exceptions import PeriodCloseError
 
+logger = logging.getLogger(__name__)
+
 
 class Period(Workflow, ModelSQL, ModelView):
     __name__ = 'stock.period'
@@ -146,31 +151,47 @@ class Period(Workflow, ModelSQL, ModelView):
                         period=recent_period.rec_name,
                         moves=names))
 
+        product = Product.__table__()
+        with connection.cursor() as cursor:
+            cursor.execute(*product.select(
+                    product.id, order_by=[product.id.asc]))
+            product_ids = [i for i, in cursor]
+
         for grouping in cls.groupings():
             Cache = cls.get_cache(grouping)
-            to_create = []
+            # Compute the caches by chunk of products to limit the memory
+            if grouping[0] == 'product':
+                grouping_filters = [
+                    (list(sub_ids),)
+                    for sub_ids in grouped_slice(
+                        product_ids, backend.MAX_QUERY_PARAMS)]
+            else:
+                grouping_filters = [None]
             for period in periods:
-                with Transaction().set_context(
-                        stock_date_end=period.date,
-                        stock_date_start=None,
-                        stock_assign=False,
-                        forecast=False,
-                        stock_destinations=None,
-                        ):
-                    pbl = Product.products_by_location(
-                        [l.id for l in locations], grouping=grouping)
-                for key, quantity in pbl.items():
-                    if quantity:
-                        values = {
-                            'location': key[0],
-                            'period': period.id,
-                            'internal_quantity': quantity,
-                            }
-                        for i, field in enumerate(grouping, 1):
-                            values[field] = key[i]
-                        to_create.append(values)
-            if to_create:
-                Cache.create(to_create)
+                for grouping_filter in grouping_filters:
+                    with Transaction().set_context(
+                            stock_date_end=period.date,
+                            stock_date_start=None,
+                            stock_assign=False,
+                            forecast=False,
+                            stock_destinations=None,
+                            ):
+                        pbl = Product.products_by_location(
+                            [l.id for l in locations], grouping=grouping,
+                            grouping_filter=grouping_filter)
+                    to_create = []
+                    for key, quantity in pbl.items():
+                        if quantity:
+                            values = {
+                                'location': key[0],
+                                'period': period.id,
+                                'internal_quantity': quantity,
+                                }
+                            for i, field in enumerate(grouping, 1):
+                                values[field] = key[i]
+                            to_create.append(values)
+                    if to_create:
+                        Cache.create(to_create)
 
     @classmethod
     def auto_create(cls):
@@ -207,6 +228,7 @@ class Period(Workflow, ModelSQL, ModelView):
         pool = Pool()
         Date = pool.get('ir.date')
         Configuration = pool.get('stock.configuration')
+        Move = pool.get('stock.move')
         company = Transaction().context.get('company')
         if company is None:
             return
@@ -220,8 +242,49 @@ class Period(Workflow, ModelSQL, ModelView):
                 ('company', '=', company),
                 ('date', '<', today - delay),
                 ('state', '=', 'draft'),
-                ])
-        cls.close(periods)
+                ], order=[('date', 'ASC')])
+        to_close = []
+        for period in periods:
+            # Stop at the first period with pending moves as the next periods
+            # include them
+            if Move.search([
+                        ('company', '=', company),
+                        ('state', 'in', ['draft', 'assigned']),
+                        ['OR', [
+                                ('effective_date', '=', None),
+                                ('planned_date', '<=', period.date),
+                                ],
+                            ('effective_date', '<=', period.date),
+                            ],
+                        ], limit=1, order=[]):
+                logger.info(
+                    "Period %s of company %s is not closed "
+                    "because it has pending moves", period.id, company)
+                break
+            to_close.append(period)
+        cls.close(to_close)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            last_periods = cls.search([
+                    ('company', '=', company),
+                    ('state', '=', 'closed'),
+                    ], order=[('date', 'DESC')], limit=1)
+            domain = [('company', '=', company)]
+            if last_periods:
+                last_period, = last_periods
+                domain.append(['OR',
+                        ('effective_date', '>', last_period.date),
+                        [
+                            ('effective_date', '=', None),
+                            ['OR',
+                                ('planned_date', '>', last_period.date),
+                                ('planned_date', '=', None),
+                                ],
+                            ],
+                        ])
+            logger.debug(
+                "Stock quantities of company %s are computed from %s moves",
+                company, Move.search_count(domain))
 
 
 class Cache(ModelSQL, ModelView):
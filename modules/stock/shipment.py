@@ -4,6 +4,7 @@ import datetime
 from collections import defaultdict
 from functools import partial
 from itertools import groupby
+from operator import attrgetter
 
 from sql import Null
 from sql.conditionals import Coalesce
@@ -210,6 +211,22 @@ class ShipmentAssignMixin(ShipmentMixin):
     def assign_try(cls, shipments):
         raise NotImplementedError
 
+    @staticmethod
+    def assign_try_wave(records):
+        """Try to assign the records as a single wave
+
+        The records may be of different classes and are assigned in their
+        order by the assign_try of their class.
+        The available quantities are computed once and shared by all the
+        assignations of the wave."""
+        pool = Pool()
+        Move = pool.get('stock.move')
+
+        with Move.assign_try_wave():
+            for kls, records in groupby(
+                    records, key=attrgetter('__class__')):
+                kls.assign_try(list(records))
+
     @dualmethod
     def assign_reset(cls, shipments):
         cls.wait(shipments)
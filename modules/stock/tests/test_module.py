@@ -5,6 +5,7 @@ import datetime
 from collections import defaultdict
 from decimal import Decimal
 from functools import partial
+from unittest.mock import patch
 
 from dateutil.relativedelta import relativedelta
 
@@ -81,7 +82,7 @@ class StockTestCase(
                         internal_quantity)
 
     @with_transaction()
-    def test_products_by_location(self):
+    def test_products_by_location(self, quantity_ledger=False):
         'Test products_by_location'
         pool = Pool()
         Uom = pool.get('product.uom')
@@ -90,8 +91,14 @@ class StockTestCase(
         Location = pool.get('stock.location')
         Move = pool.get('stock.move')
         Period = pool.get('stock.period')
+        Configuration = pool.get('stock.configuration')
         transaction = Transaction()
 
+        if quantity_ledger:
+            Configuration.write([Configuration(1)], {
+                    'quantity_ledger': True,
+                    })
+
         kg, = Uom.search([('name', '=', 'Kilogram')])
         g, = Uom.search([('name', '=', 'Gram')])
         template, = Template.create([{
@@ -387,6 +394,10 @@ class StockTestCase(
                 Period.close([period])
                 test_products_by_location()
 
+    def test_products_by_location_quantity_ledger(self):
+        'Test products_by_location with quantity ledger'
+        self.test_products_by_location(quantity_ledger=True)
+
     @with_transaction()
     def test_products_by_location_with_childs(self):
         'Test products_by_location with_childs and stock_skip_warehouse'
@@ -490,7 +501,74 @@ class StockTestCase(
                     self.assertListEqual([product], found_products)
 
     @with_transaction()
-    def test_products_by_location_flat_childs(self, period_closed=False):
+    def test_products_by_location_with_childs_nested(self):
+        "Test products_by_location with_childs on nested locations"
+        pool = Pool()
+        Uom = pool.get('product.uom')
+        Template = pool.get('product.template')
+        Product = pool.get('product.product')
+        Location = pool.get('stock.location')
+        Move = pool.get('stock.move')
+
+        unit, = Uom.search([('name', '=', 'Unit')])
+        template, = Template.create([{
+                    'name': "Product",
+                    'type': 'goods',
+                    'default_uom': unit.id,
+                    }])
+        product1, product2 = Product.create([{
+                    'template': template.id,
+                    }, {
+                    'template': template.id,
+                    }])
+
+        lost_found, = Location.search([('type', '=', 'lost_found')])
+        warehouse, = Location.search([('type', '=', 'warehouse')])
+        storage, = Location.search([('code', '=', 'STO')])
+        storage1, = Location.create([{
+                    'name': "Storage 1",
+                    'parent': storage.id,
+                    }])
+        storage2, storage3 = Location.create([{
+                    'name': "Storage 1.1",
+                    'parent': storage1.id,
+                    }, {
+                    'name': "Storage 1.2",
+                    'parent': storage1.id,
+                    }])
+
+        company = create_company()
+        with set_company(company):
+            moves = Move.create([{
+                        'product': product.id,
+                        'unit': unit.id,
+                        'quantity': quantity,
+                        'from_location': lost_found.id,
+                        'to_location': location.id,
+                        'company': company.id,
+                        } for product, quantity, location in [
+                        (product1, 1, storage),
+                        (product1, 2, storage1),
+                        (product1, 4, storage2),
+                        (product2, 8, storage3),
+                        ]])
+            Move.do(moves)
+
+            products_by_location = Product.products_by_location(
+                [warehouse.id, storage1.id, storage2.id], with_childs=True)
+
+            self.assertEqual(
+                {k: v for k, v in products_by_location.items() if v}, {
+                    (warehouse.id, product1.id): 7,
+                    (warehouse.id, product2.id): 8,
+                    (storage1.id, product1.id): 6,
+                    (storage1.id, product2.id): 8,
+                    (storage2.id, product1.id): 4,
+                    })
+
+    @with_transaction()
+    def test_products_by_location_flat_childs(
+            self, period_closed=False, quantity_ledger=False):
         "Test products_by_location on flat_childs"
         pool = Pool()
         Uom = pool.get('product.uom')
@@ -500,6 +578,12 @@ class StockTestCase(
         Move = pool.get('stock.move')
         Date = pool.get('ir.date')
         Period = pool.get('stock.period')
+        Configuration = pool.get('stock.configuration')
+
+        if quantity_ledger:
+            Configuration.write([Configuration(1)], {
+                    'quantity_ledger': True,
+                    })
 
         unit, = Uom.search([('name', '=', 'Unit')])
         template, = Template.create([{
@@ -601,6 +685,10 @@ class StockTestCase(
         "Test products_by_location on flat_childs with period closed"
         self.test_products_by_location_flat_childs(period_closed=True)
 
+    def test_products_by_location_flat_childs_quantity_ledger(self):
+        "Test products_by_location on flat_childs with quantity ledger"
+        self.test_products_by_location_flat_childs(quantity_ledger=True)
+
     @with_transaction()
     def test_products_by_location_2nd_level_flat_childs(self):
         "Test products_by_location on 2nd level flat_childs"
@@ -1012,6 +1100,130 @@ class StockTestCase(
                         }])
             self.assertRaises(PeriodCloseError, Period.close, [period])
 
+    @with_transaction()
+    def test_quantity_ledger(self):
+        "Test quantity ledger"
+        pool = Pool()
+        Uom = pool.get('product.uom')
+        Template = pool.get('product.template')
+        Product = pool.get('product.product')
+        Location = pool.get('stock.location')
+        Move = pool.get('stock.move')
+        Configuration = pool.get('stock.configuration')
+        Ledger = pool.get('stock.quantity.ledger')
+
+        unit, = Uom.search([('name', '=', 'Unit')])
+        template, = Template.create([{
+                    'name': "Product",
+                    'type': 'goods',
+                    'default_uom': unit.id,
+                    }])
+        product, = Product.create([{
+                    'template': template.id,
+                    }])
+        lost_found, = Location.search([('type', '=', 'lost_found')])
+        storage, = Location.search([('code', '=', 'STO')])
+
+        company = create_company()
+        with set_company(company):
+            moves = Move.create([{
+                        'product': product.id,
+                        'unit': unit.id,
+                        'quantity': quantity,
+                        'from_location': lost_found.id,
+                        'to_location': storage.id,
+                        'company': company.id,
+                        } for quantity in [1, 2, 4]])
+            Move.do(moves[:1])
+
+            Configuration.write([Configuration(1)], {
+                    'quantity_ledger': True,
+                    })
+            self.assertEqual(
+                {(l.location, l.internal_quantity) for l in Ledger.search([])},
+                {(storage, 1), (lost_found, -1)})
+
+            Move.do(moves[1:])
+            Move.cancel(moves[1:2])
+            self.assertEqual(
+                {(l.location, l.internal_quantity) for l in Ledger.search([])},
+                {(storage, 5), (lost_found, -5)})
+            self.assertEqual(Ledger.inconsistencies(), [])
+
+            ledger, = Ledger.search([('location', '=', storage.id)])
+            Ledger.write([ledger], {'internal_quantity': 0})
+            self.assertEqual(
+                Ledger.inconsistencies(),
+                [(company.id, storage.id, product.id)])
+
+            Ledger.verify()
+            self.assertEqual(Ledger.inconsistencies(), [])
+
+            Configuration.write([Configuration(1)], {
+                    'quantity_ledger': False,
+                    })
+            self.assertEqual(Ledger.search([]), [])
+
+    @with_transaction()
+    def test_period_auto_close_pending_moves(self):
+        "Test period auto close stops at pending moves"
+        pool = Pool()
+        Uom = pool.get('product.uom')
+        Template = pool.get('product.template')
+        Product = pool.get('product.product')
+        Location = pool.get('stock.location')
+        Move = pool.get('stock.move')
+        Period = pool.get('stock.period')
+        Configuration = pool.get('stock.configuration')
+
+        unit, = Uom.search([('name', '=', 'Unit')])
+        template, = Template.create([{
+                    'name': "Product",
+                    'type': 'goods',
+                    'default_uom': unit.id,
+                    }])
+        product, = Product.create([{
+                    'template': template.id,
+                    }])
+        lost_found, = Location.search([('type', '=', 'lost_found')])
+        storage, = Location.search([('code', '=', 'STO')])
+        company = create_company()
+        with set_company(company):
+            today = datetime.date.today()
+            Configuration.write([Configuration(1)], {
+                    'period_closing_delay': datetime.timedelta(),
+                    })
+
+            moves = Move.create([{
+                        'product': product.id,
+                        'unit': unit.id,
+                        'quantity': 1,
+                        'from_location': lost_found.id,
+                        'to_location': storage.id,
+                        'planned_date': today - relativedelta(days=days),
+                        'effective_date': today - relativedelta(days=days),
+                        'company': company.id,
+                        } for days in [5, 3]])
+            Move.do(moves[:1])
+            periods = Period.create([{
+                        'date': today - relativedelta(days=days),
+                        'company': company.id,
+                        } for days in [4, 2, 1]])
+
+            Period.auto_close()
+            self.assertEqual(
+                [p.state for p in periods], ['closed', 'draft', 'draft'])
+            self.assertEqual(
+                {(c.location, c.internal_quantity) for c in periods[0].caches},
+                {(storage, 1), (lost_found, -1)})
+
+            Move.cancel(moves[1:])
+            with patch.object(Move, 'search_count') as search_count:
+                Period.auto_close()
+            self.assertEqual(
+                [p.state for p in periods], ['closed', 'closed', 'closed'])
+            search_count.assert_not_called()
+
     @with_transaction()
     def test_check_origin(self):
         'Test Move check_origin'
@@ -1125,6 +1337,156 @@ class StockTestCase(
                 states[state].sort()
             self.assertEqual(states, result, msg=msg)
 
+    @with_transaction()
+    def test_assign_try_products(self):
+        "Test Move assign_try with many products"
+        pool = Pool()
+        Template = pool.get('product.template')
+        Product = pool.get('product.product')
+        Uom = pool.get('product.uom')
+        Location = pool.get('stock.location')
+        Move = pool.get('stock.move')
+
+        unit, = Uom.search([('name', '=', 'Unit')])
+        template = Template(
+            name="Product", type='goods', default_uom=unit)
+        template.save()
+        product1, product2 = Product.create([
+                {'template': template.id},
+                {'template': template.id},
+                ])
+
+        supplier, = Location.search([('code', '=', 'SUP')])
+        storage, = Location.search([('code', '=', 'STO')])
+        customer, = Location.search([('code', '=', 'CUS')])
+
+        company = create_company()
+        with set_company(company):
+            moves = Move.create([{
+                        'product': product.id,
+                        'unit': unit.id,
+                        'quantity': quantity,
+                        'from_location': supplier.id,
+                        'to_location': storage.id,
+                        'company': company.id,
+                        'unit_price': Decimal(1),
+                        'currency': company.currency.id,
+                        } for product, quantity in [
+                        (product1, 3), (product2, 1)]])
+            Move.do(moves)
+
+            moves = Move.create([{
+                        'product': product.id,
+                        'unit': unit.id,
+                        'quantity': 2,
+                        'from_location': storage.id,
+                        'to_location': customer.id,
+                        'company': company.id,
+                        'unit_price': Decimal(1),
+                        'currency': company.currency.id,
+                        } for product in [product1, product2, product1]])
+
+            self.assertFalse(Move.assign_try(moves))
+            self.assertEqual(
+                sorted((m.product, m.quantity, m.state) for m in Move.search([
+                            ('from_location', '=', storage.id),
+                            ])), [
+                    (product1, 1, 'assigned'),
+                    (product1, 1, 'draft'),
+                    (product1, 2, 'assigned'),
+                    (product2, 1, 'assigned'),
+                    (product2, 1, 'draft'),
+                    ])
+
+    @with_transaction()
+    def test_assign_try_wave(self):
+        "Test assign_try of shipments as a wave"
+        pool = Pool()
+        Template = pool.get('product.template')
+        Product = pool.get('product.product')
+        Uom = pool.get('product.uom')
+        Location = pool.get('stock.location')
+        Move = pool.get('stock.move')
+        Party = pool.get('party.party')
+        ShipmentInReturn = pool.get('stock.shipment.in.return')
+        ShipmentInternal = pool.get('stock.shipment.internal')
+        Cron = pool.get('ir.cron')
+
+        unit, = Uom.search([('name', '=', 'Unit')])
+        template = Template(
+            name="Product", type='goods', default_uom=unit)
+        template.save()
+        product, = Product.create([{'template': template.id}])
+        supplier, = Location.search([('code', '=', 'SUP')])
+        storage, = Location.search([('code', '=', 'STO')])
+        storage2, = Location.create([{
+                    'name': "Storage 2",
+                    'type': 'storage',
+                    'parent': storage.id,
+                    }])
+        party, = Party.create([{'name': "Supplier"}])
+        today = datetime.date.today()
+
+        company = create_company()
+        with set_company(company):
+            move = Move(
+                product=product, unit=unit, quantity=3,
+                from_location=supplier, to_location=storage,
+                company=company, unit_price=Decimal(1),
+                currency=company.currency)
+            move.save()
+            Move.do([move])
+
+            def move_values(from_location, to_location, quantity):
+                values = {
+                    'product': product.id,
+                    'unit': unit.id,
+                    'quantity': quantity,
+                    'from_location': from_location.id,
+                    'to_location': to_location.id,
+                    'company': company.id,
+                    }
+                if to_location.type == 'supplier':
+                    values['unit_price'] = Decimal(1)
+                    values['currency'] = company.currency.id
+                return values
+
+            return1, return2 = ShipmentInReturn.create([{
+                        'company': company.id,
+                        'supplier': party.id,
+                        'from_location': storage.id,
+                        'to_location': supplier.id,
+                        'planned_date': planned_date,
+                        'moves': [('create', [
+                                    move_values(storage, supplier, quantity),
+                                    ])],
+                        } for planned_date, quantity in [
+                        (today, 2),
+                        (today - datetime.timedelta(days=1), 1)]])
+            internal, = ShipmentInternal.create([{
+                        'company': company.id,
+                        'from_location': storage.id,
+                        'to_location': storage2.id,
+                        'planned_date': today + datetime.timedelta(days=1),
+                        'planned_start_date': (
+                            today + datetime.timedelta(days=1)),
+                        'moves': [('create', [
+                                    move_values(storage, storage2, 2),
+                                    ])],
+                        }])
+            ShipmentInReturn.wait([return1, return2])
+            ShipmentInternal.wait([internal])
+
+            with patch.object(
+                    ShipmentInReturn, 'assign_try',
+                    wraps=ShipmentInReturn.assign_try) as assign_try:
+                Cron.stock_shipment_assign_try()
+
+            assign_try.assert_called_once()
+            self.assertEqual(
+                [return1.state, return2.state, internal.state],
+                ['assigned', 'assigned', 'waiting'])
+
     @with_transaction()
     def test_assign_try_chained(self):
         "Test Move assign_try chained"
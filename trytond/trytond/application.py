@@ -6,7 +6,7 @@ import os
 import threading
 from io import StringIO
 
-__all__ = ['app']
+__all__ = ['app', 'asgi_app']
 
 # Logging must be set before importing
 if logging_config := os.environ.get('TRYTOND_LOGGING_CONFIG'):
@@ -24,6 +24,8 @@ if os.environ.get('TRYTOND_COROUTINE'):
     from gevent import monkey
     monkey.patch_all()
 
+import trytond.bus  # noqa: E402,F401
+from trytond.asgi import app as asgi_app  # noqa: E402,F401
 from trytond.pool import Pool  # noqa: E402
 from trytond.wsgi import app  # noqa: E402
 
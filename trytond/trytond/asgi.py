@@ -0,0 +1,227 @@
+# This file is part of Tryton.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+import asyncio
+import http.client
+import io
+import logging
+import sys
+import time
+import urllib.parse
+from functools import partial, wraps
+
+from werkzeug.routing import Map, Rule
+
+from trytond import backend, config, security
+from trytond.protocols.jsonrpc import JSONProtocol
+from trytond.protocols.wrappers import (
+    BaseResponse, Request, Response, abort, exceptions)
+
+__all__ = ['TrytondASGI', 'app']
+
+logger = logging.getLogger(__name__)
+
+
+def _do_basic_auth(request):
+    headers = {}
+    if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+        headers['WWW-Authenticate'] = 'Basic realm="Tryton"'
+    response = Response(None, http.client.UNAUTHORIZED, headers)
+    abort(http.client.UNAUTHORIZED, response=response)
+
+
+def _environ(scope, body):
+    "Return a WSGI environ for the HTTP scope"
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': (
+            scope.get('root_path', '').encode('utf-8').decode('latin-1')),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        elif name == 'CONTENT_TYPE':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            environ[key] += ',' + value
+        else:
+            environ[key] = value
+    return environ
+
+
+class TrytondASGI(object):
+    "An ASGI application to serve the long-polling routes"
+
+    def __init__(self):
+        self.url_map = Map([])
+        self.protocols = [JSONProtocol]
+
+    def route(self, string, methods=None, defaults=None):
+        def decorator(func):
+            self.url_map.add(Rule(
+                    string, endpoint=func, methods=methods, defaults=defaults))
+            return func
+        return decorator
+
+    def session_valid(self, func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            if request.session is None:
+                _do_basic_auth(request)
+            dbname = request.view_args.get('database_name')
+            loop = asyncio.get_running_loop()
+            session_check = await loop.run_in_executor(None, partial(
+                    security.check,
+                    dbname, request.session.userid, request.session.token, {
+                        '_request': {
+                            'remote_addr': request.remote_addr,
+                            },
+                        }))
+            if session_check is None:
+                _do_basic_auth(request)
+
+            return await func(request, *args, **kwargs)
+
+        return wrapper
+
+    async def dispatch_request(self, request):
+        adapter = self.url_map.bind_to_environ(request.environ)
+        try:
+            endpoint, request.view_args = adapter.match()
+            return await endpoint(request, **request.view_args)
+        except exceptions.HTTPException as e:
+            logger.debug(
+                "Exception when processing %s", request, exc_info=True)
+            return e
+        except backend.DatabaseOperationalError as e:
+            logger.debug(
+                "Exception when processing %s", request, exc_info=True)
+            return exceptions.ServiceUnavailable(description=str(e))
+        except Exception as e:
+            logger.exception("Exception when processing %s", request)
+            return exceptions.InternalServerError(original_exception=e)
+
+    async def http_app(self, scope, receive, send):
+        def duration():
+            return (time.monotonic() - started) * 1000
+        started, request = time.monotonic(), None
+        try:
+            try:
+                body = await self._read_body(receive)
+            except exceptions.HTTPException as e:
+                await self._send_response(send, _environ(scope, b''), e)
+                return
+            if body is None:
+                return
+            environ = _environ(scope, body)
+            for cls in self.protocols:
+                if cls.content_type in environ.get('CONTENT_TYPE', ''):
+                    request = cls.request(environ)
+                    break
+            else:
+                request = Request(environ)
+
+            origin = request.headers.get('Origin')
+            origin_host = (
+                urllib.parse.urlparse(origin).netloc if origin else '')
+            host = request.headers.get('Host')
+            if origin and origin_host != host:
+                cors = filter(
+                    None, config.get('web', 'cors', default='').splitlines())
+                if origin not in cors:
+                    await self._send_response(
+                        send, environ, exceptions.Forbidden())
+                    return
+
+            handler = asyncio.ensure_future(self.dispatch_request(request))
+            disconnect = asyncio.ensure_future(self._disconnect(receive))
+            await asyncio.wait(
+                [handler, disconnect], return_when=asyncio.FIRST_COMPLETED)
+            if not handler.done():
+                # The client is gone, stop waiting for it
+                handler.cancel()
+                return
+            disconnect.cancel()
+            response = handler.result()
+            if not isinstance(
+                    response, (BaseResponse, exceptions.HTTPException)):
+                response = Response(response)
+            if origin and isinstance(response, BaseResponse):
+                response.headers['Access-Control-Allow-Origin'] = origin
+                response.headers['Vary'] = 'Origin'
+            await self._send_response(send, environ, response)
+        finally:
+            logger.info('%s in %i ms', request, duration())
+
+    async def _read_body(self, receive):
+        max_size = config.getint('request', 'max_size')
+        chunks, size, more_body = [], 0, True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > max_size:
+                raise exceptions.RequestEntityTooLarge
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        return b''.join(chunks)
+
+    async def _disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _send_response(self, send, environ, response):
+        if isinstance(response, exceptions.HTTPException):
+            response = response.get_response(environ)
+        await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [
+                    (k.lower().encode('latin-1'), v.encode('latin-1'))
+                    for k, v in response.get_wsgi_headers(environ).items()],
+                })
+        await send({
+                'type': 'http.response.body',
+                'body': response.get_data(),
+                })
+
+    async def lifespan(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http_app(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(scope, receive, send)
+        else:
+            raise ValueError("Unsupported scope type: %s" % scope['type'])
+
+
+app = TrytondASGI()
@@ -72,6 +72,13 @@ class DatabaseInterface(object):
     def estimated_count(self, connection, table):
         raise NotImplementedError
 
+    def has_copy(self):
+        return False
+
+    def copy_from(self, connection, table, columns, values):
+        "Insert the rows of values into the columns of table in bulk"
+        raise NotImplementedError
+
     def notify(self, connection, channel, payload):
         raise NotImplementedError
 
@@ -190,6 +197,21 @@ class DatabaseInterface(object):
     def has_channel(self):
         return False
 
+    def has_snapshot(self):
+        return False
+
+    def export_snapshot(self, connection):
+        "Return the identifier of the snapshot of the connection transaction"
+        raise NotImplementedError
+
+    def import_snapshot(self, connection, snapshot):
+        "Use the snapshot for the connection transaction"
+        raise NotImplementedError
+
+    def server_cursor(self, connection, row_factory=None, size=None):
+        "Return a cursor which fetches the rows by batch of size"
+        return connection.cursor(row_factory=row_factory)
+
     @classmethod
     def has_materialized_views(cls):
         return False
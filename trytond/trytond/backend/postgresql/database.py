@@ -7,7 +7,7 @@ import time
 import warnings
 from collections import defaultdict
 from datetime import datetime
-from itertools import chain, repeat
+from itertools import chain, count, repeat
 from threading import RLock
 
 import psycopg
@@ -19,6 +19,7 @@ from psycopg import OperationalError as DatabaseOperationalError
 from psycopg import connect, rows
 from psycopg.errors import QueryCanceled as DatabaseTimeoutError
 from psycopg.sql import SQL, Identifier
+from psycopg.sql import Literal as SQLLiteral
 from psycopg_pool import ConnectionPool, NullConnectionPool
 from sql import Cast, Flavor, For, Literal, Table
 from sql.aggregate import Count
@@ -450,6 +451,17 @@ class Database(DatabaseInterface):
         else:
             return [id for id, in cursor]
 
+    def has_copy(self):
+        return True
+
+    def copy_from(self, connection, table, columns, values):
+        cursor = connection.cursor()
+        query = SQL('COPY {} ({}) FROM STDIN').format(
+            Identifier(table), SQL(', ').join(map(Identifier, columns)))
+        with cursor.copy(query) as copy:
+            for row in values:
+                copy.write_row(row)
+
     def setnextid(self, connection, table, value):
         if self.currid(connection, table) >= value:
             return
@@ -843,6 +855,29 @@ class Database(DatabaseInterface):
     def has_channel(self):
         return True
 
+    def has_snapshot(self):
+        return True
+
+    def export_snapshot(self, connection):
+        cursor = connection.cursor()
+        cursor.execute('SELECT pg_export_snapshot()')
+        return cursor.fetchone()[0]
+
+    def import_snapshot(self, connection, snapshot):
+        cursor = connection.cursor()
+        cursor.execute(SQL('SET TRANSACTION SNAPSHOT {}').format(
+                SQLLiteral(snapshot)))
+
+    _server_cursor_count = count()
+
+    def server_cursor(self, connection, row_factory=None, size=None):
+        name = 'trytond_%s' % next(self._server_cursor_count)
+        cursor = connection.cursor(
+            name, row_factory=row_factory, withhold=connection.autocommit)
+        if size:
+            cursor.itersize = size
+        return cursor
+
     def has_extension(self, extension_name):
         if extension_name in self._extensions[self.name]:
             return self._extensions[self.name][extension_name]
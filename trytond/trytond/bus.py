@@ -1,7 +1,9 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 
+import asyncio
 import collections
+import itertools
 import json
 import logging
 import os
@@ -12,6 +14,7 @@ import uuid
 
 import trytond.config as config
 from trytond import backend
+from trytond.asgi import app as asgi_app
 from trytond.protocols.jsonrpc import JSONDecoder, JSONEncoder
 from trytond.protocols.wrappers import HTTPStatus, Response, abort, exceptions
 from trytond.tools import resolve
@@ -29,60 +32,82 @@ class _MessageQueue:
         super().__init__()
         self._lock = collections.defaultdict(threading.Lock)
         self._timeout = timeout
-        self._messages = []
+        self._sequence = itertools.count()
+        # Per channel buffers of (sequence, message) ordered by sequence
+        self._channels = collections.defaultdict(collections.deque)
+        self._sequences = {}
+        self._expiration = collections.deque()
 
     def append(self, channel, element):
-        self._messages.append(
-            self.Message(channel, element, time.time()))
+        message = self.Message(channel, element, time.time())
+        message_id = element['message_id']
+        with self._lock[os.getpid()]:
+            sequence = next(self._sequence)
+            self._channels[channel].append((sequence, message))
+            self._sequences[message_id] = sequence
+            self._expiration.append((message.timestamp, channel, message_id))
 
-    def get_next(self, channels, from_id=None):
+    def _expire(self):
         oldest = time.time() - self._timeout
-        to_delete_index = 0
-        found = False
-        first_message = None
-        message = self.Message(None, None, None)
-        for idx, item in enumerate(self._messages):
-            if item.timestamp < oldest:
-                to_delete_index = idx
-                continue
-            if item.channel not in channels:
-                continue
-            if not first_message:
-                first_message = item
-            if from_id is None or found:
-                message = item
-                break
-            found = item.content['message_id'] == from_id
-        else:
-            if first_message and not found:
-                message = first_message
+        while self._expiration and self._expiration[0][0] < oldest:
+            _, channel, message_id = self._expiration.popleft()
+            self._sequences.pop(message_id, None)
+            messages = self._channels[channel]
+            messages.popleft()
+            if not messages:
+                del self._channels[channel]
 
+    def get_next(self, channels, from_id=None):
+        found, message = None, self.Message(None, None, None)
         with self._lock[os.getpid()]:
-            del self._messages[:to_delete_index]
-
+            self._expire()
+            last = self._sequences.get(from_id, -1)
+            for channel in channels:
+                if channel not in self._channels:
+                    continue
+                candidate = None
+                for sequence, item in reversed(self._channels[channel]):
+                    if sequence <= last:
+                        break
+                    candidate = sequence, item
+                if candidate and (found is None or candidate[0] < found):
+                    found, message = candidate
         return message.channel, message.content
 
 
+class _AsyncEvent:
+    "An event set from the listener thread and awaited in the event loop"
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def set(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # The loop is closed
+            pass
+
+    async def wait(self, timeout=None):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
 class LongPollingBus:
 
     _channel = 'bus'
     _queues_lock = collections.defaultdict(threading.Lock)
     _queues = collections.defaultdict(
-        lambda: {'timeout': None, 'events': collections.defaultdict(list)})
+        lambda: {'timeout': None, 'events': collections.defaultdict(set)})
     _messages = {}
 
     @classmethod
     def subscribe(cls, database, channels, last_message=None):
-        pid = os.getpid()
-        with cls._queues_lock[pid]:
-            start_listener = (pid, database) not in cls._queues
-            cls._queues[pid, database]['timeout'] = (
-                time.time() + config.getint('database', 'timeout'))
-            if start_listener:
-                listener = threading.Thread(
-                    target=cls._listen, args=(database,), daemon=True)
-                cls._queues[pid, database]['listener'] = listener
-                listener.start()
+        cls._start_listener(database)
 
         logger.info("subscribe to '%s' on '%s'", ','.join(channels), database)
         messages = cls._messages.get(database)
@@ -92,13 +117,8 @@ class LongPollingBus:
                 return cls.create_response(channel, content)
 
         event = threading.Event()
+        cls._add_event(database, channels, event)
         try:
-            for channel in channels:
-                with cls._queues_lock[pid]:
-                    event_channel = cls._queues[pid, database][
-                        'events'][channel]
-                    event_channel.append(event)
-
             triggered = event.wait(
                 config.getint('bus', 'long_polling_timeout'))
             if not triggered:
@@ -107,23 +127,73 @@ class LongPollingBus:
                 response = cls.create_response(
                     *cls._messages[database].get_next(channels, last_message))
         finally:
-            with cls._queues_lock[pid]:
-                queue_events = cls._queues[pid, database]['events']
-                for channel in channels:
-                    if channel not in queue_events:
-                        continue
-                    events = queue_events[channel]
-                    try:
-                        events.remove(event)
-                    except ValueError:
-                        pass
-                    if not events:
-                        # A user could query a lot of channels filling the
-                        # events dictionnary with empty lists
-                        del queue_events[channel]
+            cls._remove_event(database, channels, event)
 
         return response
 
+    @classmethod
+    async def async_subscribe(cls, database, channels, last_message=None):
+        "Subscribe like subscribe but waiting in the running event loop"
+        cls._start_listener(database)
+
+        logger.info("subscribe to '%s' on '%s'", ','.join(channels), database)
+        messages = cls._messages.get(database)
+        if messages:
+            channel, content = messages.get_next(channels, last_message)
+            if content:
+                return cls.create_response(channel, content)
+
+        event = _AsyncEvent()
+        cls._add_event(database, channels, event)
+        try:
+            triggered = await event.wait(
+                config.getint('bus', 'long_polling_timeout'))
+            if not triggered:
+                response = cls.create_response(None, None)
+            else:
+                response = cls.create_response(
+                    *cls._messages[database].get_next(channels, last_message))
+        finally:
+            cls._remove_event(database, channels, event)
+
+        return response
+
+    @classmethod
+    def _start_listener(cls, database):
+        pid = os.getpid()
+        with cls._queues_lock[pid]:
+            start_listener = (pid, database) not in cls._queues
+            cls._queues[pid, database]['timeout'] = (
+                time.time() + config.getint('database', 'timeout'))
+            if start_listener:
+                listener = threading.Thread(
+                    target=cls._listen, args=(database,), daemon=True)
+                cls._queues[pid, database]['listener'] = listener
+                listener.start()
+
+    @classmethod
+    def _add_event(cls, database, channels, event):
+        pid = os.getpid()
+        with cls._queues_lock[pid]:
+            queue_events = cls._queues[pid, database]['events']
+            for channel in channels:
+                queue_events[channel].add(event)
+
+    @classmethod
+    def _remove_event(cls, database, channels, event):
+        pid = os.getpid()
+        with cls._queues_lock[pid]:
+            queue_events = cls._queues[pid, database]['events']
+            for channel in channels:
+                if channel not in queue_events:
+                    continue
+                events = queue_events[channel]
+                events.discard(event)
+                if not events:
+                    # A user could query a lot of channels filling the
+                    # events dictionnary with empty sets
+                    del queue_events[channel]
+
     @classmethod
     def create_response(cls, channel, message):
         response_data = {
@@ -218,9 +288,8 @@ else:
     Bus = LongPollingBus
 
 
-@app.route('/<string:database_name>/bus', methods=['POST'])
-@app.session_valid
-def subscribe(request, database_name):
+def _subscription(request):
+    "Return the channels and the last message of the subscribe request"
     if not config.getboolean('bus', 'allow_subscribe'):
         raise exceptions.NotImplemented
     url_host = config.get('bus', 'url_host')
@@ -243,12 +312,37 @@ def subscribe(request, database_name):
         "get bus messages for %s since %s from %s@%s%s",
         channels, last_message, session.username,
         request.remote_addr, request.path)
-    bus_response = Bus.subscribe(database_name, channels, last_message)
+    return channels, last_message
+
+
+def _response(bus_response):
     return Response(
         json.dumps(bus_response, cls=JSONEncoder, separators=(',', ':')),
         content_type='application/json')
 
 
+@app.route('/<string:database_name>/bus', methods=['POST'])
+@app.session_valid
+def subscribe(request, database_name):
+    channels, last_message = _subscription(request)
+    bus_response = Bus.subscribe(database_name, channels, last_message)
+    return _response(bus_response)
+
+
+@asgi_app.route('/<string:database_name>/bus', methods=['POST'])
+@asgi_app.session_valid
+async def async_subscribe(request, database_name):
+    channels, last_message = _subscription(request)
+    if hasattr(Bus, 'async_subscribe'):
+        bus_response = await Bus.async_subscribe(
+            database_name, channels, last_message)
+    else:
+        loop = asyncio.get_running_loop()
+        bus_response = await loop.run_in_executor(
+            None, Bus.subscribe, database_name, channels, last_message)
+    return _response(bus_response)
+
+
 def notify(title, body=None, priority=1, user=None, client=None):
     if user is None:
         if client is None:
@@ -2,14 +2,18 @@
 # this repository contains the full copyright notices and license terms.
 import copy
 import datetime as dt
+import hashlib
 import json
 import logging
+import pickle
 import selectors
+import sys
 import threading
 from collections import OrderedDict, defaultdict
+from functools import partial
 from types import MappingProxyType
 from uuid import uuid4
-from weakref import WeakKeyDictionary
+from weakref import WeakKeyDictionary, ref
 
 from sql import Conflict, Table
 from sql.aggregate import Max
@@ -17,11 +21,18 @@ from sql.functions import CurrentTimestamp, Function
 
 from trytond import backend, config
 from trytond.pool import Pool
-from trytond.tools import grouped_slice, resolve
+from trytond.tools import resolve
 from trytond.tools.multiprocessing import local
 from trytond.transaction import Transaction
 
-__all__ = ['BaseCache', 'Cache', 'LRUDict', 'LRUDictTransaction']
+try:
+    import redis
+except ImportError:
+    redis = None
+
+__all__ = [
+    'BaseCache', 'Cache', 'LRUDict', 'LRUDictTransaction', 'MemoryBudget',
+    'MemoryCache', 'RedisCache']
 logger = logging.getLogger(__name__)
 
 REFRESH_POOL_MSG = "refresh pool"
@@ -66,6 +77,53 @@ def immutable(o):
         return copy.copy(o)
 
 
+def mutable(o):
+    if isinstance(o, MappingProxyType):
+        return {k: mutable(v) for k, v in o.items()}
+    elif isinstance(o, tuple):
+        return tuple(mutable(v) for v in o)
+    elif isinstance(o, frozenset):
+        return frozenset(mutable(v) for v in o)
+    else:
+        return o
+
+
+def _canonical(o):
+    "Return a representation of o which is stable between processes"
+    if isinstance(o, (tuple, list)):
+        return tuple(_canonical(x) for x in o)
+    elif isinstance(o, (set, frozenset)):
+        return ('frozenset',) + tuple(
+            sorted((_canonical(x) for x in o), key=repr))
+    elif isinstance(o, dict):
+        return ('dict',) + tuple(
+            sorted((_canonical(i) for i in o.items()), key=repr))
+    else:
+        return o
+
+
+def _match_keys(key, keys):
+    "Test if key is one of the keys or starts with one of them"
+    try:
+        if key in keys:
+            return True
+        if isinstance(key, tuple):
+            return any(key[:i] in keys for i in range(1, len(key)))
+    except TypeError:
+        pass
+    return False
+
+
+def sizeof(o):
+    "Return an estimation of the memory used by o in bytes"
+    size = sys.getsizeof(o)
+    if isinstance(o, (list, tuple, set, frozenset)):
+        size += sum(sizeof(x) for x in o)
+    elif isinstance(o, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in o.items())
+    return size
+
+
 def _get_modules(cursor):
     ir_module = Table('ir_module')
     cursor.execute(*ir_module.select(
@@ -142,12 +200,18 @@ class BaseCache(metaclass=_CacheMeta):
     def get(self, key, default=None):
         raise NotImplementedError
 
+    def peek(self, dbname, key, default=None):
+        return default
+
     def set(self, key, value):
         raise NotImplementedError
 
     def clear(self):
         raise NotImplementedError
 
+    def clear_keys(self, keys):
+        self.clear()
+
     @classmethod
     def clear_all(cls):
         for inst in cls._instances.values():
@@ -164,6 +228,10 @@ class BaseCache(metaclass=_CacheMeta):
     def commit(cls, transaction):
         raise NotImplementedError
 
+    @classmethod
+    def committed(cls, transaction):
+        pass
+
     @classmethod
     def rollback(cls, transaction):
         raise NotImplementedError
@@ -178,6 +246,8 @@ class MemoryCache(BaseCache):
     A key value LRU cache with size limit.
     """
     _reset = WeakKeyDictionary()
+    _reset_keys = WeakKeyDictionary()
+    _invalidated = WeakKeyDictionary()
     _clean_last = None
     _default_lower = Transaction.monotonic_time()
     _local = _CacheLocal()
@@ -189,14 +259,17 @@ class MemoryCache(BaseCache):
         self._database_cache = defaultdict(lambda: LRUDict(self.size_limit))
         self._transaction_cache = WeakKeyDictionary()
         self._transaction_lower = {}
+        self._keys_lower = {}
         self._timestamp = {}
 
-    def _get_cache(self):
+    def _get_cache(self, key=None):
         transaction = Transaction()
         dbname = transaction.database.name
         lower = self._transaction_lower.get(dbname, self._default_lower)
         if (self._name in self._reset.get(transaction, set())
-                or transaction.started_at < lower):
+                or transaction.started_at < lower
+                or (key is not None
+                    and self._key_reset(transaction, dbname, key))):
             try:
                 return self._transaction_cache[transaction]
             except KeyError:
@@ -204,11 +277,32 @@ class MemoryCache(BaseCache):
                 self._transaction_cache[transaction] = cache
                 return cache
         else:
-            return self._database_cache[dbname]
+            return self._get_database_cache(dbname)
+
+    def _get_database_cache(self, dbname):
+        return self._database_cache[dbname]
+
+    def _key_reset(self, transaction, dbname, key):
+        reset_keys = self._reset_keys.get(transaction)
+        if reset_keys and _match_keys(key, reset_keys.get(self._name, ())):
+            return True
+        keys_lower = self._keys_lower.get(dbname)
+        if keys_lower:
+            if isinstance(key, tuple):
+                prefixes = (key[:i] for i in range(1, len(key) + 1))
+            else:
+                prefixes = [key]
+            try:
+                return any(
+                    transaction.started_at < keys_lower.get(p, 0)
+                    for p in prefixes)
+            except TypeError:
+                pass
+        return False
 
     def get(self, key, default=None):
+        cache = self._get_cache(key)
         key = self._key(key)
-        cache = self._get_cache()
         try:
             expire, result = cache[key]
             if expire and expire < dt.datetime.now():
@@ -222,9 +316,23 @@ class MemoryCache(BaseCache):
             self.miss += 1
             return default
 
+    def peek(self, dbname, key, default=None):
+        assert not self.context, "peek is not available with context"
+        cache = self._get_database_cache(dbname)
+        try:
+            expire, result = cache[key]
+            if expire and expire < dt.datetime.now():
+                self.miss += 1
+                return default
+            self.hit += 1
+            return result
+        except (KeyError, TypeError):
+            self.miss += 1
+            return default
+
     def set(self, key, value):
+        cache = self._get_cache(key)
         key = self._key(key)
-        cache = self._get_cache()
         if self.duration:
             expire = dt.datetime.now() + self.duration
         else:
@@ -241,6 +349,23 @@ class MemoryCache(BaseCache):
         self._reset.setdefault(transaction, set()).add(self._name)
         self._transaction_cache.pop(transaction, None)
 
+    def clear_keys(self, keys):
+        transaction = Transaction()
+        keys = {freeze(k) for k in keys}
+        if not keys:
+            return
+        self._reset_keys.setdefault(transaction, {}).setdefault(
+            self._name, set()).update(keys)
+        cache = self._transaction_cache.get(transaction)
+        if cache:
+            self._remove_keys(cache, keys)
+
+    def _remove_keys(self, cache, keys):
+        for key in list(cache.keys()):
+            if _match_keys(key[0] if self.context else key, keys):
+                # The entry may have been evicted concurrently
+                cache.pop(key, None)
+
     def _clear(self, dbname, timestamp=None):
         logger.debug("clearing cache '%s' of '%s'", self._name, dbname)
         self._timestamp[dbname] = timestamp
@@ -248,6 +373,28 @@ class MemoryCache(BaseCache):
         self._transaction_lower[dbname] = max(
             Transaction.monotonic_time(),
             self._transaction_lower.get(dbname, self._default_lower))
+        self._keys_lower.pop(dbname, None)
+
+    def _clear_keys(self, dbname, keys, timestamp=None):
+        logger.debug(
+            "clearing keys of cache '%s' of '%s'", self._name, dbname)
+        if timestamp is not None:
+            self._timestamp[dbname] = timestamp
+        keys = {freeze(k) for k in keys}
+        cache = self._database_cache.get(dbname)
+        if cache:
+            self._remove_keys(cache, keys)
+        # Prevent older transactions to fill the cache with the keys
+        now = Transaction.monotonic_time()
+        keys_lower = self._keys_lower.setdefault(dbname, OrderedDict())
+        for key in keys:
+            keys_lower.pop(key, None)
+            keys_lower[key] = now
+        while len(keys_lower) > self.size_limit:
+            _, lower = keys_lower.popitem(last=False)
+            self._transaction_lower[dbname] = max(
+                lower,
+                self._transaction_lower.get(dbname, self._default_lower))
 
     @classmethod
     def _clear_all(cls, dbname):
@@ -303,25 +450,27 @@ class MemoryCache(BaseCache):
     @classmethod
     def commit(cls, transaction):
         table = Table(cls._table)
-        reset = cls._reset.pop(transaction, None)
-        if not reset:
+        reset = cls._reset.pop(transaction, None) or set()
+        reset_keys = cls._reset_keys.pop(transaction, None) or {}
+        for name in reset:
+            reset_keys.pop(name, None)
+        if not reset and not reset_keys:
             return
         database = transaction.database
         dbname = database.name
+        cls._invalidated[transaction] = reset | reset_keys.keys()
         clean_timeout = config.getint('cache', 'clean_timeout')
         if not clean_timeout and transaction.database.has_channel():
             with transaction.connection.cursor() as cursor:
-                # The count computed as
-                # 8000 (max notify size) / 64 (max name data len)
-                for sub_reset in grouped_slice(reset, 125):
-                    database.notify(transaction.connection, cls._channel,
-                        json.dumps(list(sub_reset), separators=(',', ':')))
+                for payload in cls._payloads(reset, reset_keys):
+                    database.notify(
+                        transaction.connection, cls._channel, payload)
         else:
             connection = database.get_connection(
                 readonly=False, autocommit=True)
             try:
                 with connection.cursor() as cursor:
-                    for name in reset:
+                    for name in reset | reset_keys.keys():
                         if database.has_insert_on_conflict():
                             query = table.insert(
                                 [table.timestamp, table.name],
@@ -361,16 +510,65 @@ class MemoryCache(BaseCache):
                         except KeyError:
                             pass
                         else:
-                            inst._clear(dbname, timestamp)
+                            if name in reset:
+                                inst._clear(dbname, timestamp)
+                            else:
+                                # Other processes clear all the keys
+                                inst._clear_keys(
+                                    dbname, reset_keys[name], timestamp)
                 connection.commit()
             finally:
                 database.put_connection(connection)
             cls._clean_last = dt.datetime.now()
         reset.clear()
+        reset_keys.clear()
+
+    @classmethod
+    def _payloads(cls, reset, reset_keys):
+        "Yield the notification payloads for the reset names and keys"
+        # 8000 is the max notify size
+        max_size = 7900
+        items = []
+        for name in reset:
+            items.append(json.dumps(name))
+        for name, keys in reset_keys.items():
+            try:
+                item = json.dumps([name, list(keys)], separators=(',', ':'))
+            except TypeError:
+                item = None
+            if item is None or len(item.encode('utf-8')) > max_size:
+                item = json.dumps(name)
+            items.append(item)
+        payload, size = [], 2
+        for item in items:
+            length = len(item.encode('utf-8')) + 1
+            if payload and size + length > max_size:
+                yield '[' + ','.join(payload) + ']'
+                payload, size = [], 2
+            payload.append(item)
+            size += length
+        if payload:
+            yield '[' + ','.join(payload) + ']'
+
+    @classmethod
+    def committed(cls, transaction):
+        dbname = transaction.database.name
+        for name in cls._invalidated.pop(transaction, ()):
+            try:
+                inst = cls._instances[name]
+            except KeyError:
+                continue
+            inst._invalidate(dbname)
+
+    def _invalidate(self, dbname):
+        "Invalidate the entries shared with the other processes"
+        pass
 
     @classmethod
     def rollback(cls, transaction):
         cls._reset.pop(transaction, None)
+        cls._reset_keys.pop(transaction, None)
+        cls._invalidated.pop(transaction, None)
 
     @classmethod
     def drop(cls, dbname):
@@ -389,6 +587,7 @@ class MemoryCache(BaseCache):
             inst._timestamp.pop(dbname, None)
             inst._database_cache.pop(dbname, None)
             inst._transaction_lower.pop(dbname, None)
+            inst._keys_lower.pop(dbname, None)
 
     @classmethod
     def refresh_pool(cls, transaction):
@@ -442,13 +641,20 @@ class MemoryCache(BaseCache):
                         if remote_id != process_id:
                             Pool.refresh(dbname, _get_modules(cursor))
                     elif payload:
-                        for name in json.loads(payload):
+                        for item in json.loads(payload):
+                            if isinstance(item, str):
+                                name, keys = item, None
+                            else:
+                                name, keys = item
                             try:
                                 inst = cls._instances[name]
                             except KeyError:
                                 pass
                             else:
-                                inst._clear(dbname)
+                                if keys is None:
+                                    inst._clear(dbname)
+                                else:
+                                    inst._clear_keys(dbname, keys)
                 cls._clean_last = dt.datetime.now()
                 # Keep connected
                 cursor.execute('SELECT 1')
@@ -466,28 +672,241 @@ class MemoryCache(BaseCache):
                     del cls._local.listeners[dbname]
 
 
+class _RedisDict:
+    "The shared store of a RedisCache for a database"
+    __slots__ = ('_cache', '_dbname')
+
+    def __init__(self, cache, dbname):
+        self._cache = cache
+        self._dbname = dbname
+
+    def _key(self, key):
+        digest = hashlib.sha256(
+            repr(_canonical(key)).encode('utf-8')).hexdigest()
+        return self._cache._redis_key(self._dbname, digest)
+
+    def __getitem__(self, key):
+        cache = self._cache
+        try:
+            pipe = cache._client().pipeline(transaction=False)
+            pipe.get(cache._redis_key(self._dbname, 'generation'))
+            pipe.get(self._key(key))
+            generation, data = pipe.execute()
+        except redis.RedisError:
+            logger.warning(
+                "fail to get from cache '%s'", cache._name, exc_info=True)
+            raise KeyError(key)
+        generation = int(generation or 0)
+        cache._generation[self._dbname] = generation
+        if data is None:
+            raise KeyError(key)
+        data_generation, value = pickle.loads(data)
+        if data_generation != generation:
+            raise KeyError(key)
+        # The expiration is managed by the store
+        return None, immutable(value)
+
+    def __setitem__(self, key, value):
+        cache = self._cache
+        _, value = value
+        if cache.duration:
+            px = int(cache.duration.total_seconds() * 1000)
+        else:
+            px = None
+        try:
+            client = cache._client()
+            if self._dbname not in cache._generation:
+                cache._generation[self._dbname] = int(client.get(
+                        cache._redis_key(self._dbname, 'generation'))
+                    or 0)
+            generation = cache._generation[self._dbname]
+            try:
+                data = pickle.dumps(
+                    (generation, mutable(value)), pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, AttributeError) as exception:
+                raise TypeError(exception) from exception
+            client.set(self._key(key), data, px=px)
+        except redis.RedisError:
+            logger.warning(
+                "fail to set in cache '%s'", cache._name, exc_info=True)
+
+    def __delitem__(self, key):
+        try:
+            self._cache._client().delete(self._key(key))
+        except redis.RedisError:
+            logger.warning(
+                "fail to delete from cache '%s'", self._cache._name,
+                exc_info=True)
+
+    def move_to_end(self, key):
+        pass
+
+
+class RedisCache(MemoryCache):
+    """
+    A key value cache shared between processes using a Redis server.
+
+    The entries are invalidated by incrementing a generation per database
+    once the transaction which cleared the cache is committed. The other
+    processes only reset their local state like the MemoryCache.
+    """
+    _clients = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        if redis is None:
+            raise ImportError("redis is required for RedisCache")
+        super().__init__(*args, **kwargs)
+        self._generation = {}
+
+    @classmethod
+    def _client(cls):
+        uri = config.get('cache', 'uri')
+        try:
+            return cls._clients[uri]
+        except KeyError:
+            with cls._clients_lock:
+                if uri not in cls._clients:
+                    cls._clients[uri] = redis.Redis.from_url(uri)
+                return cls._clients[uri]
+
+    def _redis_key(self, dbname, key):
+        return ':'.join([
+                config.get('cache', 'prefix', default='trytond'),
+                dbname, self._name, key])
+
+    def _get_database_cache(self, dbname):
+        return _RedisDict(self, dbname)
+
+    def _clear(self, dbname, timestamp=None):
+        super()._clear(dbname, timestamp=timestamp)
+        self._generation.pop(dbname, None)
+
+    def _invalidate(self, dbname):
+        generation_key = self._redis_key(dbname, 'generation')
+        try:
+            self._generation[dbname] = self._client().incr(generation_key)
+        except redis.RedisError:
+            logger.error(
+                "fail to clear cache '%s' of '%s'", self._name, dbname,
+                exc_info=True)
+
+    def _clear_keys(self, dbname, keys, timestamp=None):
+        # The keys can not be found in the store
+        self._clear(dbname, timestamp=timestamp)
+
+    @classmethod
+    def drop(cls, dbname):
+        super().drop(dbname)
+        for inst in cls._instances.values():
+            if isinstance(inst, RedisCache):
+                inst._generation.pop(dbname, None)
+
+
 if config.get('cache', 'class'):
     Cache = resolve(config.get('cache', 'class'))
 else:
     Cache = MemoryCache
 
 
+class MemoryBudget:
+    """
+    Estimation of the memory used by the values accounted in LRUDicts.
+    If the limit is exceeded, it will remove the first accounted items from
+    their LRUDict.
+    The peak and the number of evicted items since the last call of stats are
+    kept for the process.
+    """
+    __slots__ = ('limit', 'memory', '_items', '_caches')
+    _peak = 0
+    _evicted = 0
+
+    def __init__(self, limit):
+        assert limit > 0
+        self.limit = limit
+        self.memory = 0
+        # (cache id, key): size in accounting order
+        self._items = OrderedDict()
+        # cache id: (weak reference, keys)
+        self._caches = {}
+
+    @classmethod
+    def stats(cls):
+        "Return the memory peak and the evicted count since the last call"
+        stats = {
+            'memory': cls._peak,
+            'evicted': cls._evicted,
+            }
+        cls._peak = cls._evicted = 0
+        return stats
+
+    def add(self, cache, key, size):
+        cache_id = id(cache)
+        if cache_id not in self._caches:
+            self._caches[cache_id] = (
+                ref(cache, partial(_release_budget, self, cache_id)),
+                set())
+        self._caches[cache_id][1].add(key)
+        self.memory += size - self._items.pop((cache_id, key), 0)
+        self._items[(cache_id, key)] = size
+        if self.memory > MemoryBudget._peak:
+            MemoryBudget._peak = self.memory
+        self._check_limit()
+
+    def discard(self, cache, key):
+        cache_id = id(cache)
+        size = self._items.pop((cache_id, key), None)
+        if size is not None:
+            self.memory -= size
+            self._caches[cache_id][1].discard(key)
+
+    def release(self, cache_id):
+        "Discard all the items of the cache"
+        _, keys = self._caches.pop(cache_id, (None, ()))
+        for key in keys:
+            self.memory -= self._items.pop((cache_id, key), 0)
+
+    def _check_limit(self):
+        # Always keep the last item
+        while self.memory > self.limit and len(self._items) > 1:
+            cache_id, key = next(iter(self._items))
+            cache = self._caches[cache_id][0]()
+            if cache is None:
+                self.release(cache_id)
+                continue
+            cache.pop(key, None)
+            self.discard(cache, key)
+            MemoryBudget._evicted += 1
+
+
+def _release_budget(budget, cache_id, reference):
+    "Release the items of a garbage collected cache"
+    entry = budget._caches.get(cache_id)
+    if entry and entry[0] is reference:
+        budget.release(cache_id)
+
+
 class LRUDict(OrderedDict):
     """
     Dictionary with a size limit.
     If size limit is reached, it will remove the first added items.
+    If memory_budget is set, the accounted values are added to it and the
+    budget may remove the first accounted items when its limit is exceeded.
     The default_factory provides the same behavior as in standard
     collections.defaultdict.
     If default_factory_with_key is set, the default_factory is called with the
     missing key.
     """
-    __slots__ = ('size_limit',)
+    __slots__ = ('size_limit', 'memory_budget', 'memory', '_sizes')
 
     def __init__(self, size_limit,
             default_factory=None, default_factory_with_key=False,
-            *args, **kwargs):
+            *args, memory_budget=None, **kwargs):
         assert size_limit > 0
         self.size_limit = size_limit
+        self.memory_budget = memory_budget
+        self.memory = 0
+        self._sizes = {}
         super().__init__(*args, **kwargs)
         self.default_factory = default_factory
         self.default_factory_with_key = default_factory_with_key
@@ -497,6 +916,10 @@ class LRUDict(OrderedDict):
         super().__setitem__(key, value)
         self._check_size_limit()
 
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._discard_size(key)
+
     def __missing__(self, key):
         if self.default_factory is None:
             raise KeyError(key)
@@ -516,6 +939,41 @@ class LRUDict(OrderedDict):
         self._check_size_limit()
         return default
 
+    def pop(self, key, *args):
+        value = super().pop(key, *args)
+        self._discard_size(key)
+        return value
+
+    def popitem(self, last=True):
+        key, value = super().popitem(last=last)
+        self._discard_size(key)
+        return key, value
+
+    def clear(self):
+        super().clear()
+        if self._sizes:
+            self.memory_budget.release(id(self))
+            self._sizes.clear()
+        self.memory = 0
+
+    def account(self, key):
+        "Update the estimated memory used by the value of the key"
+        if self.memory_budget is None or key not in self:
+            return
+        value = self[key]
+        if hasattr(value, '_items'):
+            size = sum(sizeof(v) for _, v in value._items())
+        else:
+            size = sizeof(value)
+        self.memory += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self.memory_budget.add(self, key, size)
+
+    def _discard_size(self, key):
+        if self._sizes and key in self._sizes:
+            self.memory -= self._sizes.pop(key)
+            self.memory_budget.discard(self, key)
+
     def _check_size_limit(self):
         while len(self) > self.size_limit:
             self.popitem(last=False)
@@ -69,6 +69,8 @@ class TrytonConfigParser(configparser.ConfigParser):
         self.set('database', 'language', 'en')
         self.set('database', 'timeout', str(30 * 60))
         self.set('database', 'subquery_threshold', str(1_000))
+        self.set('database', 'fetch_size', str(1_000))
+        self.set('database', 'getter_workers', '0')
         self.add_section('request')
         self.set('request', 'max_size', str(2 * 1024 * 1024))
         self.set('request', 'max_size_authenticated',
@@ -79,6 +81,7 @@ class TrytonConfigParser(configparser.ConfigParser):
         self.set('cache', 'model', '200')
         self.set('cache', 'record', '2000')
         self.set('cache', 'field', '100')
+        self.set('cache', 'record_memory', '0')
         self.set('cache', 'default', '1024')
         self.set('cache', 'ir.message', '10240')
         self.set('cache', 'ir.translation', '10240')
@@ -94,6 +97,7 @@ class TrytonConfigParser(configparser.ConfigParser):
         self.set('session', 'authentications', 'password')
         self.set('session', 'max_age', str(60 * 60 * 24 * 30))
         self.set('session', 'timeout', str(60 * 5))
+        self.set('session', 'check_cache', '0')
         self.set('session', 'max_attempt', '5')
         self.set('session', 'max_attempt_ip_network', '300')
         self.set('session', 'ip_network_4', '32')
@@ -164,6 +168,12 @@ def set(section, option, value=None):
     _cache_clear()
 
 
+def remove_option(section, option):
+    removed = _config.remove_option(section, option)
+    _cache_clear()
+    return removed
+
+
 @cache
 def get(section, option, default=None):
     return configparser.RawConfigParser.get(
@@ -30,6 +30,7 @@ from trytond.wizard import (
     Button, StateAction, StateTransition, StateView, Wizard)
 
 from .resource import ResourceAccessMixin
+from .rule import _get_access_dependents
 
 logger = logging.getLogger(__name__)
 
@@ -600,7 +601,7 @@ class ModelAccess(
 
         access = {}
         for model in models:
-            maccess = cls._get_access_cache.get((groups, model), default=-1)
+            maccess = cls._get_access_cache.get((model, groups), default=-1)
             if maccess == -1:
                 break
             access[model] = maccess
@@ -670,7 +671,7 @@ class ModelAccess(
                     default=access[model][perm])
                 for perm in ['read', 'write', 'create', 'delete']}
         for model, maccess in access.items():
-            cls._get_access_cache.set((groups, model), maccess)
+            cls._get_access_cache.set((model, groups), maccess)
         return access
 
     @classmethod
@@ -737,10 +738,23 @@ class ModelAccess(
         else:
             return True
 
+    @classmethod
+    def check_modification(cls, mode, records, values=None, external=False):
+        super().check_modification(
+            mode, records, values=values, external=external)
+        if mode == 'write' and 'model' in values:
+            cls._clear_access_cache(records)
+
     @classmethod
     def on_modification(cls, mode, records, field_names=None):
         super().on_modification(mode, records, field_names=field_names)
-        cls._get_access_cache.clear()
+        cls._clear_access_cache(records)
+
+    @classmethod
+    def _clear_access_cache(cls, records):
+        cls._get_access_cache.clear_keys(
+            (m,) for m in _get_access_dependents({r.model for r in records}))
+        # The access of relation fields depends on the target models
         ModelView._fields_view_get_cache.clear()
 
 
@@ -834,7 +848,7 @@ class ModelFieldAccess(
 
         accesses = {}
         for model in models:
-            maccesses = cls._get_access_cache.get((groups, model))
+            maccesses = cls._get_access_cache.get((model, groups))
             if maccesses is None:
                 break
             accesses[model] = maccesses
@@ -867,7 +881,7 @@ class ModelFieldAccess(
         for m, f, r, w, c, d in cursor:
             accesses[m][f] = {'read': r, 'write': w, 'create': c, 'delete': d}
         for model, maccesses in accesses.items():
-            cls._get_access_cache.set((groups, model), maccesses)
+            cls._get_access_cache.set((model, groups), maccesses)
         return accesses
 
     @classmethod
@@ -903,10 +917,22 @@ class ModelFieldAccess(
                     return False
         return True
 
+    @classmethod
+    def check_modification(cls, mode, records, values=None, external=False):
+        super().check_modification(
+            mode, records, values=values, external=external)
+        if mode == 'write' and 'model' in values:
+            cls._clear_access_cache(records)
+
     @classmethod
     def on_modification(cls, mode, records, field_names=None):
         super().on_modification(mode, records, field_names=field_names)
-        cls._get_access_cache.clear()
+        cls._clear_access_cache(records)
+
+    @classmethod
+    def _clear_access_cache(cls, records):
+        cls._get_access_cache.clear_keys((r.model,) for r in records)
+        # The views of relation fields are included
         ModelView._fields_view_get_cache.clear()
 
 
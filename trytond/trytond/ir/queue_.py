@@ -1,18 +1,24 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 import datetime
+import hashlib
+import json
+from collections import defaultdict
+from itertools import chain
 
-from sql import Literal, Null, With
+from sql import Literal, Null, Window, With
 from sql.aggregate import Min
-from sql.functions import CurrentTimestamp, Extract
+from sql.conditionals import Case
+from sql.functions import CurrentTimestamp, Extract, RowNumber
 from sql.operators import Concat, Exists
 
 import trytond.config as config
 from trytond.model import Index, ModelSQL, fields
 from trytond.pool import Pool
+from trytond.protocols.jsonrpc import JSONEncoder
 from trytond.tools import grouped_slice
 from trytond.transaction import (
-    Transaction, inactive_records, without_check_access)
+    Transaction, check_access, inactive_records, without_check_access)
 
 
 class Queue(ModelSQL):
@@ -29,6 +35,9 @@ class Queue(ModelSQL):
         help="When the task can start.")
     expected_at = fields.Timestamp("Expected at",
         help="When the task should be done.")
+    coalesce_key = fields.Char("Coalesce Key", readonly=True)
+
+    _warm_up_size = 100
 
     @classmethod
     def __setup__(cls):
@@ -42,6 +51,11 @@ class Queue(ModelSQL):
                 (table.expected_at, Index.Range(nulls_first=True)),
                 (table.dequeued_at, Index.Equality()),
                 (table.name, Index.Equality())))
+        cls._sql_indexes.add(
+            Index(
+                table,
+                (table.coalesce_key, Index.Equality()),
+                where=table.dequeued_at == Null))
 
     @classmethod
     def default_enqueued_at(cls):
@@ -58,6 +72,16 @@ class Queue(ModelSQL):
         default.setdefault('finished_at')
         return super().copy(records, default=default)
 
+    @classmethod
+    def _coalesce_key(cls, data):
+        "Return the key of the tasks that can be run together"
+        if not data.get('coalesce'):
+            return
+        key = {k: v for k, v in data.items() if k != 'instances'}
+        return hashlib.sha256(json.dumps(
+                key, cls=JSONEncoder, separators=(',', ':'),
+                sort_keys=True).encode('utf-8')).hexdigest()
+
     @classmethod
     def push(cls, name, data, scheduled_at=None, expected_at=None):
         transaction = Transaction()
@@ -68,6 +92,7 @@ class Queue(ModelSQL):
                         'data': data,
                         'scheduled_at': scheduled_at,
                         'expected_at': expected_at,
+                        'coalesce_key': cls._coalesce_key(data),
                         }])
         if database.has_channel():
             database.notify(transaction.connection, cls.__name__, '')
@@ -77,10 +102,42 @@ class Queue(ModelSQL):
 
     @classmethod
     def pull(cls, database, connection, name=None):
+        tasks, seconds = cls.pull_batch(database, connection, name=name)
+        task_id = tasks[0][0] if tasks else None
+        return task_id, seconds
+
+    @classmethod
+    def weights(cls):
+        "Return the fair-share weight per queue name"
+        if not config.has_section('queue_weight'):
+            return {}
+        weights = {
+            n: config.getfloat('queue_weight', n)
+            for n in config.options('queue_weight')}
+        for name, weight in weights.items():
+            if weight <= 0:
+                raise ValueError(
+                    f"The weight of queue '{name}' must be positive")
+        return weights
+
+    @classmethod
+    def limits(cls):
+        "Return the maximal number of concurrent tasks per queue name"
+        if not config.has_section('queue_limit'):
+            return {}
+        return {
+            n: config.getint('queue_limit', n)
+            for n in config.options('queue_limit')}
+
+    @classmethod
+    def pull_batch(cls, database, connection, name=None, size=1, running=None):
+        "Dequeue fairly at most size tasks and return them with next timeout"
         cursor = connection.cursor()
         queue = cls.__table__()
         queue_c = cls.__table__()
-        queue_s = cls.__table__()
+        queue_r = cls.__table__()
+        if running is None:
+            running = {}
 
         candidates = With('id', 'scheduled_at', 'expected_at',
             query=queue_c.select(
@@ -92,19 +149,47 @@ class Queue(ModelSQL):
                 order_by=[
                     queue_c.scheduled_at.nulls_first,
                     queue_c.expected_at.nulls_first]))
-        selected = queue_s.select(
-            queue_s.id,
-            where=((queue_s.name == name) if name else Literal(True))
-            & (queue_s.dequeued_at == Null)
-            & ((queue_s.scheduled_at <= CurrentTimestamp())
-                | (queue_s.scheduled_at == Null)),
+        # The tasks are shared among the oldest ready tasks which are locked
+        # before being ranked so concurrent pulls skip each other's tasks
+        locked = queue_r.select(
+            queue_r.id,
+            queue_r.name,
+            queue_r.scheduled_at,
+            queue_r.expected_at,
+            where=((queue_r.name == name) if name else Literal(True))
+            & (queue_r.dequeued_at == Null)
+            & ((queue_r.scheduled_at <= CurrentTimestamp())
+                | (queue_r.scheduled_at == Null)),
             order_by=[
-                queue_s.scheduled_at.nulls_first,
-                queue_s.expected_at.nulls_first],
-            limit=1)
+                queue_r.scheduled_at.nulls_first,
+                queue_r.expected_at.nulls_first,
+                queue_r.id],
+            limit=max(
+                size, config.getint('queue', 'fair_window', default=100)))
         if database.has_select_for():
             For = database.get_select_for_skip_locked()
-            selected.for_ = For('UPDATE')
+            locked.for_ = For('UPDATE')
+        ready = locked.select(
+            locked.id,
+            locked.name,
+            RowNumber(window=Window([locked.name], order_by=[
+                        locked.scheduled_at.nulls_first,
+                        locked.expected_at.nulls_first,
+                        locked.id])).as_('rank'))
+        where = Literal(True)
+        for limited, limit in cls.limits().items():
+            available = max(limit - running.get(limited, 0), 0)
+            where &= (ready.name != limited) | (ready.rank <= available)
+        weights = cls.weights()
+        if weights:
+            factor = Case(*(
+                    (ready.name == n, 1 / w) for n, w in weights.items()),
+                else_=1.)
+            share = ready.rank * factor
+        else:
+            share = ready.rank
+        selected = ready.select(
+            ready.id, where=where, order_by=[share, ready.id], limit=size)
 
         next_timeout = With('seconds', query=candidates.select(
                 Min(Extract('EPOCH',
@@ -112,46 +197,127 @@ class Queue(ModelSQL):
                     ),
                 where=candidates.scheduled_at >= CurrentTimestamp()))
 
-        task_id, seconds = None, None
+        tasks, seconds = [], None
         if database.has_returning():
             query = queue.update([queue.dequeued_at], [CurrentTimestamp()],
                 where=queue.id.in_(selected),
                 with_=[candidates, next_timeout],
                 returning=[
-                    queue.id, next_timeout.select(next_timeout.seconds)])
+                    queue.id, queue.name,
+                    next_timeout.select(next_timeout.seconds)])
             cursor.execute(*query)
-            row = cursor.fetchone()
-            if row:
-                task_id, seconds = row
+            for task_id, task_name, seconds in cursor:
+                tasks.append((task_id, task_name))
         else:
-            query = queue.select(queue.id,
+            query = queue.select(queue.id, queue.name,
                 where=queue.id.in_(selected),
                 with_=[candidates])
             cursor.execute(*query)
-            row = cursor.fetchone()
-            if row:
-                task_id, = row
+            tasks = list(map(tuple, cursor))
+            if tasks:
                 query = queue.update([queue.dequeued_at], [CurrentTimestamp()],
-                    where=queue.id == task_id)
+                    where=queue.id.in_([t for t, _ in tasks]))
                 cursor.execute(*query)
-            query = next_timeout.select(next_timeout.seconds)
+            query = next_timeout.select(
+                next_timeout.seconds, with_=[candidates, next_timeout])
             cursor.execute(*query)
             row = cursor.fetchone()
             if row:
                 seconds, = row
 
-        if not task_id and database.has_channel():
+        if not tasks and database.has_channel():
             cursor.execute('LISTEN "%s"' % cls.__name__)
-        return task_id, seconds
+        return tasks, seconds
+
+    @classmethod
+    def warm_up(cls):
+        """Fill the caches of the process before running tasks
+
+        It fills the language, the model access and the rule domains of the
+        models of the waiting tasks for their user.
+        The root user is skipped as it does not check access.
+        """
+        pool = Pool()
+        Configuration = pool.get('ir.configuration')
+        Lang = pool.get('ir.lang')
+        ModelAccess = pool.get('ir.model.access')
+        Rule = pool.get('ir.rule')
+        transaction = Transaction()
+
+        Lang.get(Configuration.get_language())
+
+        user2models = defaultdict(set)
+        tasks = cls.search([
+                ('dequeued_at', '=', None),
+                ], order=[('id', 'ASC')], limit=cls._warm_up_size)
+        for task in tasks:
+            model_name, user = task.data['model'], task.data['user']
+            try:
+                pool.get(model_name)
+            except KeyError:
+                continue
+            if user:
+                user2models[user].add(model_name)
+
+        for user, model_names in user2models.items():
+            model_names = sorted(model_names)
+            with transaction.set_user(user), check_access():
+                ModelAccess.get_access(model_names)
+                for model_name in model_names:
+                    for mode in Rule.modes:
+                        Rule.sql_get(
+                            model_name, Rule.domain_get(model_name, mode=mode))
+
+    def _coalesce(self):
+        "Return the waiting tasks to run together with this one"
+        transaction = Transaction()
+        database = transaction.database
+        cursor = transaction.connection.cursor()
+        queue = self.__table__()
+
+        size = self.data.get('coalesce')
+        if not size or not self.coalesce_key:
+            return []
+        query = queue.select(
+            queue.id,
+            where=(queue.coalesce_key == self.coalesce_key)
+            & (queue.name == self.name)
+            & (queue.id != self.id)
+            & (queue.dequeued_at == Null)
+            & ((queue.scheduled_at <= CurrentTimestamp())
+                | (queue.scheduled_at == Null)),
+            order_by=[
+                queue.scheduled_at.nulls_first,
+                queue.expected_at.nulls_first,
+                queue.id],
+            limit=size)
+        if database.has_select_for():
+            For = database.get_select_for_skip_locked()
+            query.for_ = For('UPDATE')
+        cursor.execute(*query)
+
+        tasks = []
+        count = len(self.data['instances'])
+        for task in self.browse([id_ for id_, in cursor]):
+            count += len(task.data['instances'])
+            if count > size:
+                break
+            tasks.append(task)
+        return tasks
 
     def run(self):
         transaction = Transaction()
         Model = Pool().get(self.data['model'])
         self.lock()
+        tasks = self._coalesce()
         with transaction.set_user(self.data['user']), \
                 transaction.set_context(
                     self.data['context'], _skip_warnings=True):
             instances = self.data['instances']
+            if tasks:
+                instances = list(dict.fromkeys(chain(
+                            instances,
+                            *(t.data['instances'] for t in tasks))))
             # Ensure record ids still exist
             if isinstance(instances, int):
                 with inactive_records():
@@ -174,6 +340,12 @@ class Queue(ModelSQL):
             self.dequeued_at = datetime.datetime.now()
         self.finished_at = datetime.datetime.now()
         self.save()
+        if tasks:
+            now = datetime.datetime.now()
+            self.write(tasks, {
+                    'dequeued_at': now,
+                    'finished_at': now,
+                    })
 
     @classmethod
     def retry(cls):
@@ -253,6 +425,7 @@ class _Method(object):
             scheduled_at = now + scheduled_at
         expected_at = context.pop('queue_expected_at', None)
         queue_batch = context.pop('queue_batch', None)
+        queue_coalesce = context.pop('queue_coalesce', None)
         context.pop('_check_access', None)
         context.pop('language', None)
         if expected_at is not None:
@@ -272,6 +445,12 @@ class _Method(object):
                 'args': args,
                 'kwargs': kwargs,
                 }
+            if queue_coalesce and isinstance(instances, list):
+                if isinstance(queue_coalesce, bool):
+                    data['coalesce'] = config.getint(
+                        'queue', 'batch_size', default=20)
+                else:
+                    data['coalesce'] = int(queue_coalesce)
             return self.__queue.push(
                 name, data,
                 scheduled_at=scheduled_at, expected_at=expected_at)
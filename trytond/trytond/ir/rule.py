@@ -8,6 +8,7 @@ from trytond.cache import Cache
 from trytond.i18n import gettext
 from trytond.model import Check, Index, ModelSQL, ModelView, fields
 from trytond.model.exceptions import AccessError, ValidationError
+from trytond.model.modelstorage import is_leaf
 from trytond.pool import Pool
 from trytond.pyson import Eval, If, PYSONDecoder
 from trytond.transaction import (
@@ -40,6 +41,21 @@ def _get_access_models(Model, names=None, model2field=None, path=None):
     return names, model2field
 
 
+def _get_access_dependents(model_names):
+    "Return the names of the models which depends on access of model_names"
+    pool = Pool()
+    model_names = set(model_names)
+    dependents = set()
+    for name, Model in pool.iterobject():
+        if name in model_names:
+            dependents.add(name)
+        elif Model.__access__:
+            names, _ = _get_access_models(Model)
+            if names & model_names:
+                dependents.add(name)
+    return dependents
+
+
 class RuleGroup(
         fields.fmany2one(
             'model_ref', 'model', 'ir.model,name', "Model",
@@ -143,12 +159,21 @@ class RuleGroup(
     def default_perm_delete():
         return True
 
+    @classmethod
+    def check_modification(cls, mode, groups, values=None, external=False):
+        pool = Pool()
+        Rule = pool.get('ir.rule')
+        super().check_modification(
+            mode, groups, values=values, external=external)
+        if mode == 'write' and 'model' in values:
+            Rule._clear_domain_get_cache({g.model for g in groups})
+
     @classmethod
     def on_modification(cls, mode, groups, field_names=None):
         pool = Pool()
         Rule = pool.get('ir.rule')
         super().on_modification(mode, groups, field_names=field_names)
-        Rule._domain_get_cache.clear()
+        Rule._clear_domain_get_cache({g.model for g in groups})
 
 
 class RuleGroup_Group(ModelSQL):
@@ -167,6 +192,9 @@ class Rule(ModelSQL, ModelView):
         help="Domain is evaluated with a PYSON context containing:"
         '\n- "groups" as list of ids from the current user')
     _domain_get_cache = Cache('ir_rule.domain_get', context=False)
+    _domain_sql_cache = Cache('ir_rule.domain_sql', context=False)
+    _domain_sql_tables = {}
+    _domain_sql_operators = {'=', '!=', 'in', 'not in', '<', '>', '<=', '>='}
 
     modes = {'read', 'write', 'create', 'delete'}
 
@@ -324,6 +352,60 @@ class Rule(ModelSQL, ModelView):
 
         return cls._domain_get_cache.set(key, clause)
 
+    @classmethod
+    def sql_get(cls, model_name, domain):
+        """Return the table and the SQL expression of the rule domain
+
+        The expression uses only the table which is shared by all the
+        expressions of the model.
+        None is returned if the expression can not be cached.
+        """
+        pool = Pool()
+        Model = pool.get(model_name)
+        transaction = Transaction()
+
+        if (not domain
+                or transaction.context.get('_datetime')
+                or not cls._domain_sql_cachable(Model, domain)):
+            return
+        key = (model_name, domain)
+        result = cls._domain_sql_cache.get(key)
+        if result is None:
+            table = cls._domain_sql_tables.setdefault(
+                (transaction.database.name, model_name), Model.__table__())
+            tables = {None: (table, None)}
+            tables, expression = Model.search_domain(
+                domain, active_test=False, tables=tables)
+            if len(tables) > 1:
+                result = False
+            else:
+                result = table, expression
+            cls._domain_sql_cache.set(key, result)
+        return result or None
+
+    @classmethod
+    def _domain_sql_cachable(cls, Model, domain):
+        "Test if the SQL of the domain depends only on the domain"
+        if is_leaf(domain):
+            name, operator, value = domain[:3]
+            field = Model._fields.get(name)
+            if (field is None
+                    or isinstance(field, fields.Function)
+                    or getattr(field, 'translate', False)
+                    or not field.sql_type()):
+                return False
+            if isinstance(field, fields.Many2One):
+                # 'where' embeds a search of the target which depends on
+                # the context, the user and the table size
+                if operator == 'where' or isinstance(value, str):
+                    return False
+            return operator in cls._domain_sql_operators
+        elif isinstance(domain, str):
+            return domain in {'AND', 'OR'}
+        else:
+            return (not Model._is_table_query()
+                and all(cls._domain_sql_cachable(Model, d) for d in domain))
+
     @classmethod
     def query_get(cls, model_name, mode='read'):
         pool = Pool()
@@ -376,7 +458,19 @@ class Rule(ModelSQL, ModelView):
                     rules='\n'.join(r.name for r in rules),
                     **Model.__names__()))
 
+    @classmethod
+    def check_modification(cls, mode, rules, values=None, external=False):
+        super().check_modification(
+            mode, rules, values=values, external=external)
+        if mode == 'write' and 'rule_group' in values:
+            cls._clear_domain_get_cache({r.rule_group.model for r in rules})
+
     @classmethod
     def on_modification(cls, mode, rules, field_names=None):
         super().on_modification(mode, rules, field_names=field_names)
-        cls._domain_get_cache.clear()
+        cls._clear_domain_get_cache({r.rule_group.model for r in rules})
+
+    @classmethod
+    def _clear_domain_get_cache(cls, model_names):
+        cls._domain_get_cache.clear_keys(
+            (m,) for m in _get_access_dependents(model_names))
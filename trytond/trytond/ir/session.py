@@ -2,6 +2,7 @@
 # this repository contains the full copyright notices and license terms.
 import datetime
 import json
+from hashlib import sha256
 from secrets import compare_digest, token_hex
 
 import trytond.config as config
@@ -17,6 +18,9 @@ class Session(ModelSQL):
     key = fields.Char("Key", required=True, strip=False)
     ip_address = fields.Char("IP Address")
     _session_reset_cache = Cache('ir_session.session_reset', context=False)
+    _session_check_cache = Cache(
+        'ir_session.check', context=False,
+        duration=config.getint('session', 'check_cache'))
 
     @classmethod
     def __setup__(cls):
@@ -50,6 +54,31 @@ class Session(ModelSQL):
         if mode == 'write':
             for session in sessions:
                 cls._session_reset_cache.set(session.key, session.write_date)
+        elif mode == 'delete':
+            cls._session_reset_cache.clear_keys([s.key for s in sessions])
+            keys = [
+                cls._check_cache_key(s.create_uid.id, s.key)[:2]
+                for s in sessions]
+            cls._session_check_cache.clear_keys(keys)
+            # Do not wait for the commit to stop trusting the keys in this
+            # process, the other processes are cleared once notified
+            cls._session_check_cache._clear_keys(
+                Transaction().database.name, keys)
+
+    @classmethod
+    def _check_cache_key(cls, user, key, ip_address=None):
+        return (user, sha256(key.encode('utf-8')).hexdigest(), ip_address)
+
+    @classmethod
+    def check_cached(cls, database_name, user, key, ip_address=None):
+        """
+        Return True if the key has recently been validated for the user from
+        the ip address.
+        It does not require a transaction.
+        """
+        return bool(cls._session_check_cache.peek(
+                database_name,
+                cls._check_cache_key(user, key, ip_address)))
 
     @classmethod
     def new(cls, values=None):
@@ -104,6 +133,11 @@ class Session(ModelSQL):
         cls.delete(to_delete)
         if find:
             cls._session_reset_cache.set(key, last_reset)
+            if domain is None and cls._session_check_cache.duration:
+                cls._session_check_cache.set(
+                    cls._check_cache_key(
+                        user, key, str(ip_address) if ip_address else None),
+                    True)
         return find
 
     @classmethod
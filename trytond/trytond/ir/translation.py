@@ -24,7 +24,7 @@ from trytond.i18n import gettext
 from trytond.model import Index, ModelSQL, ModelView, fields
 from trytond.pool import Pool
 from trytond.pyson import Eval, PYSONEncoder
-from trytond.tools import file_open
+from trytond.tools import file_open, grouped_slice
 from trytond.tools.string_ import LazyString, StringPartitioned
 from trytond.transaction import (
     Transaction, inactive_records, without_check_access)
@@ -117,6 +117,7 @@ class Translation(
     _translation_report_cache = Cache(
         'ir.translation.get_report', context=False)
     _get_language_cache = Cache('ir.translation.get_language', context=False)
+    _fields_ids_chunk_size = 100
 
     @classmethod
     def __setup__(cls):
@@ -534,6 +535,111 @@ class Translation(
                         (name, ttype, lang, res_id), value)
         return translations
 
+    @classmethod
+    def get_fields_ids(
+            cls, model_name, field_names, lang, ids, cached_after=None):
+        """Return translation of each field name for each id
+
+        The translations of all the fields and the parent languages are
+        fetched in a single query and cached per field, language and chunk of
+        ids.
+        """
+        if model_name in {'ir.model', 'ir.model.field'}:
+            return {
+                f: cls.get_ids(
+                    model_name + ',' + f, 'model', lang, ids,
+                    cached_after=cached_after)
+                for f in field_names}
+        context = Transaction().context
+        fuzzy_translation = context.get('fuzzy_translation', False)
+        lang = str(lang)
+        # Don't use cache for fuzzy translation
+        use_cache = (not fuzzy_translation
+            and (not cached_after
+                or not cls._translation_cache.sync_since(cached_after)))
+
+        chunk_size = cls._fields_ids_chunk_size
+
+        def cache_key(field_name, chunk):
+            return (model_name + ',' + field_name, 'model', lang, None, chunk)
+
+        translations, segments, to_fetch = {}, {}, {}
+        for field_name in field_names:
+            translations[field_name] = field_translations = {}
+            if use_cache:
+                segments[field_name] = chunks = {}
+                missing = []
+                for id_ in ids:
+                    chunk = id_ // chunk_size
+                    try:
+                        segment = chunks[chunk]
+                    except KeyError:
+                        segment = chunks[chunk] = cls._translation_cache.get(
+                            cache_key(field_name, chunk), {})
+                    try:
+                        field_translations[id_] = segment[id_]
+                    except KeyError:
+                        missing.append(id_)
+            else:
+                missing = ids
+            if missing:
+                to_fetch[field_name] = missing
+
+        if to_fetch:
+            fetched = cls._fetch_fields_ids(
+                model_name, to_fetch, lang, fuzzy_translation)
+            for field_name, missing in to_fetch.items():
+                values = {
+                    id_: fetched.get((field_name, id_)) for id_ in missing}
+                translations[field_name].update(values)
+                if use_cache:
+                    chunks = defaultdict(dict)
+                    for id_, value in values.items():
+                        chunks[id_ // chunk_size][id_] = value
+                    for chunk, chunk_values in chunks.items():
+                        segment = dict(segments[field_name][chunk])
+                        segment.update(chunk_values)
+                        cls._translation_cache.set(
+                            cache_key(field_name, chunk), segment)
+        return translations
+
+    @classmethod
+    def _fetch_fields_ids(cls, model_name, to_fetch, lang, fuzzy_translation):
+        "Return the translation for each (field name, id) of to_fetch"
+        transaction = Transaction()
+        cursor = transaction.connection.cursor()
+        table = cls.__table__()
+
+        langs = [lang]
+        while (parent := get_parent(langs[-1])) and parent not in langs:
+            langs.append(parent)
+        priorities = {c: i for i, c in enumerate(langs)}
+        names = {model_name + ',' + f: f for f in to_fetch}
+
+        where = (table.lang.in_(langs)
+            & (table.type == 'model')
+            & table.name.in_(list(names))
+            & (table.value != '')
+            & (table.value != Null))
+        if not fuzzy_translation:
+            where &= table.fuzzy == Literal(False)
+
+        fetched, priority = {}, {}
+        ids = set().union(*to_fetch.values())
+        for sub_ids in grouped_slice(ids, backend.MAX_QUERY_PARAMS):
+            cursor.execute(*table.select(
+                    table.name, table.res_id, table.lang, table.value,
+                    where=where & fields.SQL_OPERATORS['in'](
+                        table.res_id, sub_ids),
+                    order_by=table.id.asc))
+            for name, res_id, lang, value in cursor:
+                # The last translation of the closest language wins
+                key = names[name], res_id
+                if key not in fetched or priorities[lang] <= priority[key]:
+                    fetched[key] = value
+                    priority[key] = priorities[lang]
+        return fetched
+
     @classmethod
     @without_check_access
     def set_ids(cls, name, ttype, lang, ids, values):
@@ -794,6 +900,14 @@ class Translation(
             values['module'] = context.get('module')
         return values
 
+    @classmethod
+    def check_modification(
+            cls, mode, translations, values=None, external=False):
+        super().check_modification(
+            mode, translations, values=values, external=external)
+        if mode == 'write' and values.keys() & {'name', 'type'}:
+            cls.__clear_cache_for(translations)
+
     @classmethod
     def on_modification(cls, mode, translations, field_names=None):
         super().on_modification(mode, translations, field_names=field_names)
@@ -801,8 +915,12 @@ class Translation(
 
     @classmethod
     def __clear_cache_for(cls, translations):
-        cls._translation_cache.clear()
-        cls._translation_report_cache.clear()
+        # The parent languages are used as fallback so all the languages of
+        # the same name must be cleared
+        cls._translation_cache.clear_keys(
+            {(t.name, t.type) for t in translations})
+        cls._translation_report_cache.clear_keys(
+            {(t.name,) for t in translations if t.type == 'report'})
         types = {t.type for t in translations}
         models = {t.model for t in translations}
         cls._clear_cache_for(types, models)
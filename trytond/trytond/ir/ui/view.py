@@ -290,12 +290,36 @@ class View(
     def set_arch(cls, views, name, value):
         cls.write(views, {'data': value})
 
+    @classmethod
+    def check_modification(cls, mode, views, values=None, external=False):
+        super().check_modification(
+            mode, views, values=values, external=external)
+        if mode == 'write' and 'inherit' in values:
+            cls._clear_view_get_cache(views)
+
     @classmethod
     def on_modification(cls, mode, records, field_names=None):
         super().on_modification(mode, records, field_names=field_names)
-        cls._view_get_cache.clear()
+        cls._clear_view_get_cache(records)
         ModelView._fields_view_get_cache.clear()
 
+    @classmethod
+    def _clear_view_get_cache(cls, views):
+        "Clear view_get cache of views, their ancestors and extensions"
+        view_ids = set()
+        for view in views:
+            while view and view.id not in view_ids:
+                view_ids.add(view.id)
+                view = view.inherit
+        extension_ids = view_ids
+        while extension_ids:
+            extension_ids = {
+                v.id for v in cls.search([
+                        ('inherit', 'in', list(extension_ids)),
+                        ])} - view_ids
+            view_ids |= extension_ids
+        cls._view_get_cache.clear_keys((i,) for i in view_ids)
+
     @property
     def _module_index(self):
         from trytond.modules import create_graph, get_modules
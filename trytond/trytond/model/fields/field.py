@@ -1,6 +1,7 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 import warnings
+from collections import defaultdict
 from functools import partial, wraps
 
 import sql
@@ -181,9 +182,8 @@ def instantiate_context(field, record):
     ctx = {}
     if field.context:
         pyson_context = PYSONEncoder().encode(field.context)
-        ctx.update(PYSONDecoder(
-                EvalEnvironment(record, record.__class__)).decode(
-                pyson_context))
+        ctx.update(PYSONDecoder.compile(pyson_context)(
+                EvalEnvironment(record, record.__class__)))
     datetime_ = None
     if getattr(field, 'datetime_field', None):
         datetime_ = getattr(record, field.datetime_field, None)
@@ -191,6 +191,15 @@ def instantiate_context(field, record):
     return ctx
 
 
+def x2many_values(pairs):
+    "Return the target ids per origin id from the ordered pairs"
+    result = defaultdict(list)
+    for origin_id, target_id in pairs:
+        result[origin_id].append(target_id)
+    return defaultdict(
+        tuple, ((key, tuple(value)) for key, value in result.items()))
+
+
 def on_change_result(record):
     return record._changed_values()
 
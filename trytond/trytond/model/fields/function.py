@@ -31,7 +31,7 @@ def getter_context(func):
 class Function(Field):
 
     def __init__(self, field, getter=None, setter=None, searcher=None,
-            getter_with_context=True, loading='lazy'):
+            getter_with_context=True, loading='lazy', parallel=False):
         '''
         :param field: The field of the function.
         :param getter: The name of the function for getting values.
@@ -39,12 +39,15 @@ class Function(Field):
         :param searcher: The name of the function to search.
         :param loading: Define how the field must be loaded:
             ``lazy`` or ``eager``.
+        :param parallel: A boolean telling if the getter can be called
+            concurrently with other getters.
         '''
         assert isinstance(field, Field)
         self._field = field
         self._type = field._type
         self.getter = getter
         self.getter_with_context = getter_with_context
+        self.parallel = parallel
         self.setter = setter
         if not self.setter:
             self._field.readonly = True
@@ -60,13 +63,13 @@ class Function(Field):
         return Function(copy.copy(self._field), self.getter,
             setter=self.setter, searcher=self.searcher,
             getter_with_context=self.getter_with_context,
-            loading=self.loading)
+            loading=self.loading, parallel=self.parallel)
 
     def __deepcopy__(self, memo):
         return Function(copy.deepcopy(self._field, memo), self.getter,
             setter=self.setter, searcher=self.searcher,
             getter_with_context=self.getter_with_context,
-            loading=self.loading)
+            loading=self.loading, parallel=self.parallel)
 
     def __getattr__(self, name):
         return getattr(self._field, name)
@@ -140,6 +143,7 @@ class Function(Field):
                         'many2one', 'reference',
                         'one2many', 'many2many', 'one2one'}:
                     records._local_cache[id][fname] = val
+            records._local_cache.account(id)
 
         def call(name):
             if not instance_method:
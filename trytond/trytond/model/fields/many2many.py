@@ -3,7 +3,7 @@
 import warnings
 from collections import defaultdict
 
-from sql import Literal, Null
+from sql import Column, Literal, Null
 from sql.conditionals import Coalesce
 
 from trytond.pool import Pool
@@ -14,7 +14,7 @@ from trytond.transaction import Transaction
 from .field import (
     SQL_OPERATORS, Field, context_validate, domain_method, domain_validate,
     get_eval_fields, instanciate_values, instantiate_context,
-    search_order_validate, size_validate)
+    search_order_validate, size_validate, x2many_values)
 
 
 class Many2Many(Field):
@@ -124,15 +124,10 @@ class Many2Many(Field):
     def sql_type(self):
         return None
 
-    def get(self, ids, model, name, values=None):
-        '''
-        Return target records ordered.
-        '''
-        result = defaultdict(list)
-
+    def _get_search(self, ids, model):
+        "Return the domain and the order to search the relations of ids"
         Relation = self.get_relation()
         origin_field = Relation._fields[self.origin]
-        reference_key = origin_field._type == 'reference'
 
         if origin_field.sortable(Relation):
             if origin_field._type == 'reference':
@@ -146,7 +141,7 @@ class Many2Many(Field):
         else:
             order += self.order
 
-        if reference_key:
+        if origin_field._type == 'reference':
             references = ['%s,%s' % (model.__name__, x) for x in ids]
             clause = [(self.origin, 'in', references)]
         else:
@@ -154,10 +149,48 @@ class Many2Many(Field):
         clause += [(self.target, '!=', None)]
         if self.filter:
             clause.append((self.target, 'where', self.filter))
+        return clause, order
+
+    def _get_query(self, ids, model):
+        """Return the query of the ordered origin and target ids
+        or None if the relation is not stored in a table"""
+        from ..modelsql import ModelSQL
+        Relation = self.get_relation()
+        origin_field = Relation._fields[self.origin]
+        if (not issubclass(Relation, ModelSQL)
+                or hasattr(origin_field, 'get')
+                or hasattr(Relation._fields[self.target], 'get')):
+            return
+        clause, order = self._get_search(ids, model)
+        query = Relation.search(clause, order=order, query=True)
+        table = query.columns[0].expression.table
+        origin = Column(table, self.origin)
+        if origin_field._type == 'reference':
+            origin = origin_field.sql_id(origin, Relation)
+        query.columns = [
+            origin.as_('origin'),
+            Column(table, self.target).as_('target'),
+            ]
+        return query
+
+    def get(self, ids, model, name, values=None):
+        '''
+        Return target records ordered.
+        '''
+        query = self._get_query(ids, model)
+        if query is not None:
+            cursor = Transaction().connection.cursor()
+            cursor.execute(*query)
+            return x2many_values(cursor)
+
+        Relation = self.get_relation()
+        reference_key = Relation._fields[self.origin]._type == 'reference'
+        clause, order = self._get_search(ids, model)
         to_read = Relation.search(clause, order=order).ids
         relations = {t['id']: t
             for t in Relation.read(to_read, [self.origin, self.target])}
 
+        pairs = []
         for read_id in to_read:
             relation = relations[read_id]
             if reference_key:
@@ -165,9 +198,8 @@ class Many2Many(Field):
                 origin_id = int(origin_id)
             else:
                 origin_id = relation[self.origin]
-            result[origin_id].append(relation[self.target])
-        return defaultdict(
-            tuple, ((key, tuple(value)) for key, value in result.items()))
+            pairs.append((origin_id, relation[self.target]))
+        return x2many_values(pairs)
 
     def set(self, Model, name, ids, values, *args):
         '''
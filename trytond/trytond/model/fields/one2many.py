@@ -3,7 +3,7 @@
 import warnings
 from collections import defaultdict
 
-from sql import Literal
+from sql import Column, Literal
 from sql.conditionals import Coalesce
 from sql.operators import Exists
 
@@ -16,7 +16,7 @@ from trytond.transaction import Transaction
 from .field import (
     Field, context_validate, domain_method, domain_validate, get_eval_fields,
     instanciate_values, instantiate_context, search_order_validate,
-    size_validate)
+    size_validate, x2many_values)
 
 
 class One2Many(Field):
@@ -133,17 +133,13 @@ class One2Many(Field):
             domain_validate(value)
         self.__filter = value
 
-    def get(self, ids, model, name, values=None):
-        '''
-        Return target records ordered.
-        '''
+    def _get_search(self, ids, model):
+        "Return the domain and the order to search the targets of ids"
         Target = self.get_target()
         field = Target._fields[self.field]
-        reference_key = field._type == 'reference'
-        result = defaultdict(list)
 
         if field.sortable(Target):
-            if reference_key:
+            if field._type == 'reference':
                 order = [(self.field, None)]
             else:
                 order = [(self.field + '.id', None)]
@@ -155,17 +151,50 @@ class One2Many(Field):
             order += [
                 (oexpr, otype) for oexpr, otype in Target._order
                 if not oexpr.startswith(f'{self.field}.')]
-        if reference_key:
+        if field._type == 'reference':
             references = ['%s,%s' % (model.__name__, x) for x in ids]
             clause = [(self.field, 'in', references)]
         else:
             clause = [(self.field, 'in', ids)]
         if self.filter:
             clause.append(self.filter)
+        return clause, order
+
+    def _get_query(self, ids, model):
+        """Return the query of the ordered origin and target ids
+        or None if the target is not stored in a table"""
+        from ..modelsql import ModelSQL
+        Target = self.get_target()
+        field = Target._fields[self.field]
+        if not issubclass(Target, ModelSQL) or hasattr(field, 'get'):
+            return
+        clause, order = self._get_search(ids, model)
+        query = Target.search(clause, order=order, query=True)
+        target = query.columns[0].expression
+        origin = Column(target.table, self.field)
+        if field._type == 'reference':
+            origin = field.sql_id(origin, Target)
+        query.columns = [origin.as_('origin'), target.as_('target')]
+        return query
+
+    def get(self, ids, model, name, values=None):
+        '''
+        Return target records ordered.
+        '''
+        query = self._get_query(ids, model)
+        if query is not None:
+            cursor = Transaction().connection.cursor()
+            cursor.execute(*query)
+            return x2many_values(cursor)
+
+        Target = self.get_target()
+        reference_key = Target._fields[self.field]._type == 'reference'
+        clause, order = self._get_search(ids, model)
         to_read = Target.search(clause, order=order).ids
         targets = {t['id']: t
             for t in Target.read(to_read, ['id', self.field])}
 
+        pairs = []
         for read_id in to_read:
             target = targets[read_id]
             if reference_key:
@@ -173,9 +202,8 @@ class One2Many(Field):
                 origin_id = int(origin_id)
             else:
                 origin_id = target[self.field]
-            result[origin_id].append(target['id'])
-        return defaultdict(
-            tuple, ((key, tuple(value)) for key, value in result.items()))
+            pairs.append((origin_id, target['id']))
+        return x2many_values(pairs)
 
     def set(self, Model, name, ids, values, *args):
         '''
@@ -1,13 +1,16 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 import datetime
+import threading
 from collections import defaultdict
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from functools import partial, wraps
 from itertools import groupby, product, repeat
 
 from sql import (
-    Asc, Column, Desc, Expression, Literal, Null, NullsFirst, NullsLast, Table,
-    Union, Window, With)
+    Asc, Column, Desc, Expression, Literal, Null, NullsFirst, NullsLast, Query,
+    Select, Table, Union, Window, With)
 from sql.aggregate import Count, Max
 from sql.conditionals import Coalesce
 from sql.functions import CurrentTimestamp, Extract, RowNumber, Substring
@@ -23,17 +26,59 @@ from trytond.rpc import RPC
 from trytond.sql.functions import Range
 from trytond.tools import grouped_slice
 from trytond.tools.domain_inversion import simplify
+from trytond.tools.multiprocessing import local
 from trytond.transaction import (
     Transaction, inactive_records, record_cache_size, without_check_access)
 
 from . import fields
 from .descriptors import dualmethod
+from .fields.field import x2many_values
 from .modelstorage import (
     AccessError, BrowseList, ModelStorage, RequiredValidationError,
     SizeValidationError, ValidationError, is_leaf)
 from .modelview import ModelView
 
 
+class _GetterLocal(local):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.workers = None
+        self.executor = None
+        self.slots = None
+
+
+_getter_local = _GetterLocal()
+
+
+def _getter_executor(workers):
+    """Return the executor of the parallel getters of the process and the
+    semaphore of its free workers"""
+    # Keep at least half of the connections for the transactions
+    maxconn = config.getint('database', 'maxconn', default=64)
+    workers = max(min(workers, maxconn // 2), 1)
+    with _getter_local.lock:
+        if _getter_local.workers != workers:
+            if _getter_local.executor:
+                _getter_local.executor.shutdown(wait=False)
+            _getter_local.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='getter')
+            _getter_local.slots = threading.BoundedSemaphore(workers)
+            _getter_local.workers = workers
+        return _getter_local.executor, _getter_local.slots
+
+
+def _parallel_getter(
+        database_name, user, context, snapshot, model_name, name, ids, names,
+        values):
+    "Call the getter of the field in a transaction sharing the snapshot"
+    with Transaction().start(
+            database_name, user, readonly=True, context=context,
+            _snapshot=snapshot):
+        Model = Pool().get(model_name)
+        return Model._fields[name].get(ids, Model, names, values=values)
+
+
 class ForeignKeyError(ValidationError):
     pass
 
@@ -1003,6 +1048,19 @@ class ModelSQL(ModelStorage):
     @classmethod
     @no_table_query
     def create(cls, vlist):
+        transaction = Transaction()
+        if '_create_copy' in transaction.context:
+            # The bulk mode applies only to the rows of this call and not to
+            # the records created by the fields
+            context = transaction.context.copy()
+            create_copy = context.pop('_create_copy')
+            with transaction.reset_context(), \
+                    transaction.set_context(context):
+                return cls.__create(vlist, create_copy)
+        return cls.__create(vlist, False)
+
+    @classmethod
+    def __create(cls, vlist, create_copy):
         transaction = Transaction()
         cursor = transaction.connection.cursor(row_factory=backend.scalar_row)
         pool = Pool()
@@ -1016,8 +1074,22 @@ class ModelSQL(ModelStorage):
         missing_defaults = {}  # Store missing default values by schema
         new_ids = []
 
+        copy = create_copy and transaction.database.has_copy()
+        if copy:
+            cursor.execute(*Select([CurrentTimestamp().cast('TIMESTAMP')]))
+            create_date, = cursor
+        else:
+            create_date = CurrentTimestamp()
+
         def db_insert(columns, vlist, column_names):
-            if transaction.database.has_multirow_insert():
+            # COPY streams all the rows at once but the INSERT of expressions
+            # must respect the maximum number of parameters
+            copy_from = copy and not any(
+                isinstance(v, (Expression, Query))
+                for val in vlist for v in val)
+            if copy_from:
+                vlist = [vlist]
+            elif transaction.database.has_multirow_insert():
                 vlist = (
                     s for s in grouped_slice(
                         vlist,
@@ -1038,7 +1110,12 @@ class ModelSQL(ModelStorage):
                             cols.append(table.id)
                             for val, id in zip(values, ids):
                                 val.append(id)
-                            cursor.execute(*table.insert(cols, values))
+                            if copy_from:
+                                transaction.database.copy_from(
+                                    transaction.connection, cls._table,
+                                    [c.name for c in cols], values)
+                            else:
+                                cursor.execute(*table.insert(cols, values))
                             yield from ids
                             continue
                     for i, val in enumerate(values):
@@ -1113,7 +1190,7 @@ class ModelSQL(ModelStorage):
 
             current_column_names = []
             current_columns = [table.create_uid, table.create_date]
-            current_values = [transaction.user, CurrentTimestamp()]
+            current_values = [transaction.user, create_date]
 
             # Insert record
             for fname, value in sorted(values.items()):
@@ -1233,6 +1310,11 @@ class ModelSQL(ModelStorage):
             history_clause = (column <= Transaction().context['_datetime'])
             history_order = (column.desc, Column(table, '__id').desc)
             history_limit = 1
+        rule_sql = None
+        if domain and not history_clause:
+            rule_sql = Rule.sql_get(cls.__name__, domain)
+            if rule_sql:
+                table, _ = rule_sql
         tables = {None: (table, None)}
 
         columns = {}
@@ -1255,8 +1337,14 @@ class ModelSQL(ModelStorage):
                     # clause.
                     if rule_domain and rule_domain != domain:
                         rule_tables = {None: (table, None)}
-                        rule_tables, rule_expression = cls.search_domain(
-                            rule_domain, active_test=False, tables=rule_tables)
+                        rule_sql_mode = Rule.sql_get(
+                            cls.__name__, rule_domain)
+                        if rule_sql_mode and rule_sql_mode[0] is table:
+                            _, rule_expression = rule_sql_mode
+                        else:
+                            rule_tables, rule_expression = cls.search_domain(
+                                rule_domain, active_test=False,
+                                tables=rule_tables)
                         if len(rule_tables) > 1:
                             # The expression uses another table
                             rule_tables, rule_expression = cls.search_domain(
@@ -1285,7 +1373,9 @@ class ModelSQL(ModelStorage):
             if 'id' not in fields_names:
                 columns['id'] = table.id.as_('id')
 
-            if domain:
+            if rule_sql:
+                _, dom_exp = rule_sql
+            elif domain:
                 tables, dom_exp = cls.search_domain(
                     domain, active_test=False, tables=tables)
             from_ = convert_from(None, tables)
@@ -1311,20 +1401,25 @@ class ModelSQL(ModelStorage):
         max_write_date = max(
             (r['write_date'] for r in result if r.get('write_date')),
             default=None)
+        translated_fields = []
         for fname, column in columns.items():
             if fname.startswith('_'):
                 continue
             field = cls._fields[fname]
             if not hasattr(field, 'get'):
                 if getattr(field, 'translate', False):
-                    translations = Translation.get_ids(
-                        cls.__name__ + ',' + fname, 'model',
-                        Transaction().language, ids,
-                        cached_after=max_write_date)
-                    for row in result:
-                        row[fname] = translations.get(row['id']) or row[fname]
+                    translated_fields.append(fname)
                 if fname != 'id':
                     cachable_fields.append(fname)
+        if translated_fields:
+            translations = Translation.get_fields_ids(
+                cls.__name__, translated_fields, Transaction().language, ids,
+                cached_after=max_write_date)
+            for fname in translated_fields:
+                field_translations = translations[fname]
+                for row in result:
+                    row[fname] = (
+                        field_translations.get(row['id']) or row[fname])
 
         # all fields for which there is a get attribute
         getter_fields = [f for f in all_fields
@@ -1336,7 +1431,9 @@ class ModelSQL(ModelStorage):
             for row in result:
                 for fname in cachable_fields:
                     cache[row['id']][fname] = row[fname]
+                cache.account(row['id'])
 
+        x2many_results = cls.__read_x2many(ids, getter_fields)
         func_fields = {}
         for fname in getter_fields:
             field = cls._fields[fname]
@@ -1355,25 +1452,62 @@ class ModelSQL(ModelStorage):
                     row[fname] = date_result[row['id']]
             else:
                 # get the value of that field for all records/ids
-                getter_result = field.get(ids, cls, fname, values=result)
+                getter_result = x2many_results.get(fname)
+                if getter_result is None:
+                    getter_result = field.get(ids, cls, fname, values=result)
                 for row in result:
                     row[fname] = getter_result[row['id']]
 
-        for key in func_fields:
-            field_list = func_fields[key]
-            fname = field_list[0]
-            field = cls._fields[fname]
-            _, getter_with_context, datetime_field = key
-            if datetime_field:
-                for row in result:
-                    with Transaction().set_context(
-                            _datetime=row[datetime_field]):
-                        date_results = field.get([row['id']], cls, field_list,
-                            values=[row])
-                    for fname in field_list:
-                        date_result = date_results[fname]
-                        row[fname] = date_result[row['id']]
-            else:
+        parallel_keys = set()
+        getter_workers = config.getint('database', 'getter_workers')
+        if (getter_workers
+                and len(func_fields) > 1
+                and transaction.readonly
+                and transaction.context.get('_parallel_getters', True)
+                and transaction.database.has_snapshot()):
+            parallel_keys = {
+                key for key, field_list in func_fields.items()
+                if not key[2]
+                and all(
+                    getattr(cls._fields[f], 'parallel', False)
+                    for f in field_list)}
+        futures = []
+        if parallel_keys:
+            executor, slots = _getter_executor(getter_workers)
+            parallel_getter = partial(
+                _parallel_getter, transaction.database.name, transaction.user,
+                {**transaction.context, '_parallel_getters': False},
+                transaction.database.export_snapshot(transaction.connection),
+                cls.__name__)
+
+        def set_getter_results(
+                field_list, getter_with_context, sub_values, getter_results):
+            for fname in field_list:
+                getter_result = getter_results[fname]
+                for row in sub_values:
+                    row[fname] = getter_result[row['id']]
+                    if (transaction.readonly
+                            and not getter_with_context):
+                        cache[row['id']][fname] = row[fname]
+
+        try:
+            # Submit first the parallel getters to run them with the others
+            for key in sorted(
+                    func_fields, key=lambda k: k not in parallel_keys):
+                field_list = func_fields[key]
+                fname = field_list[0]
+                field = cls._fields[fname]
+                _, getter_with_context, datetime_field = key
+                if datetime_field:
+                    for row in result:
+                        with Transaction().set_context(
+                                _datetime=row[datetime_field]):
+                            date_results = field.get(
+                                [row['id']], cls, field_list, values=[row])
+                        for fname in field_list:
+                            date_result = date_results[fname]
+                            row[fname] = date_result[row['id']]
+                    continue
                 for sub_results in grouped_slice(
                         result, record_cache_size(transaction)):
                     sub_results = list(sub_results)
@@ -1388,16 +1522,35 @@ class ModelSQL(ModelStorage):
                         else:
                             for fname in field_list:
                                 row[fname] = cache[row['id']][fname]
-                    if sub_ids:
+                    if not sub_ids:
+                        continue
+                    # The getter is called in the current thread when all the
+                    # workers are busy to not wait for a connection
+                    if (key in parallel_keys
+                            and slots.acquire(blocking=False)):
+                        # The rows are copied because they are filled
+                        # concurrently
+                        future = executor.submit(
+                            parallel_getter, fname, sub_ids, field_list,
+                            [dict(r) for r in sub_values])
+                        future.add_done_callback(lambda f: slots.release())
+                        futures.append(
+                            (field_list, getter_with_context, sub_values,
+                                future))
+                    else:
                         getter_results = field.get(
                             sub_ids, cls, field_list, values=sub_values)
-                        for fname in field_list:
-                            getter_result = getter_results[fname]
-                            for row in sub_values:
-                                row[fname] = getter_result[row['id']]
-                                if (transaction.readonly
-                                        and not getter_with_context):
-                                    cache[row['id']][fname] = row[fname]
+                        set_getter_results(
+                            field_list, getter_with_context, sub_values,
+                            getter_results)
+            for field_list, getter_with_context, sub_values, future in futures:
+                set_getter_results(
+                    field_list, getter_with_context, sub_values,
+                    future.result())
+        finally:
+            for *_, future in futures:
+                future.cancel()
+            wait_futures([f for *_, f in futures])
 
         def read_related(field, Target, rows, fields):
             name = field.name
@@ -1470,12 +1623,14 @@ class ModelSQL(ModelStorage):
                 continue
             field = cls._fields[fname]
             datetime_field = getattr(field, 'datetime_field', None)
+            if field.context:
+                eval_context = PYSONDecoder.compile(
+                    PYSONEncoder().encode(field.context))
 
             def groupfunc(row):
                 ctx = {}
                 if field.context:
-                    pyson_context = PYSONEncoder().encode(field.context)
-                    ctx.update(PYSONDecoder(row).decode(pyson_context))
+                    ctx.update(eval_context(row))
                 if datetime_field:
                     ctx['_datetime'] = row.get(datetime_field)
                 if field._type in {'selection', 'multiselection'}:
@@ -1512,6 +1667,54 @@ class ModelSQL(ModelStorage):
 
         return cls._after_read(result)
 
+    @classmethod
+    def __read_x2many(cls, ids, field_names):
+        "Return the values of the x2many fields read with UNION queries"
+        cursor = Transaction().connection.cursor()
+        values = {}
+        # Only the fields which get their values from their query
+        field_names = [
+            f for f in field_names
+            if not isinstance(cls._fields[f], fields.Function)
+            and not getattr(cls._fields[f], 'datetime_field', None)
+            and type(cls._fields[f]).get in {
+                fields.One2Many.get, fields.Many2Many.get}]
+        if len(field_names) < 2:
+            return values
+
+        queries = {}
+        for fname in field_names:
+            query = cls._fields[fname]._get_query(ids, cls)
+            if query is not None:
+                # The order of each query is kept by the sequence column
+                query.columns += (
+                    RowNumber(window=Window([], order_by=query.order_by)
+                        ).as_('sequence'),)
+                query.order_by = None
+                queries[fname] = query
+
+        size = max(backend.MAX_QUERY_PARAMS // len(ids), 2)
+        for sub_names in grouped_slice(list(queries), size):
+            sub_names = list(sub_names)
+            sub_queries = []
+            for index, fname in enumerate(sub_names):
+                query = queries[fname]
+                query.columns += (Literal(index).as_('field'),)
+                sub_queries.append(query)
+            if len(sub_queries) > 1:
+                union = Union(*sub_queries, all_=True)
+            else:
+                union, = sub_queries
+            cursor.execute(*union.select(
+                    union.field, union.origin, union.target,
+                    order_by=[union.field, union.sequence]))
+            pairs = defaultdict(list)
+            for index, origin, target in cursor:
+                pairs[sub_names[index]].append((origin, target))
+            for fname in sub_names:
+                values[fname] = x2many_values(pairs[fname])
+        return values
+
     @classmethod
     @no_table_query
     def write(cls, records, values, *args):
@@ -1901,11 +2104,18 @@ class ModelSQL(ModelStorage):
                 None: (Union(*union_tables, all_=False), None),
                 }
         else:
-            tables, expression = cls.search_domain(domain)
-            if rule_domain:
-                tables, domain_exp = cls.search_domain(
-                    rule_domain, active_test=False, tables=tables)
+            rule_sql = Rule.sql_get(cls.__name__, rule_domain)
+            if rule_sql:
+                table, domain_exp = rule_sql
+                tables, expression = cls.search_domain(
+                    domain, tables={None: (table, None)})
                 expression &= domain_exp
+            else:
+                tables, expression = cls.search_domain(domain)
+                if rule_domain:
+                    tables, domain_exp = cls.search_domain(
+                        rule_domain, active_test=False, tables=tables)
+                    expression &= domain_exp
 
         return tables, expression, orderings
 
@@ -2031,11 +2241,42 @@ class ModelSQL(ModelStorage):
                     for k in no_cache:
                         del data[k]
                     cache[cls.__name__][data['id']]._update(data)
+                    cache[cls.__name__].account(data['id'])
         else:
             ids = cursor
 
         return cls.browse(ids)
 
+    @classmethod
+    def __search_iter_ids(cls, domain, order, size):
+        transaction = Transaction()
+        if size is None:
+            size = config.getint('database', 'fetch_size')
+        query = cls.search(domain, order=order, query=True)
+        cursor = transaction.database.server_cursor(
+            transaction.connection, row_factory=backend.scalar_row,
+            size=size)
+        try:
+            cursor.execute(*query)
+            while ids := cursor.fetchmany(size):
+                yield ids
+        finally:
+            cursor.close()
+
+    @classmethod
+    def search_iter(cls, domain, order=None, size=None):
+        "Yield the records that match the domain fetched by batch of size"
+        for ids in cls.__search_iter_ids(domain, order, size):
+            yield from cls.browse(ids)
+
+    @classmethod
+    def read_iter(cls, domain, fields_names, order=None, size=None):
+        "Yield the values of the records that match the domain by batch"
+        for ids in cls.__search_iter_ids(domain, order, size):
+            rows = {r['id']: r for r in cls.read(ids, fields_names)}
+            for id_ in ids:
+                yield rows[id_]
+
     @classmethod
     def search_domain(cls, domain, active_test=None, tables=None):
         '''
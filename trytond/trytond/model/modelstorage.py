@@ -6,6 +6,7 @@ import csv
 import datetime
 import decimal
 import json
+import logging
 import math
 import random
 import sys
@@ -18,7 +19,10 @@ from io import StringIO
 from itertools import chain, groupby, islice, tee
 from operator import itemgetter
 
+from sql import Literal, Union
+
 import trytond.config as config
+from trytond import backend
 from trytond.cache import Cache, LRUDictTransaction, freeze, unfreeze
 from trytond.const import OPERATORS
 from trytond.exceptions import UserError
@@ -28,23 +32,94 @@ from trytond.pyson import PYSON, PYSONDecoder, PYSONEncoder
 from trytond.rpc import RPC
 from trytond.tools import (
     grouped_slice, is_instance_method, likify, reduce_domain)
+from trytond.tools.domain_inversion import OPERATORS as DOMAIN_OPERATORS
 from trytond.tools.domain_inversion import domain_inversion, eval_domain
 from trytond.tools.domain_inversion import parse as domain_parse
 from trytond.transaction import (
-    Transaction, check_access, inactive_records, record_cache_size,
-    without_check_access)
+    Transaction, check_access, inactive_records, record_cache_memory,
+    record_cache_size, without_check_access)
 
 from . import fields
 from .descriptors import dualmethod
 from .model import Model
 
 __all__ = ['ModelStorage', 'BrowseList', 'EvalEnvironment']
+logger = logging.getLogger(__name__)
 
 
 def local_cache(Model, transaction=None):
     if transaction is None:
         transaction = Transaction()
-    return LRUDictTransaction(record_cache_size(transaction), Model._record)
+    return LRUDictTransaction(
+        record_cache_size(transaction), Model._record,
+        memory_budget=record_cache_memory(transaction))
+
+
+def _prefetch_tree(paths):
+    "Return the tree of field names of the paths"
+    tree = {}
+    for path in paths:
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _prefetch(Model, ids, tree, transaction_cache):
+    "Fill the transaction cache with the tree of fields for the ids"
+    pool = Pool()
+    transaction = Transaction()
+    delete_records = transaction.delete_records.get(Model.__name__, set())
+    ids = [i for i in dict.fromkeys(ids) if i not in delete_records]
+    if not ids:
+        return
+    cache = transaction_cache[Model.__name__]
+    field_names = tree.keys()
+
+    def cached(id_):
+        return (id_ in cache
+            and field_names <= set(cache[id_]._keys()))
+    values = {
+        i: {n: cache[i][n] for n in field_names}
+        for i in ids if cached(i)}
+    to_read = [i for i in ids if i not in values]
+    if to_read:
+        no_cache = {
+            n for n in field_names
+            if isinstance(Model._fields[n], fields.Function)
+            and (not transaction.readonly
+                or Model._fields[n].getter_with_context)}
+        for data in Model.read(to_read, list(field_names)):
+            values[data['id']] = data
+            cache[data['id']]._update(
+                **{k: v for k, v in data.items() if k not in no_cache})
+            cache.account(data['id'])
+
+    for name, subtree in tree.items():
+        field = Model._fields[name]
+        if (not subtree
+                or field.context
+                or getattr(field, 'datetime_field', None)):
+            continue
+        targets = defaultdict(list)
+        for data in values.values():
+            value = data[name]
+            if field._type == 'reference':
+                try:
+                    model_name, record_id = value.split(',')
+                    record_id = int(record_id)
+                except (AttributeError, ValueError):
+                    continue
+                if record_id >= 0:
+                    targets[model_name].append(record_id)
+            elif field._type in {'many2one', 'one2one'}:
+                if value is not None:
+                    targets[field.get_target().__name__].append(value)
+            elif field._type in {'one2many', 'many2many'}:
+                targets[field.get_target().__name__].extend(value or [])
+        for model_name, target_ids in targets.items():
+            _prefetch(
+                pool.get(model_name), target_ids, subtree, transaction_cache)
 
 
 class AccessError(UserError):
@@ -1403,7 +1478,8 @@ class ModelStorage(Model):
                                 zip(([r] for r in records), translated))))
         count = 0
         if to_create:
-            records = cls.create(to_create)
+            with Transaction().set_context(_create_copy=True):
+                records = cls.create(to_create)
             translate(records, to_create_translations)
             count += len(records)
         if to_write:
@@ -1533,6 +1609,7 @@ class ModelStorage(Model):
                     records)
 
             for context, ctx_domains in domains.items():
+                relation_domains = defaultdict(list)
                 for domain, ctx_records in ctx_domains.items():
                     domain = unfreeze(domain)
                     for Relation, sub_records in groupby(
@@ -1545,9 +1622,12 @@ class ModelStorage(Model):
                                 continue
                         else:
                             sub_domain = domain
-                        with Transaction().set_context(unfreeze(context)):
-                            validate_relation_domain(
-                                field, list(sub_records), Relation, sub_domain)
+                        relation_domains[Relation].append(
+                            (sub_domain, list(sub_records)))
+                with Transaction().set_context(unfreeze(context)):
+                    for Relation, sub_domains in relation_domains.items():
+                        validate_relation_domains(
+                            field, Relation, sub_domains)
 
         def relation_domain(field, records):
             relations = set()
@@ -1563,15 +1643,87 @@ class ModelStorage(Model):
             relations.discard(None)
             return relations
 
-        def validate_relation_domain(field, records, Relation, domain):
-            relations = relation_domain(field, records)
-            if not relations:
-                return
-            finds = Relation.search(['AND',
-                    [('id', 'in', relations)],
-                    domain,
-                    ])
-            invalid_relations = set(relations) - set(finds)
+        def validate_relation_domains(field, Relation, sub_domains):
+            in_memory = Relation == cls and field._type not in {
+                'many2one', 'one2many', 'many2many', 'one2one', 'reference'}
+            to_search = []
+            for domain, records in sub_domains:
+                relations = relation_domain(field, records)
+                if not relations:
+                    continue
+                if in_memory and _memory_domain(domain, cls):
+                    # The values are already read so the simple domains are
+                    # evaluated without querying the database
+                    try:
+                        invalid_relations = {
+                            r for r in relations
+                            if not _memory_eval_domain(domain, r)}
+                    except TypeError:
+                        pass
+                    else:
+                        check_relation_domain(
+                            field, records, Relation, domain,
+                            invalid_relations)
+                        continue
+                to_search.append((domain, records, relations))
+            if to_search:
+                founds = search_relation_domains(
+                    Relation, [(d, rel) for d, _, rel in to_search])
+                for (domain, records, relations), found in zip(
+                        to_search, founds):
+                    invalid_relations = {
+                        r for r in relations if r.id not in found}
+                    check_relation_domain(
+                        field, records, Relation, domain, invalid_relations)
+
+        def search_relation_domains(Relation, domains):
+            "Return the set of ids matching each domain"
+            from .modelsql import ModelSQL
+            if len(domains) <= 1 or not issubclass(Relation, ModelSQL):
+                return [
+                    {r.id for r in Relation.search(['AND',
+                                [('id', 'in', relations)],
+                                domain,
+                                ], order=[])}
+                    for domain, relations in domains]
+
+            # Search all the domains with a single query per slice of
+            # relations by tagging each sub-query with its index
+            cursor = Transaction().connection.cursor()
+            founds = [set() for _ in domains]
+
+            def search(indexes):
+                queries = []
+                for index in indexes:
+                    domain, relations = domains[index]
+                    query = Relation.search(['AND',
+                            [('id', 'in', [r.id for r in relations])],
+                            domain,
+                            ], order=[], query=True)
+                    queries.append(query.select(
+                            Literal(index).as_('index'), query.id.as_('id')))
+                if len(queries) > 1:
+                    query = Union(*queries, all_=True)
+                else:
+                    query, = queries
+                cursor.execute(*query)
+                for index, id_ in cursor:
+                    founds[index].add(id_)
+
+            indexes, size = [], 0
+            for index, (_, relations) in enumerate(domains):
+                if (indexes
+                        and size + len(relations) > backend.MAX_QUERY_PARAMS):
+                    search(indexes)
+                    indexes, size = [], 0
+                indexes.append(index)
+                size += len(relations)
+            if indexes:
+                search(indexes)
+            return founds
+
+        def check_relation_domain(
+                field, records, Relation, domain, invalid_relations):
             if Relation == cls and field._type not in {
                     'many2one', 'one2many', 'many2many', 'one2one',
                     'reference'}:
@@ -1642,6 +1794,7 @@ class ModelStorage(Model):
                 if isinstance(field, fields.Function) and not pool.test:
                     continue
 
+                started = time.perf_counter()
                 validate_domain(field)
 
                 def required_test(record, field):
@@ -1797,7 +1950,8 @@ class ModelStorage(Model):
                 if (field._type in ('datetime', 'time')
                         and field_name not in ('create_date', 'write_date')):
                     if is_pyson(field.format):
-                        pyson_format = PYSONDecoder().encode(field.format)
+                        format_eval = PYSONDecoder.compile(
+                            PYSONEncoder().encode(field.format))
                         for record in records:
                             env = EvalEnvironment(record, cls)
                             env.update(Transaction().context)
@@ -1805,12 +1959,17 @@ class ModelStorage(Model):
                             env['time'] = time
                             env['context'] = Transaction().context
                             env['active_id'] = record.id
-                            format = PYSONDecoder(env).decode(pyson_format)
+                            format = format_eval(env)
                             format_test(record, format, field_name)
                     else:
                         for record in records:
                             format_test(record, field.format, field_name)
 
+                logger.debug(
+                    "validate %s.%s of %s records in %.3f ms",
+                    cls.__name__, field_name, len(records),
+                    (time.perf_counter() - started) * 1000)
+
         for record in records:
             record.pre_validate()
 
@@ -1916,6 +2075,8 @@ class ModelStorage(Model):
                 value \
                         = self._local_cache[self.id][name] \
                         = self._cache[self.id][name]
+                if self._local_cache.memory_budget:
+                    self._local_cache.account(self.id)
                 return value
             else:
                 skip_eager = (
@@ -2072,7 +2233,7 @@ class ModelStorage(Model):
                     if not (pyson_context := pysoned_ctx.get(field)):
                         pyson_context = PYSONEncoder().encode(field.context)
                         pysoned_ctx[field] = pyson_context
-                    ctx.update(PYSONDecoder(data).decode(pyson_context))
+                    ctx.update(PYSONDecoder.compile(pyson_context)(data))
                 if datetime_field:
                     ctx['_datetime'] = data.get(datetime_field)
                 with transaction.set_context(**ctx):
@@ -2134,6 +2295,8 @@ class ModelStorage(Model):
                         to_delete.add(fname)
                 self._cache[id_]._update(
                     **{k: v for k, v in data.items() if k not in to_delete})
+                self._cache.account(id_)
+                self._local_cache.account(id_)
         return value
 
     def _save_values(self):
@@ -2296,6 +2459,7 @@ class BrowseList(list):
     __slots__ = (
         '_Model', '_ids',
         '_transaction', '_context', '_local_cache', '_transaction_cache',
+        '_prefetch_tree', '_prefetch_index',
         )
 
     def __init__(self, Model, ids):
@@ -2307,11 +2471,39 @@ class BrowseList(list):
         self._context = self._transaction.context
         self._local_cache = local_cache(Model, self._transaction)
         self._transaction_cache = self._transaction.get_cache()
+        self._prefetch_tree = None
+        self._prefetch_index = None
 
     @property
     def ids(self):
         return self._ids.copy()
 
+    def prefetch(self, *paths):
+        "Load the values of the field paths when accessing the instances"
+        self._prefetch_tree = _prefetch_tree(paths)
+        self._prefetch_index = None
+        if self._ids:
+            self.__prefetch(0)
+        return self
+
+    def __prefetch(self, index):
+        if not self._prefetch_tree or not self._ids:
+            return
+        transaction = self._transaction
+        size = record_cache_size(transaction)
+        index = (index % len(self._ids)) // size
+        if index == self._prefetch_index:
+            return
+        self._prefetch_index = index
+        ids = self._ids[index * size:(index + 1) * size]
+        with Transaction().set_current_transaction(transaction), \
+                transaction.reset_context(), \
+                transaction.set_context(self._context), \
+                without_check_access():
+            _prefetch(
+                self._Model, ids, self._prefetch_tree,
+                self._transaction_cache)
+
     def __instantiates_idx(self, start, end):
         return (self.__instantiate_idx(i) for i in range(start, end))
 
@@ -2367,6 +2559,7 @@ class BrowseList(list):
         else:
             end = index
         self.__check_size(end)
+        self.__prefetch(end)
         self.__fill(end)
         return super().__getitem__(index)
 
@@ -2515,11 +2708,86 @@ def _record_eval_pyson(record, source, encoded=False):
     env['context'] = transaction.context
     env['active_model'] = record.__class__.__name__
     env['active_id'] = record.id
-    return PYSONDecoder(env).decode(pyson)
+    return PYSONDecoder.compile(pyson)(env)
 
 
 _pyson_encoder = PYSONEncoder()
 
+_MEMORY_DOMAIN_TYPES = {
+    'integer', 'biginteger', 'float', 'numeric',
+    'date', 'datetime', 'timestamp', 'time'}
+_MEMORY_DOMAIN_OPERATORS = {'=', '!=', '<', '<=', '>', '>=', 'in', 'not in'}
+
+
+def _memory_domain(domain, Model):
+    "Test if the domain can be evaluated on the values of Model records"
+    if is_leaf(domain):
+        if len(domain) != 3:
+            return False
+        name, operator, value = domain
+        if operator not in _MEMORY_DOMAIN_OPERATORS:
+            return False
+        if operator in {'in', 'not in'}:
+            # SQL converts empty lists into literal booleans
+            if (not isinstance(value, (list, tuple))
+                    or not value
+                    or any(v is None for v in value)):
+                return False
+            values = value
+        elif isinstance(value, (list, tuple, dict)):
+            return False
+        else:
+            values = [value]
+        if name == 'id':
+            return all(v is None or type(v) is int for v in values)
+        field = Model._fields.get(name)
+        if field is None or field._type not in _MEMORY_DOMAIN_TYPES:
+            return False
+        if isinstance(field, (fields.Function, fields.MultiValue)):
+            return False
+        # Other types are converted by sql_format for the database
+        return all(v is None or type(v) is field._py_type for v in values)
+    elif isinstance(domain, (list, tuple)):
+        return all(
+            d in {'AND', 'OR'} if isinstance(d, str)
+            else _memory_domain(d, Model)
+            for d in domain)
+    return False
+
+
+def _memory_format(record, name, value):
+    "Return the value as stored in the database"
+    field = record._fields.get(name)
+    # DateTime and Time fields are stored without microseconds
+    if (value is not None
+            and field is not None
+            and field._type in {'datetime', 'time'}):
+        value = value.replace(microsecond=0)
+    return value
+
+
+def _memory_eval_domain(domain, record):
+    "Evaluate the domain on the record with the SQL semantic of NULL"
+    if is_leaf(domain):
+        name, operator, value = domain
+        field_value = _memory_format(record, name, getattr(record, name))
+        if operator in {'in', 'not in'}:
+            value = [_memory_format(record, name, v) for v in value]
+        else:
+            value = _memory_format(record, name, value)
+        if field_value is None:
+            return operator == '=' and value is None
+        elif operator in {'in', 'not in'}:
+            return (field_value in value) == (operator == 'in')
+        elif value is None:
+            return operator == '!='
+        return DOMAIN_OPERATORS[operator](field_value, value)
+    if domain and domain[0] == 'OR':
+        return any(_memory_eval_domain(d, record) for d in domain[1:])
+    return all(
+        _memory_eval_domain(d, record)
+        for d in domain if not isinstance(d, str))
+
 
 def ModelAccessProxy(record, context=None):
     pool = Pool()
@@ -3,7 +3,7 @@
 import datetime
 import json
 from decimal import Decimal
-from functools import reduce
+from functools import lru_cache, reduce
 
 from dateutil.relativedelta import relativedelta
 
@@ -138,6 +138,51 @@ class PYSONDecoder(json.JSONDecoder):
                     return klass(**dct)
         return dct
 
+    @staticmethod
+    @lru_cache(maxsize=1000)
+    def compile(source):
+        "Return a function which evaluates the string with a context"
+        func = _compile(json.loads(source))
+
+        def evaluate(context=None):
+            return func(context or {})
+        return evaluate
+
+
+def _compile(value):
+    "Return a function which evaluates the decoded value with a context"
+    if isinstance(value, dict):
+        klass = CONTEXT.get(value.get('__class__'))
+        if (klass is Eval
+                and '.' not in value['v']
+                and not isinstance(value['d'], (dict, list))):
+            name, default = value['v'], value['d']
+            return lambda context: context.get(name, default)
+        template, funcs = {}, []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                funcs.append((key, _compile(item)))
+            template[key] = item
+    elif isinstance(value, list):
+        klass = None
+        template, funcs = list(value), []
+        for i, item in enumerate(value):
+            if isinstance(item, (dict, list)):
+                funcs.append((i, _compile(item)))
+    else:
+        return lambda context: value
+
+    # Return a new instance at each evaluation like the decoder
+    def func(context):
+        result = template.copy()
+        for key, item in funcs:
+            result[key] = item(context)
+        return result
+    if isinstance(klass, type) and issubclass(klass, PYSON):
+        eval_ = klass.eval
+        return lambda context: eval_(func(context), context)
+    return func
+
 
 class Eval(PYSON):
 
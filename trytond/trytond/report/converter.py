@@ -0,0 +1,322 @@
+# This file is part of Tryton.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+import atexit
+import logging
+import os
+import pathlib
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+import trytond.config as config
+from trytond.tools import resolve
+
+__all__ = ['CommandConverter', 'OfficeConverter', 'converter']
+
+logger = logging.getLogger(__name__)
+
+OFFICE_FILTERS = {
+    ('odt', 'pdf'): 'writer_pdf_Export',
+    ('odt', 'doc'): 'MS Word 97',
+    ('odt', 'docx'): 'MS Word 2007 XML',
+    ('odt', 'html'): 'HTML (StarWriter)',
+    ('odt', 'txt'): 'Text',
+    ('ods', 'pdf'): 'calc_pdf_Export',
+    ('ods', 'xls'): 'MS Excel 97',
+    ('ods', 'xlsx'): 'Calc MS Excel 2007 XML',
+    ('ods', 'csv'): 'Text - txt - csv (StarCalc)',
+    ('odp', 'pdf'): 'impress_pdf_Export',
+    ('odp', 'ppt'): 'MS PowerPoint 97',
+    ('odp', 'pptx'): 'Impress MS PowerPoint 2007 XML',
+    ('odg', 'pdf'): 'draw_pdf_Export',
+    }
+
+
+def _uno():
+    try:
+        import uno
+    except ImportError:
+        uno = None
+    return uno
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+class CommandConverter:
+    "Convert documents by running the convert command for each document"
+
+    def convert(
+            self, name, data, input_format, output_format,
+            input_extension, output_extension, timeout=5 * 60, retry=5):
+        "Return the data converted or None if the conversion failed"
+        directory = tempfile.mkdtemp(prefix='trytond_')
+        path = pathlib.Path(directory, name.replace(os.extsep, '_'))
+        input_path = path.with_suffix(os.extsep + input_extension)
+        output_path = path.with_suffix(os.extsep + output_extension)
+        mode = 'w+' if isinstance(data, str) else 'wb+'
+        with open(input_path, mode) as fp:
+            fp.write(data)
+        try:
+            cmd = config.get(
+                'report', 'convert_command',
+                default='soffice --headless '
+                '--nolockcheck --nodefault --norestore '
+                '--convert-to "%(output_extension)s" '
+                '--outdir "%(directory)s" '
+                '"%(input_path)s"')
+            cmd %= {
+                'directory': directory,
+                'input_format': input_format,
+                'input_extension': input_extension,
+                'input_path': input_path,
+                'output_format': output_format,
+                'output_extension': output_extension,
+                'output_path': output_path,
+                }
+            for count in range(retry, -1, -1):
+                if count != retry:
+                    time.sleep(0.02 * (retry - count))
+                try:
+                    subprocess.check_call(cmd, timeout=timeout, shell=True)
+                except subprocess.CalledProcessError:
+                    if count:
+                        continue
+                    logger.error(
+                        "fail to convert %s to %s",
+                        name, output_format, exc_info=True)
+                    break
+                if os.path.exists(output_path):
+                    with open(output_path, 'rb') as fp:
+                        return fp.read()
+            else:
+                logger.error(
+                    'fail to convert %s to %s', name, output_format)
+        finally:
+            try:
+                shutil.rmtree(directory, ignore_errors=True)
+            except OSError:
+                pass
+
+    def stop(self):
+        "Release the resources of the converter"
+        pass
+
+
+class OfficeProcess:
+    "A long-lived office process listening on its own socket and profile"
+
+    def __init__(self):
+        self.process = None
+        self.directory = None
+        self.port = None
+        self.desktop = None
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.stop()
+        self.directory = tempfile.mkdtemp(prefix='trytond_office_')
+        self.port = _free_port()
+        cmd = config.get(
+            'report', 'office_command',
+            default='soffice --headless --invisible '
+            '--nolockcheck --nodefault --norestore --nologo '
+            '--accept="socket,host=localhost,port=%(port)s;urp;" '
+            '"-env:UserInstallation=%(profile)s"')
+        cmd %= {
+            'port': self.port,
+            'profile': pathlib.Path(self.directory, 'profile').as_uri(),
+            }
+        self.process = subprocess.Popen(
+            cmd, shell=True, start_new_session=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        logger.info("start office process on port %s", self.port)
+
+    def stop(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.kill()
+            logger.info("stop office process on port %s", self.port)
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self.process = self.directory = self.port = self.desktop = None
+
+    def kill(self):
+        "Kill the process and its children"
+        process = self.process
+        if process is None:
+            return
+        try:
+            os.killpg(process.pid, 9)
+        except OSError:
+            process.kill()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def connect(self, timeout):
+        "Return the desktop of the process once it accepts connections"
+        if self.desktop is not None:
+            return self.desktop
+        uno = _uno()
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    'uno:socket,host=localhost,port=%s;urp;'
+                    'StarOffice.ComponentContext' % self.port)
+                break
+            except Exception:
+                if not self.alive() or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        self.desktop = context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', context)
+        return self.desktop
+
+    def convert(self, input_path, output_path, filter_name, timeout):
+        uno = _uno()
+        from com.sun.star.beans import PropertyValue
+
+        def properties(**values):
+            return tuple(
+                PropertyValue(Name=k, Value=v) for k, v in values.items())
+
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            self.kill()
+
+        # The process is killed if the conversion hangs which makes the
+        # pending call fail
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        try:
+            desktop = self.connect(timeout)
+            document = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(str(input_path)), '_blank', 0,
+                properties(Hidden=True))
+            try:
+                document.storeToURL(
+                    uno.systemPathToFileUrl(str(output_path)),
+                    properties(FilterName=filter_name))
+            finally:
+                document.close(True)
+        except Exception as exception:
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(
+                    str(input_path), timeout) from exception
+            raise
+        finally:
+            timer.cancel()
+
+
+class OfficeConverter(CommandConverter):
+    """Convert documents with a pool of long-lived office processes
+    falling back to the convert command when it is not supported"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._processes = []
+        self._idle = None
+        atexit.register(self.stop)
+
+    def _queue(self):
+        "Return the queue of idle processes"
+        with self._lock:
+            # The processes are not shared with the forked children
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                size = max(
+                    config.getint('report', 'office_processes', default=1), 1)
+                self._processes = [OfficeProcess() for _ in range(size)]
+                self._idle = queue.Queue()
+                for process in self._processes:
+                    self._idle.put(process)
+            return self._idle
+
+    def convert(
+            self, name, data, input_format, output_format,
+            input_extension, output_extension, timeout=5 * 60, retry=5):
+        filter_name = OFFICE_FILTERS.get((input_format, output_format))
+        if not filter_name or not _uno():
+            return super().convert(
+                name, data, input_format, output_format,
+                input_extension, output_extension,
+                timeout=timeout, retry=retry)
+
+        idle = self._queue()
+        try:
+            process = idle.get(timeout=timeout)
+        except queue.Empty:
+            logger.error(
+                "fail to convert %s to %s: no office process available",
+                name, output_format)
+            return
+        directory = tempfile.mkdtemp(prefix='trytond_')
+        try:
+            path = pathlib.Path(directory, name.replace(os.extsep, '_'))
+            input_path = path.with_suffix(os.extsep + input_extension)
+            output_path = path.with_suffix(os.extsep + output_extension)
+            mode = 'w+' if isinstance(data, str) else 'wb+'
+            with open(input_path, mode) as fp:
+                fp.write(data)
+            for count in range(retry, -1, -1):
+                if count != retry:
+                    time.sleep(0.02 * (retry - count))
+                try:
+                    if not process.alive():
+                        process.start()
+                    process.convert(
+                        input_path, output_path, filter_name, timeout)
+                except subprocess.TimeoutExpired:
+                    # Do not retry a hanging conversion like the command
+                    process.stop()
+                    raise
+                except Exception:
+                    # Restart the process as it may be in a broken state
+                    process.stop()
+                    if count:
+                        continue
+                    logger.error(
+                        "fail to convert %s to %s",
+                        name, output_format, exc_info=True)
+                    break
+                if os.path.exists(output_path):
+                    with open(output_path, 'rb') as fp:
+                        return fp.read()
+            else:
+                logger.error(
+                    'fail to convert %s to %s', name, output_format)
+        finally:
+            idle.put(process)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def stop(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                for process in self._processes:
+                    process.stop()
+
+
+if config.get('report', 'converter'):
+    Converter = resolve(config.get('report', 'converter'))
+else:
+    Converter = CommandConverter
+converter = Converter()
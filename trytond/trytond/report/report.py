@@ -6,12 +6,6 @@ import logging
 import math
 import mimetypes
 import operator
-import os
-import pathlib
-import shutil
-import subprocess
-import tempfile
-import time
 import unicodedata
 import warnings
 import zipfile
@@ -24,10 +18,10 @@ import dateutil.tz
 from genshi.filters import Translator
 from genshi.template.text import TextTemplate
 
-import trytond.config as config
 from trytond.i18n import gettext, ngettext
 from trytond.model.exceptions import AccessError
 from trytond.pool import Pool, PoolBase
+from trytond.report.converter import converter
 from trytond.rpc import RPC
 from trytond.tools import slugify
 from trytond.transaction import Transaction, check_access
@@ -430,58 +424,14 @@ class Report(URLMixin, PoolBase):
         if input_format == output_format and output_format in MIMETYPES:
             return output_format, data
 
-        directory = tempfile.mkdtemp(prefix='trytond_')
         input_extension = FORMAT2EXT.get(input_format, input_format)
         output_extension = FORMAT2EXT.get(output_format, output_format)
-        path = pathlib.Path(
-            directory, report.report_name.replace(os.extsep, '_'))
-        input_path = path.with_suffix(os.extsep + input_extension)
-        output_path = path.with_suffix(os.extsep + output_extension)
-        mode = 'w+' if isinstance(data, str) else 'wb+'
-        with open(input_path, mode) as fp:
-            fp.write(data)
-        try:
-            cmd = config.get(
-                'report', 'convert_command',
-                default='soffice --headless '
-                '--nolockcheck --nodefault --norestore '
-                '--convert-to "%(output_extension)s" '
-                '--outdir "%(directory)s" '
-                '"%(input_path)s"')
-            cmd %= {
-                'directory': directory,
-                'input_format': input_format,
-                'input_extension': input_extension,
-                'input_path': input_path,
-                'output_format': output_format,
-                'output_extension': output_extension,
-                'output_path': output_path,
-                }
-            for count in range(retry, -1, -1):
-                if count != retry:
-                    time.sleep(0.02 * (retry - count))
-                try:
-                    subprocess.check_call(cmd, timeout=timeout, shell=True)
-                except subprocess.CalledProcessError:
-                    if count:
-                        continue
-                    logger.error(
-                        "fail to convert %s to %s",
-                        report.report_name, output_format, exc_info=True)
-                    break
-                if os.path.exists(output_path):
-                    with open(output_path, 'rb') as fp:
-                        return output_extension, fp.read()
-            else:
-                logger.error(
-                    'fail to convert %s to %s',
-                    report.report_name, output_format)
+        result = converter.convert(
+            report.report_name, data, input_format, output_format,
+            input_extension, output_extension, timeout=timeout, retry=retry)
+        if result is None:
             return input_format, data
-        finally:
-            try:
-                shutil.rmtree(directory, ignore_errors=True)
-            except OSError:
-                pass
+        return output_extension, result
 
     @classmethod
     def format_date(cls, value, lang=None, format=None):
@@ -127,27 +127,33 @@ def reset_password(dbname, user, context=None):
 def check(dbname, user, session, context=None):
     remote_addr = _get_remote_addr(context)
 
+    if remote_addr:
+        ip_addr = str(ipaddress.ip_address(remote_addr))
+    else:
+        ip_addr = None
+
     database_list = Pool.database_list()
     if dbname in database_list:
-        for count in range(config.getint('database', 'retry'), -1, -1):
-            with Transaction().start(dbname, user, context=context) \
-                    as transaction:
-                pool = Pool(dbname)
-                Session = pool.get('ir.session')
-                try:
-                    find = Session.check(user, session)
-                    break
-                except backend.DatabaseOperationalError:
-                    if count:
-                        continue
-                    raise
-                finally:
-                    transaction.commit()
-    else:
-        if remote_addr:
-            ip_addr = str(ipaddress.ip_address(remote_addr))
+        Session = Pool(dbname).get('ir.session')
+        # Skip the transaction for recently verified sessions
+        if Session.check_cached(dbname, user, session, ip_addr):
+            find = True
         else:
-            ip_addr = None
+            for count in range(config.getint('database', 'retry'), -1, -1):
+                with Transaction().start(dbname, user, context=context) \
+                        as transaction:
+                    pool = Pool(dbname)
+                    Session = pool.get('ir.session')
+                    try:
+                        find = Session.check(user, session)
+                        break
+                    except backend.DatabaseOperationalError:
+                        if count:
+                            continue
+                        raise
+                    finally:
+                        transaction.commit()
+    else:
         now = dt.datetime.now()
         timeout = dt.timedelta(config.getint('session', 'max_age'))
         database = backend.Database(dbname)
@@ -34,7 +34,8 @@ def processing(request):
 
 
 def log():
-    from trytond.cache import Cache
+    from trytond.cache import Cache, MemoryBudget
+    from trytond.worker import stats as worker_stats
     msg = []
     now = time.perf_counter()
     for process in sorted(status.copy().values(), key=lambda p: p.start_time):
@@ -46,6 +47,8 @@ def log():
         'id': '%s@%s' % (os.getpid(), platform.node()),
         'status': msg,
         'caches': list(Cache.stats()),
+        'record_cache': MemoryBudget.stats(),
+        'worker': worker_stats(),
         }
 
 
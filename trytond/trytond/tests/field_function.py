@@ -1,5 +1,6 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
+import threading
 
 from sql import Literal
 
@@ -109,6 +110,33 @@ class FunctionGetterLocalCache(ModelSQL):
         return index
 
 
+class FunctionParallel(ModelSQL):
+    __name__ = 'test.function.parallel'
+
+    parallel1 = fields.Function(
+        fields.Char("Parallel 1"), 'get_parallel1', parallel=True)
+    parallel2 = fields.Function(
+        fields.Char("Parallel 2"), 'get_parallel2', parallel=True)
+    sequential = fields.Function(
+        fields.Char("Sequential"), 'get_sequential')
+
+    @classmethod
+    def table_query(cls):
+        pool = Pool()
+        Model = pool.get('ir.model')
+        model = Model.__table__()
+        return model.select(model.id.as_('id'))
+
+    def get_parallel1(self, name):
+        return threading.current_thread().name
+
+    def get_parallel2(self, name):
+        return threading.current_thread().name
+
+    def get_sequential(self, name):
+        return threading.current_thread().name
+
+
 class FunctionNoGetter(ModelSQL):
     __name__ = 'test.function.no_getter'
 
@@ -174,6 +202,7 @@ def register(module):
         FunctonGetter,
         FunctionGetterContext,
         FunctionGetterLocalCache,
+        FunctionParallel,
         FunctionNoGetter,
         FunctionNoGetterRelation,
         FunctionNoGetterTarget,
@@ -184,6 +184,18 @@ class ModelStorageDomainNotRequired(ModelSQL):
         "Domain Not Required", domain=[('domain_not_required', '>', 0)])
 
 
+class ModelStorageDomainMinimum(ModelSQL):
+    __name__ = 'test.modelstorage.domain_minimum'
+
+    minimum = fields.Integer("Minimum")
+    value = fields.Integer(
+        "Value",
+        domain=['OR',
+            ('value', '>=', Eval('minimum')),
+            ('value', 'in', [-1, -2]),
+            ])
+
+
 class ModelStorageComputeFields(ModelSQL):
     __name__ = 'test.modelstorage.compute_fields'
 
@@ -217,5 +229,6 @@ def register(module):
         ModelStorageRelationDomain2Target,
         ModelStorageEvalEnvironment,
         ModelStorageDomainNotRequired,
+        ModelStorageDomainMinimum,
         ModelStorageComputeFields,
         module=module, type_='model')
@@ -0,0 +1,192 @@
+# This file is part of Tryton.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+import asyncio
+import base64
+import json
+import subprocess
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from http import HTTPStatus
+
+from trytond import config
+from trytond.asgi import TrytondASGI, app
+from trytond.pool import Pool
+from trytond.tests.test_tryton import RouteTestCase, TestCase
+from trytond.transaction import Transaction
+
+
+class _SyncExecutor(ThreadPoolExecutor):
+    "Run in the calling thread to share the test database connection"
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def request(app, method, path, body=b'', headers=None):
+    "Run the ASGI app for the request and return the response messages"
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'headers': [
+            (k.lower().encode('latin-1'), v.encode('latin-1'))
+            for k, v in (headers or {}).items()],
+        'client': ('127.0.0.1', 12345),
+        'server': ('localhost', 8000),
+        }
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(_SyncExecutor())
+        await app(scope, receive, send)
+
+    asyncio.run(main())
+    return sent
+
+
+class ASGIAppTestCase(TestCase):
+    "Test ASGI Application"
+
+    def test_lifespan(self):
+        "Test lifespan"
+        app = TrytondASGI()
+        messages = [
+            {'type': 'lifespan.startup'},
+            {'type': 'lifespan.shutdown'},
+            ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+
+        self.assertEqual(sent, [
+                {'type': 'lifespan.startup.complete'},
+                {'type': 'lifespan.shutdown.complete'},
+                ])
+
+    def test_route(self):
+        "Test route"
+        app = TrytondASGI()
+
+        @app.route('/<string:name>', methods=['POST'])
+        async def hello(request, name):
+            return request.data + b' ' + name.encode()
+
+        start, body = request(app, 'POST', '/world', b'hello')
+
+        self.assertEqual(start['status'], HTTPStatus.OK)
+        self.assertEqual(body['body'], b'hello world')
+
+    def test_not_found(self):
+        "Test not found"
+        app = TrytondASGI()
+
+        start, _ = request(app, 'POST', '/foo')
+
+        self.assertEqual(start['status'], HTTPStatus.NOT_FOUND)
+
+    def test_request_too_large(self):
+        "Test request too large"
+        app = TrytondASGI()
+        max_size = config.get('request', 'max_size')
+        config.set('request', 'max_size', '10')
+        self.addCleanup(config.set, 'request', 'max_size', max_size)
+
+        start, _ = request(app, 'POST', '/foo', b'x' * 11)
+
+        self.assertEqual(start['status'], HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+    def test_forbidden_origin(self):
+        "Test forbidden origin"
+        app = TrytondASGI()
+
+        start, _ = request(app, 'POST', '/foo', headers={
+                'Host': 'localhost:8000',
+                'Origin': 'http://example.com',
+                })
+
+        self.assertEqual(start['status'], HTTPStatus.FORBIDDEN)
+
+    def test_import_bus_first(self):
+        "Test bus route registered when importing the bus first"
+        code = (
+            "import trytond.bus; from trytond.asgi import app; "
+            "print(*(r.rule for r in app.url_map.iter_rules()))")
+
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), '/<string:database_name>/bus')
+
+
+class ASGIBusTestCase(RouteTestCase):
+    "Test ASGI bus route"
+    module = 'res'
+
+    @classmethod
+    def setUpDatabase(cls):
+        pool = Pool()
+        User = pool.get('res.user')
+        User.create([{
+                    'name': 'user',
+                    'login': 'user',
+                    'password': '12345678',
+                    }])
+
+    def _get_auth(self):
+        with Transaction().start(self.db_name, 0, context={
+                    '_request': {'remote_addr': '127.0.0.1'},
+                    }) as transaction:
+            pool = Pool()
+            User = pool.get('res.user')
+            Session = pool.get('ir.session')
+            user, = User.search([('login', '=', 'user')])
+            with transaction.set_user(user.id):
+                key = Session.new()
+            transaction.commit()
+        return user.id, key
+
+    def test_subscribe_without_session(self):
+        "Test subscribe without session"
+        start, _ = request(
+            app, 'POST', f'/{self.db_name}/bus', b'{}', {
+                'Content-Type': 'application/json',
+                'X-Requested-With': 'XMLHttpRequest',
+                })
+
+        self.assertEqual(start['status'], HTTPStatus.UNAUTHORIZED)
+
+    def test_subscribe_not_allowed(self):
+        "Test subscribe not allowed"
+        user_id, key = self._get_auth()
+        authorization = 'Session ' + base64.b64encode(
+            f'user:{user_id}:{key}'.encode()).decode()
+
+        start, _ = request(
+            app, 'POST', f'/{self.db_name}/bus',
+            json.dumps({'channels': []}).encode(), {
+                'Content-Type': 'application/json',
+                'Authorization': authorization,
+                })
+
+        self.assertEqual(start['status'], HTTPStatus.NOT_IMPLEMENTED)
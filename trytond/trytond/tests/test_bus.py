@@ -1,5 +1,6 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
+import asyncio
 import os
 import time
 import unittest
@@ -43,6 +44,27 @@ class MessageQueueTestCase(TestCase):
         self.assertEqual(content, {'message_id': 13})
         self.assertEqual(channel, 'odd')
 
+    def test_get_next_channels_order(self):
+        "Testing get_next returns the oldest message of the channels"
+        with patch('time.time', self._time):
+            mq = _MessageQueue(5)
+            for x in range(15):
+                mq.append('odd' if x % 2 else 'even', {'message_id': x})
+            channel, content = mq.get_next({'odd', 'even'}, 11)
+
+        self.assertEqual(content, {'message_id': 12})
+        self.assertEqual(channel, 'even')
+
+    def test_get_next_last(self):
+        "Testing get_next from the last message"
+        with patch('time.time', self._time):
+            mq = _MessageQueue(5)
+            for x in range(15):
+                mq.append('channel', {'message_id': x})
+            channel, content = mq.get_next({'channel'}, 14)
+
+        self.assertEqual((channel, content), (None, None))
+
     def test_get_next_timeout_expired(self):
         "Testing get_next when requesting an outdated message"
         with patch('time.time', self._time):
@@ -116,6 +138,13 @@ class BusTestCase(TestCase):
 
         self.assertEqual(response, {'message': None, 'channel': None})
 
+    @unittest.skipIf(backend.name == 'sqlite', 'SQLite has not channel')
+    def test_async_subscribe_nothing(self):
+        "Test async subscribe with nothing"
+        response = asyncio.run(Bus.async_subscribe(DB_NAME, ['user:1']))
+
+        self.assertEqual(response, {'message': None, 'channel': None})
+
     @unittest.skipIf(backend.name == 'sqlite', 'SQLite has not channel')
     def test_subscribe_message(self):
         "Test subscribe with message"
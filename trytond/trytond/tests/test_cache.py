@@ -2,23 +2,30 @@
 # this repository contains the full copyright notices and license terms.
 
 import datetime as dt
+import json
 import time
 import unittest
 from unittest.mock import patch
 
 from trytond import backend, config
 from trytond.cache import (
-    REFRESH_POOL_MSG, LRUDict, LRUDictTransaction, MemoryCache, freeze,
-    unfreeze)
+    REFRESH_POOL_MSG, LRUDict, LRUDictTransaction, MemoryBudget, MemoryCache,
+    RedisCache,
+    _canonical, freeze, immutable, mutable, redis, sizeof, unfreeze)
 from trytond.tests.test_tryton import (
     DB_NAME, USER, TestCase, activate_module, with_transaction)
 from trytond.transaction import Transaction
 
 cache = MemoryCache('test.cache')
 cache_expire = MemoryCache('test.cache_expire', duration=1)
+cache_without_context = MemoryCache(
+    'test.cache_without_context', duration=1, context=False)
 cache_ignored_local_context = MemoryCache(
     'test.cache.ignored.local', context_ignored_keys={'ignored'})
 cache_ignored_global_context = MemoryCache('test.cache.ignored.global')
+if redis and config.get('cache', 'uri'):
+    redis_cache = RedisCache('test.redis_cache')
+    redis_cache_expire = RedisCache('test.redis_cache_expire', duration=1)
 
 
 class CacheTestCase(TestCase):
@@ -73,6 +80,22 @@ class CacheTestCase(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(unfreeze(value), result)
 
+    def test_mutable(self):
+        "Test mutable"
+        value = {'list': [1, 2], 'set': {3}, 'dict': {'key': 'value'}}
+
+        self.assertEqual(mutable(immutable(value)), {
+                'list': (1, 2),
+                'set': frozenset({3}),
+                'dict': {'key': 'value'},
+                })
+
+    def test_canonical(self):
+        "Test canonical is independent of the order"
+        self.assertEqual(
+            repr(_canonical(freeze({'b': 1, 'a': [1, {2}]}))),
+            repr(_canonical(freeze({'a': [1, {2}], 'b': 1}))))
+
     @with_transaction()
     def test_ignored_context_key_global(self):
         "Test global keys are ignored from context"
@@ -225,6 +248,103 @@ class MemoryCacheTestCase(TestCase):
 
         self.assertEqual(cache_expire.get('foo'), None)
 
+    def test_memory_cache_peek(self):
+        "Test MemoryCache peek"
+        with Transaction().start(DB_NAME, USER):
+            self.wait_cache_listening()
+            cache_without_context.set('foo', 'bar')
+
+        self.assertEqual(cache_without_context.peek(DB_NAME, 'foo'), 'bar')
+        self.assertEqual(
+            cache_without_context.peek(DB_NAME, 'bar', 'baz'), 'baz')
+
+    def test_memory_cache_peek_expire(self):
+        "Test MemoryCache peek expired"
+        with Transaction().start(DB_NAME, USER):
+            self.wait_cache_listening()
+            cache_without_context.set('foo', 'bar')
+        time.sleep(cache_without_context.duration.total_seconds())
+
+        self.assertEqual(cache_without_context.peek(DB_NAME, 'foo'), None)
+
+    def test_memory_cache_clear_keys(self):
+        "Test MemoryCache clear keys"
+        transaction1 = Transaction().start(DB_NAME, USER)
+        self.wait_cache_listening()
+        self.addCleanup(transaction1.stop)
+
+        transaction2 = transaction1.new_transaction()
+        self.addCleanup(transaction2.stop)
+        cache.set(('foo', 1), 'foo')
+        cache.set(('bar', 1), 'bar')
+
+        transaction3 = transaction1.new_transaction()
+        self.addCleanup(transaction3.stop)
+        cache.clear_keys([('foo',)])
+        self.assertEqual(cache.get(('foo', 1)), None)
+        self.assertEqual(cache.get(('bar', 1)), 'bar')
+
+        cache.set(('foo', 1), 'baz')
+        self.assertEqual(cache.get(('foo', 1)), 'baz')
+
+        with Transaction().set_current_transaction(transaction2):
+            self.assertEqual(cache.get(('foo', 1)), 'foo')
+
+        commit_time = dt.datetime.now()
+        transaction3.commit()
+        self.wait_cache_sync(after=commit_time)
+
+        transaction4 = transaction1.new_transaction()
+        self.addCleanup(transaction4.stop)
+        self.assertEqual(cache.get(('foo', 1)), None)
+        self.assertEqual(cache.get(('bar', 1)), 'bar')
+
+    def test_memory_cache_clear_keys_old_transaction(self):
+        "Test old transaction does not fill cache with cleared keys"
+        transaction1 = Transaction().start(DB_NAME, USER)
+        self.wait_cache_listening()
+        self.addCleanup(transaction1.stop)
+
+        transaction2 = transaction1.new_transaction()
+        self.addCleanup(transaction2.stop)
+
+        transaction3 = transaction1.new_transaction()
+        self.addCleanup(transaction3.stop)
+        cache.clear_keys(['foo'])
+        commit_time = dt.datetime.now()
+        transaction3.commit()
+        self.wait_cache_sync(after=commit_time)
+
+        with Transaction().set_current_transaction(transaction2):
+            cache.set('foo', 'baz')
+            cache.set('bar', 'baz')
+
+        transaction4 = transaction1.new_transaction()
+        self.addCleanup(transaction4.stop)
+        self.assertEqual(cache.get('foo'), None)
+        self.assertEqual(cache.get('bar'), 'baz')
+
+    def test_memory_cache_payloads(self):
+        "Test MemoryCache notification payloads"
+        payloads = list(MemoryCache._payloads(
+                {'foo'}, {'bar': {('baz', 1)}, 'qux': {dt.date.today()}}))
+
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(
+            sorted(json.loads(payloads[0]), key=str),
+            [['bar', [['baz', 1]]], 'foo', 'qux'])
+
+    def test_memory_cache_payloads_size(self):
+        "Test MemoryCache notification payloads are split"
+        payloads = list(MemoryCache._payloads(
+                {'x' * 64 + str(i) for i in range(1000)}, {}))
+
+        self.assertGreater(len(payloads), 1)
+        for payload in payloads:
+            self.assertLessEqual(len(payload.encode('utf-8')), 8000)
+        self.assertEqual(
+            sum(len(json.loads(p)) for p in payloads), 1000)
+
 
 class MemoryCacheWithoutInsertOnConflict(MemoryCacheTestCase):
     "Test Cache without Insert On Conflict"
@@ -279,6 +399,66 @@ class MemoryCacheChannelTestCase(MemoryCacheTestCase):
                     f"{REFRESH_POOL_MSG} {cache._local.portable_id}"))
 
 
+@unittest.skipIf(
+    not redis or not config.get('cache', 'uri'), "Redis is not configured")
+class RedisCacheTestCase(TestCase):
+    "Test RedisCache"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        activate_module('tests')
+
+    def tearDown(self):
+        RedisCache.drop(DB_NAME)
+
+    @with_transaction()
+    def test_redis_cache_set_get(self):
+        "Test RedisCache set/get"
+        redis_cache.set('foo', {'bar': ['baz']})
+
+        self.assertEqual(redis_cache.get('foo'), {'bar': ('baz',)})
+
+    @with_transaction()
+    def test_redis_cache_shared(self):
+        "Test RedisCache is shared between instances of the store"
+        redis_cache.set('foo', 'bar')
+        redis_cache._database_cache.clear()
+
+        self.assertEqual(redis_cache.get('foo'), 'bar')
+
+    def test_redis_cache_clear(self):
+        "Test RedisCache clear increments generation"
+        with Transaction().start(DB_NAME, USER):
+            redis_cache.set('foo', 'bar')
+
+        with Transaction().start(DB_NAME, USER) as transaction:
+            redis_cache.clear()
+            self.assertEqual(redis_cache.get('foo'), None)
+            transaction.commit()
+
+        with Transaction().start(DB_NAME, USER):
+            self.assertEqual(redis_cache.get('foo'), None)
+
+    def test_redis_cache_clear_listener(self):
+        "Test RedisCache clear from listener keeps the shared entries"
+        with Transaction().start(DB_NAME, USER):
+            redis_cache.set('foo', 'bar')
+
+        redis_cache._clear(DB_NAME)
+
+        with Transaction().start(DB_NAME, USER):
+            self.assertEqual(redis_cache.get('foo'), 'bar')
+
+    @with_transaction()
+    def test_redis_cache_expire(self):
+        "Test expired RedisCache"
+        redis_cache_expire.set('foo', "bar")
+        time.sleep(redis_cache_expire.duration.total_seconds())
+
+        self.assertEqual(redis_cache_expire.get('foo'), None)
+
+
 class LRUDictTestCase(TestCase):
     "Test LRUDict"
 
@@ -327,6 +507,99 @@ class LRUDictTestCase(TestCase):
 
         self.assertEqual(lru_dict['foo'], 'foo')
 
+    def test_memory_limit(self):
+        "Test memory limit"
+        lru_dict = LRUDict(
+            10, memory_budget=MemoryBudget(sizeof('x' * 100) * 2))
+
+        for key in ['foo', 'bar', 'baz']:
+            lru_dict[key] = 'x' * 100
+            lru_dict.account(key)
+
+        self.assertEqual(list(lru_dict.keys()), ['bar', 'baz'])
+        self.assertEqual(lru_dict.memory, sizeof('x' * 100) * 2)
+
+    def test_memory_limit_keep_last(self):
+        "Test memory limit keeps the last item"
+        lru_dict = LRUDict(10, memory_budget=MemoryBudget(1))
+
+        lru_dict['foo'] = 'x' * 100
+        lru_dict.account('foo')
+
+        self.assertEqual(list(lru_dict.keys()), ['foo'])
+
+    def test_memory_release(self):
+        "Test memory is released"
+        lru_dict = LRUDict(10, memory_budget=MemoryBudget(10 ** 6))
+
+        for key in ['foo', 'bar', 'baz']:
+            lru_dict[key] = 'x' * 100
+            lru_dict.account(key)
+        del lru_dict['foo']
+        lru_dict.pop('bar')
+
+        self.assertEqual(lru_dict.memory, sizeof('x' * 100))
+
+        lru_dict.clear()
+
+        self.assertEqual(lru_dict.memory, 0)
+        self.assertEqual(lru_dict.memory_budget.memory, 0)
+
+    def test_memory_budget_shared(self):
+        "Test memory budget shared between dictionaries"
+        budget = MemoryBudget(sizeof('x' * 100) * 2)
+        lru_dict1 = LRUDict(10, memory_budget=budget)
+        lru_dict2 = LRUDict(10, memory_budget=budget)
+
+        lru_dict1['foo'] = 'x' * 100
+        lru_dict1.account('foo')
+        lru_dict2['bar'] = 'x' * 100
+        lru_dict2.account('bar')
+        lru_dict2['baz'] = 'x' * 100
+        lru_dict2.account('baz')
+
+        self.assertEqual(list(lru_dict1.keys()), [])
+        self.assertEqual(list(lru_dict2.keys()), ['bar', 'baz'])
+        self.assertEqual(budget.memory, sizeof('x' * 100) * 2)
+
+    def test_memory_budget_release(self):
+        "Test memory budget released when dictionary is collected"
+        budget = MemoryBudget(10 ** 6)
+        lru_dict = LRUDict(10, memory_budget=budget)
+
+        lru_dict['foo'] = 'x' * 100
+        lru_dict.account('foo')
+        del lru_dict
+
+        self.assertEqual(budget.memory, 0)
+
+    def test_memory_budget_stats(self):
+        "Test memory budget stats are reset"
+        MemoryBudget.stats()
+        lru_dict = LRUDict(10, memory_budget=MemoryBudget(sizeof('x' * 100)))
+
+        for key in ['foo', 'bar']:
+            lru_dict[key] = 'x' * 100
+            lru_dict.account(key)
+
+        self.assertEqual(MemoryBudget.stats(), {
+                'memory': sizeof('x' * 100) * 2,
+                'evicted': 1,
+                })
+        self.assertEqual(MemoryBudget.stats(), {
+                'memory': 0,
+                'evicted': 0,
+                })
+
+    def test_memory_without_limit(self):
+        "Test memory is not accounted without limit"
+        lru_dict = LRUDict(10)
+
+        lru_dict['foo'] = 'x' * 100
+        lru_dict.account('foo')
+
+        self.assertEqual(lru_dict.memory, 0)
+
 
 class LRUDictTransactionTestCase(TestCase):
     "Test LRUDictTransaction"
@@ -2,6 +2,7 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 import unittest
+from unittest.mock import patch
 
 from sql import Literal, Select
 
@@ -720,6 +721,38 @@ class FieldCharTranslatedTestCase(TestCase, CommonTestCaseMixin):
         self.assertEqual(record.char_translated('en'), 'foo')
         self.assertEqual(record.char_translated('fr'), 'bar')
 
+    @with_transaction()
+    def test_read_translations(self):
+        "Test read translations of many fields at once"
+        pool = Pool()
+        Language = pool.get('ir.lang')
+        Translation = pool.get('ir.translation')
+        Char = self.Char()
+
+        french, = Language.search([('code', '=', 'fr')])
+        french.translatable = True
+        french.save()
+
+        record, = Char.create([{'char': 'foo', 'char_unstripped': 'bar'}])
+        with Transaction().set_context(language='fr'):
+            Char.write([record], {'char': 'oof', 'char_unstripped': 'rab'})
+
+        for language in ['fr', 'fr_BE']:
+            with self.subTest(language=language), \
+                    Transaction().set_context(language=language), \
+                    patch.object(
+                        Translation, '_fetch_fields_ids',
+                        wraps=Translation._fetch_fields_ids) as fetch:
+                value, = Char.read(
+                    [record.id], ['char', 'char_unstripped', 'char_lstripped'])
+                self.assertEqual(value['char'], 'oof')
+                self.assertEqual(value['char_unstripped'], 'rab')
+                self.assertEqual(fetch.call_count, 1)
+
+                # Translations are cached
+                Char.read([record.id], ['char', 'char_unstripped'])
+                self.assertEqual(fetch.call_count, 1)
+
 
 @unittest.skipUnless(backend.name == 'postgresql',
     "unaccent works only on postgresql")
@@ -1,8 +1,12 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of
 # this repository contains the full copyright notices and license terms.
 
+import threading
+import unittest
 from unittest.mock import patch
 
+from trytond import backend, config
+from trytond.model.modelsql import _getter_executor
 from trytond.pool import Pool
 from trytond.tests.test_tryton import (
     TestCase, activate_module, with_transaction)
@@ -126,6 +130,60 @@ class FieldFunctionTestCase(TestCase):
 
             self.assertEqual(getter.call_count, 1)
 
+    def _read_parallel(self, getter_workers):
+        pool = Pool()
+        Model = pool.get('test.function.parallel')
+
+        workers = config.get('database', 'getter_workers')
+        config.set('database', 'getter_workers', str(getter_workers))
+        self.addCleanup(config.set, 'database', 'getter_workers', workers)
+
+        with Transaction().new_transaction(readonly=True):
+            record, = Model.search([], limit=1)
+            return Model.read(
+                [record.id], ['parallel1', 'parallel2', 'sequential'])[0]
+
+    @with_transaction()
+    def test_getter_parallel_disabled(self):
+        "Test parallel getters disabled"
+        record = self._read_parallel(0)
+
+        thread = threading.current_thread().name
+        self.assertEqual(record['parallel1'], thread)
+        self.assertEqual(record['parallel2'], thread)
+        self.assertEqual(record['sequential'], thread)
+
+    @unittest.skipUnless(
+        backend.Database().has_snapshot(), "requires snapshot support")
+    @with_transaction()
+    def test_getter_parallel(self):
+        "Test parallel getters"
+        record = self._read_parallel(2)
+
+        thread = threading.current_thread().name
+        self.assertNotEqual(record['parallel1'], thread)
+        self.assertNotEqual(record['parallel2'], thread)
+        self.assertEqual(record['sequential'], thread)
+
+    def test_getter_executor(self):
+        "Test executor of parallel getters is shared and capped"
+        maxconn = config.get('database', 'maxconn')
+        config.set('database', 'maxconn', '8')
+        if maxconn is None:
+            self.addCleanup(config.remove_option, 'database', 'maxconn')
+        else:
+            self.addCleanup(config.set, 'database', 'maxconn', maxconn)
+
+        executor, slots = _getter_executor(10)
+
+        self.assertIs(_getter_executor(10)[0], executor)
+        self.assertEqual(executor._max_workers, 4)
+        for _ in range(4):
+            self.assertTrue(slots.acquire(blocking=False))
+        self.assertFalse(slots.acquire(blocking=False))
+        for _ in range(4):
+            slots.release()
+
     @with_transaction()
     def test_no_getter(self):
         "Test no getter"
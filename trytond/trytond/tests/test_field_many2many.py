@@ -525,6 +525,25 @@ class FieldMany2ManyTestCase(TestCase, CommonTestCaseMixin):
         self.assertEqual(len(filtered.targets), 4)
         self.assertEqual(filtered_target.value, 3)
 
+    @with_transaction()
+    def test_read_filter_fields(self):
+        "Test read of many many2many with filter"
+        Many2Many = Pool().get('test.many2many_filter')
+
+        record, = Many2Many.create([{
+                    'targets': [
+                        ('create', [{'value': x} for x in range(-1, 4)])],
+                    }])
+        target_ids = [t.id for t in record.targets]
+
+        record, = Many2Many.read([record.id], [
+                'targets', 'filtered_targets', 'or_filtered_targets'])
+
+        self.assertEqual(record['targets'], tuple(target_ids))
+        self.assertEqual(record['filtered_targets'], (target_ids[-1],))
+        self.assertEqual(
+            record['or_filtered_targets'], (target_ids[0], target_ids[-1]))
+
     @with_transaction()
     def test_create_filter_domain(self):
         "Test create many2many with filter and domain"
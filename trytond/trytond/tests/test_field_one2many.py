@@ -776,6 +776,55 @@ class FieldOne2ManyTestCase(
             [t.id for t in origin.reversed_targets],
             sorted([t.id for t in targets]))
 
+    @with_transaction()
+    def test_read_order_fields(self):
+        "Test read of many one2many respect the order specified"
+        pool = Pool()
+        One2Many = pool.get('test.one2many_order')
+        Target = pool.get('test.one2many_order.target')
+
+        origin1, origin2, origin3 = One2Many.create([{}] * 3)
+        targets1 = Target.create([{'origin': origin1.id}] * 3)
+        targets2 = Target.create([{'origin': origin2.id}] * 2)
+
+        records = One2Many.read(
+            [origin1.id, origin2.id, origin3.id],
+            ['targets', 'reversed_targets'])
+
+        self.assertEqual(records, [{
+                    'id': origin1.id,
+                    'targets': tuple(
+                        sorted([t.id for t in targets1], reverse=True)),
+                    'reversed_targets': tuple(
+                        sorted([t.id for t in targets1])),
+                    }, {
+                    'id': origin2.id,
+                    'targets': tuple(
+                        sorted([t.id for t in targets2], reverse=True)),
+                    'reversed_targets': tuple(
+                        sorted([t.id for t in targets2])),
+                    }, {
+                    'id': origin3.id,
+                    'targets': (),
+                    'reversed_targets': (),
+                    }])
+
+    @with_transaction()
+    def test_read_filter_fields(self):
+        "Test read of many one2many with filter"
+        One2Many = Pool().get('test.one2many_filter')
+
+        record, = One2Many.create([{
+                    'targets': [
+                        ('create', [{'value': x} for x in range(4)])],
+                    }])
+
+        filtered_target, = record.filtered_targets
+        record, = One2Many.read([record.id], ['targets', 'filtered_targets'])
+
+        self.assertEqual(len(record['targets']), 4)
+        self.assertEqual(record['filtered_targets'], (filtered_target.id,))
+
 
 class FieldOne2ManyReferenceTestCase(
         TestCase, CommonTestCaseMixin, SearchTestCaseMixin):
@@ -17,6 +17,7 @@ except ImportError:
 
 from dateutil.relativedelta import relativedelta
 
+import trytond.config as config
 from trytond.ir.exceptions import SequenceAffixError
 from trytond.ir.lang import _replace
 from trytond.pool import Pool
@@ -206,6 +207,163 @@ class IrTestCase(ModuleTestCase):
         self.assertEqual(
             list(sequence.get_many(10)), list(map(str, range(1, 11))))
 
+    @with_transaction()
+    def test_queue_pull_batch(self):
+        "Test pull batch of tasks"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        transaction = Transaction()
+
+        task_ids = [Queue.push('test', {}) for _ in range(5)]
+
+        pulled, _ = Queue.pull_batch(
+            transaction.database, transaction.connection, name='test', size=3)
+        pulled_more, _ = Queue.pull_batch(
+            transaction.database, transaction.connection, name='test', size=3)
+        task_id, _ = Queue.pull(
+            transaction.database, transaction.connection, name='test')
+
+        self.assertEqual(len(pulled), 3)
+        self.assertEqual(len(pulled_more), 2)
+        self.assertEqual(
+            sorted(t for t, _ in pulled + pulled_more), task_ids)
+        self.assertIsNone(task_id)
+        self.assertTrue(all(
+                t['dequeued_at']
+                for t in Queue.read(task_ids, ['dequeued_at'])))
+
+    @with_transaction()
+    def test_queue_pull_batch_fair_share(self):
+        "Test pull batch of tasks with weights and limits"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        transaction = Transaction()
+        for section in ['queue_weight', 'queue_limit']:
+            config.add_section(section)
+            self.addCleanup(config.remove_section, section)
+        config.set('queue_weight', 'urgent', '3')
+
+        bulk1, bulk2, bulk3, _ = [Queue.push('bulk', {}) for _ in range(4)]
+        urgent1, urgent2 = [Queue.push('urgent', {}) for _ in range(2)]
+
+        pulled, _ = Queue.pull_batch(
+            transaction.database, transaction.connection, size=3)
+        self.assertEqual(
+            set(pulled), {(urgent1, 'urgent'), (urgent2, 'urgent'),
+                (bulk1, 'bulk')})
+
+        urgent3, _ = [Queue.push('urgent', {}) for _ in range(2)]
+        config.set('queue_limit', 'urgent', '2')
+        pulled, _ = Queue.pull_batch(
+            transaction.database, transaction.connection, size=3,
+            running={'urgent': 1})
+        self.assertEqual(
+            set(pulled), {(urgent3, 'urgent'), (bulk2, 'bulk'),
+                (bulk3, 'bulk')})
+
+    @with_transaction()
+    def test_queue_pull_batch_fair_window(self):
+        "Test pull batch of tasks shared among the oldest tasks"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        transaction = Transaction()
+        config.add_section('queue_weight')
+        self.addCleanup(config.remove_section, 'queue_weight')
+        config.set('queue_weight', 'urgent', '3')
+        config.set('queue', 'fair_window', '2')
+        self.addCleanup(config.remove_option, 'queue', 'fair_window')
+
+        bulk1, bulk2, _ = [Queue.push('bulk', {}) for _ in range(3)]
+        Queue.push('urgent', {})
+
+        pulled, _ = Queue.pull_batch(
+            transaction.database, transaction.connection, size=2)
+        self.assertEqual(set(pulled), {(bulk1, 'bulk'), (bulk2, 'bulk')})
+
+    @with_transaction()
+    def test_queue_weights_positive(self):
+        "Test queue weights must be positive"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        config.add_section('queue_weight')
+        self.addCleanup(config.remove_section, 'queue_weight')
+        config.set('queue_weight', 'test', '0')
+
+        with self.assertRaises(ValueError):
+            Queue.weights()
+
+    @with_transaction()
+    def test_queue_coalesce(self):
+        "Test coalescing queued tasks"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        Lang = pool.get('ir.lang')
+        transaction = Transaction()
+
+        lang1, lang2, lang3 = Lang.search([], limit=3)
+        with transaction.set_context(queue_name='test', queue_coalesce=2):
+            (task1,), (task2,), (task3,) = [
+                Lang.__queue__.test_method([lang])
+                for lang in [lang1, lang2, lang3]]
+        with transaction.set_context(queue_name='test'):
+            other, = Lang.__queue__.test_method([lang1])
+
+        with patch.object(Lang, 'test_method', create=True) as method:
+            Queue(task1).run()
+
+        method.assert_called_once_with([lang1, lang2])
+        finished = {
+            t['id']: t['finished_at'] is not None
+            for t in Queue.read(
+                [task1, task2, task3, other], ['finished_at'])}
+        self.assertEqual(finished, {
+                task1: True,
+                task2: True,
+                task3: False,
+                other: False,
+                })
+
+    @with_transaction()
+    def test_queue_warm_up(self):
+        "Test warm up of queue"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        Configuration = pool.get('ir.configuration')
+        Lang = pool.get('ir.lang')
+
+        Lang._code_cache.clear()
+        Queue.warm_up()
+
+        self.assertIsNotNone(
+            Lang._code_cache.get(Configuration.get_language()))
+
+    @with_transaction()
+    def test_queue_warm_up_access(self):
+        "Test warm up of queue fills access and rules of task models"
+        pool = Pool()
+        Queue = pool.get('ir.queue')
+        ModelAccess = pool.get('ir.model.access')
+        Rule = pool.get('ir.rule')
+        transaction = Transaction()
+
+        Queue.push('default', {'model': 'ir.lang', 'user': 1})
+        Queue.push('default', {'model': 'ir.model', 'user': 0})
+        Queue.push('default', {'model': 'unknown', 'user': 1})
+        calls = set()
+
+        def domain_get(model_name, mode='read'):
+            if transaction.check_access:
+                calls.add((transaction.user, model_name, mode))
+            return []
+
+        with patch.object(Rule, 'domain_get', side_effect=domain_get), \
+                patch.object(ModelAccess, 'get_access') as get_access:
+            Queue.warm_up()
+
+        self.assertEqual(
+            calls, {(1, 'ir.lang', mode) for mode in Rule.modes})
+        get_access.assert_called_once_with(['ir.lang'])
+
     @with_transaction()
     def test_ui_view_tree_width_set(self):
         "Test set view tree width"
@@ -75,6 +75,21 @@ class ModelSQLTestCase(TestCase):
                 for r in Model.read(record_ids, ['rec_name'])}
             self.assertEqual(records_read, records_created)
 
+    @with_transaction()
+    def test_read_function_x2many(self):
+        "Test reading many Function x2many fields"
+        pool = Pool()
+        Module = pool.get('ir.module')
+
+        ir, res = Module.search(
+            [('name', 'in', ['ir', 'res'])], order=[('name', 'ASC')])
+
+        values, = Module.read([res.id], ['parents', 'childs'])
+
+        self.assertEqual(values['parents'], (ir.id,))
+        self.assertEqual(
+            set(values['childs']), {m.id for m in res.childs})
+
     @with_transaction()
     def test_read_related_2one(self):
         "Test read with related Many2One"
@@ -537,6 +552,48 @@ class ModelSQLTestCase(TestCase):
                 self.assertEqual(m2.char, "Value 2")
                 self.assertLess(m1.id, m2.id)
 
+    @with_transaction(context={'_create_copy': True})
+    def test_create_copy(self):
+        "Test create many records with copy"
+        pool = Pool()
+        Model = pool.get('test.modelsql.create')
+        database = Transaction().database
+
+        with patch.object(
+                database, 'copy_from', wraps=database.copy_from) as copy_from:
+            foo, bar = Model.create([{
+                        'char': "Foo",
+                        'integer': 2,
+                        }, {
+                        'char': "Bar",
+                        }])
+
+        self.assertEqual(copy_from.called, database.has_copy())
+        self.assertEqual(foo.char, "Foo")
+        self.assertEqual(foo.integer, 2)
+        self.assertEqual(bar.char, "Bar")
+        self.assertEqual(bar.integer, None)
+        self.assertTrue(foo.create_date)
+        self.assertEqual(foo.create_date, bar.create_date)
+
+    @with_transaction(context={'_create_copy': True})
+    def test_create_copy_context(self):
+        "Test create with copy does not propagate the context"
+        pool = Pool()
+        Model = pool.get('test.modelsql.create')
+        contexts = []
+
+        def after_create(ids):
+            contexts.append(Transaction().context)
+            return ids
+
+        with patch.object(Model, '_after_create', side_effect=after_create):
+            Model.create([{'char': "Foo"}])
+
+        context, = contexts
+        self.assertNotIn('_create_copy', context)
+        self.assertIn('_create_copy', Transaction().context)
+
     @with_transaction()
     def test_create_field_set(self):
         'Test field.set in create'
@@ -1318,6 +1375,35 @@ class ModelSQLTestCase(TestCase):
         self.assertEqual(Model.search([], offset=5, count=True), 5)
         self.assertEqual(Model.search([], offset=20, count=True), 0)
 
+    @with_transaction()
+    def test_search_iter(self):
+        "Test search iter"
+        pool = Pool()
+        Model = pool.get('test.modelsql.search')
+
+        records = Model.create([{'name': str(i)} for i in range(10)])
+
+        result = Model.search_iter(
+            [('name', '!=', '5')], order=[('name', 'DESC')], size=3)
+
+        self.assertEqual(
+            list(result),
+            [r for r in records[::-1] if r.name != '5'])
+
+    @with_transaction()
+    def test_read_iter(self):
+        "Test read iter"
+        pool = Pool()
+        Model = pool.get('test.modelsql.search')
+
+        Model.create([{'name': str(i)} for i in range(10)])
+
+        result = Model.read_iter(
+            [], ['name'], order=[('name', 'ASC')], size=4)
+
+        self.assertEqual(
+            [r['name'] for r in result], [str(i) for i in range(10)])
+
     @with_transaction()
     def test_search_limit_predictable_order(self):
         "Test searching with LIMIT is using a predictable order"
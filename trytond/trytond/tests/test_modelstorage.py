@@ -1,13 +1,16 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of this
 # repository contains the full copyright notices and license terms.
 
+import datetime as dt
 import warnings
+from decimal import Decimal
 from unittest.mock import patch
 
 from trytond.model import BrowseList, EvalEnvironment
 from trytond.model.exceptions import (
     AccessError, DomainValidationError, RequiredValidationError)
-from trytond.model.modelstorage import _UnsavedRecordError
+from trytond.model.modelstorage import (
+    _UnsavedRecordError, _memory_domain, _memory_eval_domain)
 from trytond.pool import Pool
 from trytond.tests.test_tryton import (
     TestCase, activate_module, with_transaction)
@@ -64,6 +67,39 @@ class ModelStorageTestCase(TestCase):
             [r.name for r in reversed_records],
             [r.name for r in new_reversed_records])
 
+    @with_transaction()
+    def test_record_cache_memory(self):
+        "Test record cache memory limit"
+        pool = Pool()
+        ModelStorage = pool.get('test.modelstorage')
+        ModelStorage.create([{'name': 'x' * 1000} for i in range(10)])
+
+        with Transaction().set_context(_record_cache_memory=2500):
+            records = ModelStorage.search([])
+            for record in records:
+                self.assertEqual(record.name, 'x' * 1000)
+
+            self.assertLessEqual(len(records._local_cache), 2)
+            self.assertLessEqual(records._local_cache.memory, 2500)
+
+    @with_transaction()
+    def test_record_cache_memory_transaction(self):
+        "Test record cache memory limit shared by the transaction"
+        pool = Pool()
+        ModelStorage = pool.get('test.modelstorage')
+        ModelStorageRequired = pool.get('test.modelstorage.required')
+        ModelStorage.create([{'name': 'x' * 1000} for i in range(10)])
+        ModelStorageRequired.create([{'name': 'x' * 1000} for i in range(10)])
+
+        transaction = Transaction()
+        with transaction.set_context(_record_cache_memory=5000):
+            records = ModelStorage.search([])
+            records_required = ModelStorageRequired.search([])
+            for record in records + records_required:
+                self.assertEqual(record.name, 'x' * 1000)
+
+            self.assertLessEqual(transaction._record_memory.memory, 5000)
+
     @with_transaction()
     def test_search_count(self):
         "Test search_count"
@@ -603,6 +639,106 @@ class ModelStorageTestCase(TestCase):
         with self.assertRaises(DomainValidationError):
             Model.create([{'domain_not_required': 0}])
 
+    @with_transaction()
+    def test_domain_in_memory(self):
+        "Test domain evaluated in memory"
+        pool = Pool()
+        Model = pool.get('test.modelstorage.domain_minimum')
+
+        Model.create([
+                {'minimum': 1, 'value': 2},
+                {'minimum': 2, 'value': 2},
+                {'minimum': 2, 'value': -1},
+                {'minimum': None, 'value': -2},
+                {'minimum': 3, 'value': None},
+                ])
+
+    @with_transaction()
+    def test_domain_in_memory_invalid(self):
+        "Test invalid domain evaluated in memory"
+        pool = Pool()
+        Model = pool.get('test.modelstorage.domain_minimum')
+
+        for values in [
+                {'minimum': 2, 'value': 1},
+                {'minimum': None, 'value': 1},
+                ]:
+            with self.subTest(values=values):
+                with self.assertRaises(DomainValidationError) as cm:
+                    Model.create([{'minimum': 1, 'value': 1}, values])
+                self.assertTrue(cm.exception.domain[1]['value'])
+
+    @with_transaction()
+    def test_domain_in_memory_unsupported(self):
+        "Test domains not evaluated in memory"
+        pool = Pool()
+        Model = pool.get('test.modelstorage.domain_minimum')
+        Numeric = pool.get('test.numeric')
+        Float = pool.get('test.float')
+        Date = pool.get('test.date')
+
+        for domain, Model, result in [
+                ([('value', 'in', [1])], Model, True),
+                ([('value', 'in', [])], Model, False),
+                ([('value', 'not in', [])], Model, False),
+                ([('value', '=', None)], Model, True),
+                ([('numeric', '=', Decimal('0.1'))], Numeric, True),
+                ([('numeric', '=', 0.1)], Numeric, False),
+                ([('numeric', 'in', [Decimal(1), 0.1])], Numeric, False),
+                ([('float', '=', 0.1)], Float, True),
+                ([('float', '=', Decimal('0.1'))], Float, False),
+                ([('date', '=', dt.date(2024, 1, 1))], Date, True),
+                ([('date', '=', '2024-01-01')], Date, False),
+                ([('date', '=', dt.datetime(2024, 1, 1))], Date, False),
+                ([('id', '=', '1')], Model, False),
+                ]:
+            with self.subTest(domain=domain):
+                self.assertEqual(_memory_domain(domain, Model), result)
+
+    @with_transaction()
+    def test_domain_in_memory_microsecond(self):
+        "Test domain evaluated in memory ignores stripped microseconds"
+        pool = Pool()
+        DateTime = pool.get('test.datetime')
+        Time = pool.get('test.time')
+
+        for Model, name, value in [
+                (DateTime, 'datetime', dt.datetime(2024, 1, 1, 12, 0, 0, 5)),
+                (Time, 'time', dt.time(12, 0, 0, 5)),
+                ]:
+            with self.subTest(Model=Model):
+                record, = Model.create([{name: value}])
+                domain = [(name, '=', value)]
+
+                self.assertTrue(_memory_domain(domain, Model))
+                self.assertEqual(
+                    _memory_eval_domain(domain, record),
+                    bool(Model.search([('id', '=', record.id)] + domain)))
+
+    @with_transaction()
+    def test_relation_pyson_domain_mixed(self):
+        "Test relation with different PYSON domains"
+        pool = Pool()
+        Model = pool.get('test.modelstorage.relation_domain')
+        Target = pool.get('test.modelstorage.relation_domain.target')
+
+        valid, invalid = Target.create([{'value': 'valid'}, {'value': 'foo'}])
+
+        Model.create([
+                {'relation_pyson': valid.id, 'relation_valid': True},
+                {'relation_pyson': valid.id, 'relation_valid': True},
+                {'relation_pyson': invalid.id, 'relation_valid': False},
+                {'relation_pyson': invalid.id, 'relation_valid': False},
+                ])
+
+        with self.assertRaises(DomainValidationError):
+            Model.create([
+                    {'relation_pyson': valid.id, 'relation_valid': True},
+                    {'relation_pyson': valid.id, 'relation_valid': True},
+                    {'relation_pyson': invalid.id, 'relation_valid': False},
+                    {'relation_pyson': valid.id, 'relation_valid': False},
+                    ])
+
     @with_transaction()
     def test_check_xml_record_without_record(self):
         "Test check_xml_record without record"
@@ -1079,6 +1215,51 @@ class BrowseListTestCase(TestCase):
         self.assertEqual(blist, [Model(1), Model(2), Model(3)])
         self.assertEqual(blist.ids, [1, 2, 3])
 
+    @with_transaction()
+    def test_prefetch(self):
+        "Test prefetch"
+        pool = Pool()
+        Model = pool.get('test.many2one_tree')
+
+        parent = None
+        for i in range(10):
+            parent, = Model.create([{
+                        'many2one': parent.id if parent else None,
+                        }])
+        records = Model.search([('many2one.many2one', '!=', None)])
+
+        blist = BrowseList(Model, records.ids).prefetch(
+            'many2one.many2one.many2one')
+        with patch.object(Model, 'read') as read:
+            for record in blist:
+                self.assertEqual(
+                    record.many2one.many2one.id, record.id - 2)
+                record.many2one.many2one.many2one
+
+            read.assert_not_called()
+
+    @with_transaction()
+    def test_prefetch_x2many(self):
+        "Test prefetch with x2many"
+        pool = Pool()
+        Model = pool.get('test.one2many')
+        Target = pool.get('test.one2many.target')
+
+        records = Model.create([{
+                    'targets': [('create', [{'name': str(i)}])],
+                    } for i in range(5)])
+
+        blist = BrowseList(Model, [r.id for r in records]).prefetch(
+            'targets.name')
+        with patch.object(Model, 'read') as read, \
+                patch.object(Target, 'read') as target_read:
+            self.assertEqual(
+                [t.name for r in blist for t in r.targets],
+                [str(i) for i in range(5)])
+
+            read.assert_not_called()
+            target_read.assert_not_called()
+
 
 class EvalEnvironmentTestCase(TestCase):
     "Test EvalEnvironment"
@@ -978,6 +978,57 @@ class PYSONTestCase(TestCase):
 
         self.assertEqual(pyson.PYSONDecoder(ctx).decode(eval), 1)
 
+    def test_compile(self):
+        "Test PYSONDecoder.compile"
+        encoder = pyson.PYSONEncoder()
+
+        for instance in [
+                pyson.Eval('test', 0),
+                pyson.Eval('foo.bar', 0),
+                pyson.Eval('test', []),
+                pyson.Not(pyson.Eval('test', True)),
+                pyson.And(pyson.Eval('test', False), True),
+                pyson.Or(pyson.Eval('test', False), False),
+                pyson.If(pyson.Eval('test', False), ['foo'], {'foo': 'bar'}),
+                pyson.Get(pyson.Eval('foo', {}), 'bar', 'default'),
+                pyson.In('foo', pyson.Eval('test', [])),
+                pyson.Len(pyson.Eval('test', [])),
+                pyson.Date(delta_days=pyson.Eval('test', 0)),
+                pyson.TimeDelta(pyson.Eval('test', 0)),
+                [('company', '=', pyson.Eval('test', -1)), ('foo', 'in', [1])],
+                {'company': pyson.Eval('test'), 'foo': {'bar': [1]}},
+                ['foo', {'bar': 1}],
+                'foo',
+                ]:
+            source = encoder.encode(instance)
+            for ctx in [
+                    {},
+                    {'test': 1},
+                    {'test': [1, 'foo']},
+                    {'foo': {'bar': 1}},
+                    ]:
+                with self.subTest(instance=instance, context=ctx):
+                    try:
+                        result = pyson.PYSONDecoder(ctx).decode(source)
+                    except Exception as exception:
+                        with self.assertRaises(type(exception)):
+                            pyson.PYSONDecoder.compile(source)(ctx)
+                    else:
+                        self.assertEqual(
+                            pyson.PYSONDecoder.compile(source)(ctx), result)
+
+    def test_compile_new_instance(self):
+        "Test PYSONDecoder.compile returns new instances"
+        source = pyson.PYSONEncoder().encode(
+            [('company', '=', pyson.Eval('test', -1)), ('foo', 'in', [1])])
+        func = pyson.PYSONDecoder.compile(source)
+
+        result = func({})
+        result[1][2].append(2)
+        result.append('bar')
+
+        self.assertEqual(func({}), [['company', '=', -1], ['foo', 'in', [1]]])
+
     def test_eval_true(self):
         "Test PYSON.eval JS true"
         self.assertEqual(eval('true', pyson.CONTEXT), True)
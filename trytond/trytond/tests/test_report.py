@@ -2,6 +2,7 @@
 # this repository contains the full copyright notices and license terms.
 import datetime
 import json
+import subprocess
 import unittest
 from email.message import EmailMessage
 from unittest.mock import Mock, patch
@@ -11,8 +12,10 @@ try:
 except ImportError:
     mrml = None
 
+from trytond import config
 from trytond.model.exceptions import AccessError
 from trytond.pool import Pool
+from trytond.report.converter import CommandConverter, OfficeConverter
 from trytond.report.report import Report, get_email
 from trytond.tests.test_tryton import (
     TestCase, activate_module, with_transaction)
@@ -230,6 +233,104 @@ class ReportTestCase(TestCase):
         self.assertEqual(msg.get_content_subtype(), 'pdf')
 
 
+class ConverterTestCase(unittest.TestCase):
+    "Test Converter"
+
+    def set_convert_command(self, command):
+        config.set('report', 'convert_command', command)
+        self.addCleanup(config.remove_option, 'report', 'convert_command')
+
+    def test_command_convert(self):
+        "Test command convert"
+        self.set_convert_command('cp "%(input_path)s" "%(output_path)s"')
+        converter = CommandConverter()
+
+        result = converter.convert(
+            'test.report', b'data', 'odt', 'pdf', 'odt', 'pdf')
+
+        self.assertEqual(result, b'data')
+
+    def test_command_convert_str(self):
+        "Test command convert string"
+        self.set_convert_command('cp "%(input_path)s" "%(output_path)s"')
+        converter = CommandConverter()
+
+        result = converter.convert(
+            'test.report', 'data', 'txt', 'html', 'txt', 'html')
+
+        self.assertEqual(result, b'data')
+
+    def test_command_convert_fail(self):
+        "Test command convert failure"
+        self.set_convert_command('false')
+        converter = CommandConverter()
+
+        with self.assertLogs('trytond.report.converter', 'ERROR'):
+            result = converter.convert(
+                'test.report', b'data', 'odt', 'pdf', 'odt', 'pdf',
+                retry=1)
+
+        self.assertIsNone(result)
+
+    def test_office_convert_fallback(self):
+        "Test office convert falls back to command without filter"
+        self.set_convert_command('cp "%(input_path)s" "%(output_path)s"')
+        converter = OfficeConverter()
+        self.addCleanup(converter.stop)
+
+        result = converter.convert(
+            'test.report', b'data', 'odt', 'foo', 'odt', 'foo')
+
+        self.assertEqual(result, b'data')
+        self.assertFalse(converter._processes)
+
+    def test_office_convert_timeout(self):
+        "Test office convert does not retry after a timeout"
+        converter = OfficeConverter()
+        self.addCleanup(converter.stop)
+
+        with patch('trytond.report.converter._uno', return_value=Mock()), \
+                patch('trytond.report.converter.OfficeProcess') \
+                as OfficeProcess:
+            process = OfficeProcess.return_value
+            process.convert.side_effect = subprocess.TimeoutExpired('', 1)
+
+            with self.assertRaises(subprocess.TimeoutExpired):
+                converter.convert(
+                    'test.report', b'data', 'odt', 'pdf', 'odt', 'pdf',
+                    timeout=1)
+
+        process.convert.assert_called_once()
+        process.stop.assert_called_once_with()
+
+    def test_report_convert(self):
+        "Test report convert uses the converter"
+        report = Mock(
+            report_name='test.report', template_extension='odt',
+            extension='pdf')
+
+        with patch('trytond.report.report.converter') as converter:
+            converter.convert.return_value = b'converted'
+            result = Report.convert(report, b'data')
+
+        self.assertEqual(result, ('pdf', b'converted'))
+        converter.convert.assert_called_once_with(
+            'test.report', b'data', 'odt', 'pdf', 'odt', 'pdf',
+            timeout=5 * 60, retry=5)
+
+    def test_report_convert_fail(self):
+        "Test report convert returns the input when the converter fails"
+        report = Mock(
+            report_name='test.report', template_extension='odt',
+            extension='pdf')
+
+        with patch('trytond.report.report.converter') as converter:
+            converter.convert.return_value = None
+            result = Report.convert(report, b'data')
+
+        self.assertEqual(result, ('odt', b'data'))
+
+
 def create_test_format_timedelta(i, in_, out):
     @with_transaction()
     def test(self):
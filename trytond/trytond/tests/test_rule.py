@@ -7,6 +7,7 @@ from trytond.model.exceptions import AccessError
 from trytond.pool import Pool
 from trytond.tests.test_tryton import (
     TestCase, activate_module, with_transaction)
+from trytond.transaction import Transaction
 
 _context = {'_check_access': True}
 
@@ -384,6 +385,136 @@ class ModelRuleTestCase(TestCase):
 
         self.assertListEqual(TestRule.search([]), [])
 
+    @with_transaction(context=_context)
+    def test_sql_get(self):
+        "Test domain SQL is cached"
+        pool = Pool()
+        Rule = pool.get('ir.rule')
+        TestRule = pool.get('test.rule')
+        domain = (('field', '!=', 'foo'),)
+
+        table, expression = Rule.sql_get(TestRule.__name__, domain)
+        other_table, _ = Rule.sql_get(
+            TestRule.__name__, (('field', '=', 'bar'),))
+
+        self.assertIs(
+            Rule.sql_get(TestRule.__name__, domain)[1], expression)
+        self.assertIs(other_table, table)
+
+    @with_transaction(context=_context)
+    def test_sql_get_not_cachable(self):
+        "Test domain SQL is not cached for related domain"
+        pool = Pool()
+        Rule = pool.get('ir.rule')
+        TestRule = pool.get('test.rule')
+
+        self.assertIsNone(Rule.sql_get(
+                TestRule.__name__, (('relation.field', '=', 'foo'),)))
+        self.assertIsNone(Rule.sql_get(
+                TestRule.__name__, (('relation', 'child_of', [1]),)))
+        self.assertIsNone(Rule.sql_get(
+                TestRule.__name__,
+                (('relation', 'where', [('field', '=', 'foo')]),)))
+
+    @with_transaction(context=_context)
+    def test_search_with_rule_where_users(self):
+        "Test search with where rule for users with different target rules"
+        pool = Pool()
+        TestRule = pool.get('test.rule')
+        TestRuleRelation = pool.get('test.rule.relation')
+        Rule = pool.get('ir.rule')
+        RuleGroup = pool.get('ir.rule.group')
+        Group = pool.get('res.group')
+        User = pool.get('res.user')
+        transaction = Transaction()
+
+        group1, group2 = Group.create([{'name': "1"}, {'name': "2"}])
+        user1, user2 = User.create([{
+                    'name': "User 1",
+                    'login': 'user1',
+                    'groups': [('add', [group1.id])],
+                    }, {
+                    'name': "User 2",
+                    'login': 'user2',
+                    'groups': [('add', [group2.id])],
+                    }])
+        foo, bar = TestRuleRelation.create([
+                {'field': 'foo'}, {'field': 'bar'}])
+        TestRule.create([{'relation': foo.id}, {'relation': bar.id}])
+        RuleGroup.create([{
+                    'name': "Relation visible",
+                    'model': TestRule.__name__,
+                    'global_p': True,
+                    'perm_read': True,
+                    'rules': [('create', [{
+                                    'domain': json.dumps([
+                                            ('relation', 'where',
+                                                [('field', '!=', None)]),
+                                            ]),
+                                    }])],
+                    }])
+        for value, group in [('foo', group1), ('bar', group2)]:
+            RuleGroup.create([{
+                        'name': "Relation %s" % value,
+                        'model': TestRuleRelation.__name__,
+                        'global_p': False,
+                        'perm_read': True,
+                        'groups': [('add', [group.id])],
+                        'rules': [('create', [{
+                                        'domain': json.dumps(
+                                            [('field', '=', value)]),
+                                        }])],
+                        }])
+
+        result = {}
+        for user in [user1, user2]:
+            Rule._domain_sql_cache.clear()
+            with transaction.set_user(user.id):
+                result[user] = TestRule.search([])
+
+        for user in [user1, user2]:
+            with transaction.set_user(user.id):
+                self.assertEqual(TestRule.search([]), result[user])
+
+    @with_transaction(context=_context)
+    def test_write_field_with_read_rule(self):
+        "Test _write field with read and write rules"
+        pool = Pool()
+        TestRule = pool.get('test.rule')
+        RuleGroup = pool.get('ir.rule.group')
+
+        RuleGroup.create([{
+                    'name': "Field different from foo",
+                    'model': TestRule.__name__,
+                    'global_p': True,
+                    'perm_read': True,
+                    'perm_create': False,
+                    'perm_write': False,
+                    'perm_delete': False,
+                    'rules': [('create', [{
+                                    'domain': json.dumps(
+                                        [('field', '!=', 'foo')]),
+                                    }])],
+                    }, {
+                    'name': "Field different from bar",
+                    'model': TestRule.__name__,
+                    'global_p': True,
+                    'perm_read': False,
+                    'perm_create': False,
+                    'perm_write': True,
+                    'perm_delete': False,
+                    'rules': [('create', [{
+                                    'domain': json.dumps(
+                                        [('field', '!=', 'bar')]),
+                                    }])],
+                    }])
+        bar, baz = TestRule.create([{'field': 'bar'}, {'field': 'baz'}])
+
+        values = TestRule.read([bar.id, baz.id], ['_write'])
+        self.assertEqual(
+            {v['id']: v['_write'] for v in values},
+            {bar.id: False, baz.id: True})
+
     @with_transaction(context=_context)
     def test_write_field_no_rule(self):
         "Test _write field when there's no rule"
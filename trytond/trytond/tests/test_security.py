@@ -1,5 +1,7 @@
 # This file is part of Tryton.  The COPYRIGHT file at the top level of this
 # repository contains the full copyright notices and license terms.
+import datetime as dt
+from unittest.mock import patch
 
 from trytond import security
 from trytond.pool import Pool
@@ -47,6 +49,69 @@ class SecurityTestCase(RouteTestCase):
         authenticated_user_id = security.check(self.db_name, user_id, key)
         self.assertEqual(authenticated_user_id, user_id)
 
+    def _enable_check_cache(self):
+        Session = Pool(self.db_name).get('ir.session')
+        patcher = patch.object(
+            Session._session_check_cache, 'duration',
+            dt.timedelta(seconds=30))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_security_check_cached(self):
+        "Test security.check with a verified session"
+        pool = Pool(self.db_name)
+        Session = pool.get('ir.session')
+        self._enable_check_cache()
+        user_id, key = self._get_auth()
+        security.check(self.db_name, user_id, key)
+
+        with patch.object(Transaction, 'start') as start:
+            authenticated_user_id = security.check(
+                self.db_name, user_id, key)
+
+        start.assert_not_called()
+        self.assertEqual(authenticated_user_id, user_id)
+        self.assertTrue(
+            Session.check_cached(self.db_name, user_id, key))
+
+    def test_security_check_cached_logout(self):
+        "Test security.check with a verified session after logout"
+        pool = Pool(self.db_name)
+        Session = pool.get('ir.session')
+        self._enable_check_cache()
+        user_id, key = self._get_auth()
+        security.check(self.db_name, user_id, key)
+
+        security.logout(self.db_name, user_id, key)
+
+        self.assertFalse(
+            Session.check_cached(self.db_name, user_id, key))
+        self.assertIsNone(security.check(self.db_name, user_id, key))
+
+    def test_security_check_cached_delete(self):
+        "Test verified session is not trusted once deleted"
+        pool = Pool(self.db_name)
+        Session = pool.get('ir.session')
+        self._enable_check_cache()
+        user_id, key = self._get_auth()
+        security.check(self.db_name, user_id, key)
+
+        with Transaction().start(self.db_name, 0):
+            Session.delete(Session.search([('key', '=', key)]))
+
+            self.assertFalse(
+                Session.check_cached(self.db_name, user_id, key))
+
+    def test_security_check_not_cached(self):
+        "Test security.check without check cache"
+        pool = Pool(self.db_name)
+        Session = pool.get('ir.session')
+        user_id, key = self._get_auth()
+        security.check(self.db_name, user_id, key)
+
+        self.assertFalse(
+            Session.check_cached(self.db_name, user_id, key))
+
     def test_security_check_invalid(self):
         "Test security.check with an invalid session"
         user_id, _ = self._get_auth()
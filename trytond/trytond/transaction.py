@@ -54,6 +54,19 @@ def record_cache_size(transaction):
         '_record_cache_size', config.getint('cache', 'record'))
 
 
+def record_cache_memory(transaction):
+    from trytond.cache import MemoryBudget
+    limit = transaction.context.get(
+        '_record_cache_memory', config.getint('cache', 'record_memory'))
+    if not limit:
+        return None
+    if transaction._record_memory is None:
+        transaction._record_memory = MemoryBudget(limit)
+    else:
+        transaction._record_memory.limit = limit
+    return transaction._record_memory
+
+
 def check_access(func=None, *, _access=True):
     if func:
         @wraps(func)
@@ -136,6 +149,7 @@ class Transaction(object):
             instance.timestamp = None
             instance.started_at = None
             instance.cache = WeakValueDictionary()
+            instance._record_memory = None
             instance._cache_deque = deque(
                 maxlen=config.getint('cache', 'transaction'))
             instance._atexit = []
@@ -167,7 +181,8 @@ class Transaction(object):
                 cache_model,
                 lambda name: LRUDict(
                     record_cache_size(self),
-                    Pool().get(name)._record),
+                    Pool().get(name)._record,
+                    memory_budget=record_cache_memory(self)),
                 default_factory_with_key=True))
         # Keep last used cache references to allow to pre-fill them
         self._cache_deque.append(cache)
@@ -205,9 +220,12 @@ class Transaction(object):
             self.timestamp = {}
             self.counter = 0
             self._datamanagers = []
+            self._record_memory = None
 
             self.connection = database.get_connection(readonly=readonly,
                 autocommit=autocommit, statement_timeout=timeout)
+            if snapshot := extras.get('_snapshot'):
+                database.import_snapshot(self.connection, snapshot)
             count = 0
             retry = config.getint('database', 'retry')
             while True:
@@ -271,6 +289,7 @@ class Transaction(object):
                     self.user_notifications = None
                     self.timestamp = None
                     self._datamanagers = []
+                    self._record_memory = None
 
                 for func, args, kwargs in self._atexit:
                     func(*args, **kwargs)
@@ -394,6 +413,7 @@ class Transaction(object):
             self.rollback()
             raise
         else:
+            Cache.committed(self)
             try:
                 for datamanager in self._datamanagers:
                     datamanager.tpc_finish(self)
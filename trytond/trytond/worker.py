@@ -7,6 +7,7 @@ import selectors
 import signal
 import sys
 import time
+from collections import Counter
 from concurrent import futures
 from multiprocessing import cpu_count
 
@@ -17,10 +18,29 @@ import trytond.config as config
 from trytond.exceptions import UserError, UserWarning
 from trytond.pool import Pool
 from trytond.status import processing
+from trytond.status import start as status_start
 from trytond.transaction import Transaction, TransactionError
 
 __all__ = ['work']
 logger = logging.getLogger(__name__)
+_counters = Counter()
+_started = None
+
+
+def stats():
+    "Return the throughput counters of the worker"
+    if _started is None:
+        return {}
+    elapsed = time.monotonic() - _started
+    timed = _counters['timed']
+    return {
+        'pulls': _counters['pulls'],
+        'pulled': _counters['pulled'],
+        'processed': _counters['processed'],
+        'throughput': _counters['processed'] / elapsed if elapsed else 0,
+        'setup': _counters['setup'] / timed if timed else 0,
+        'duration': _counters['duration'] / timed if timed else 0,
+        }
 
 
 class Queue(object):
@@ -30,34 +50,64 @@ class Queue(object):
         self.connection = self.database.get_connection(autocommit=True)
         self.executor = executor
 
-    def pull(self, name=None):
+    def pull(self, name=None, size=1, running=None):
         database_list = Pool.database_list()
         pool = Pool(self.database.name)
         if self.database.name not in database_list:
             with Transaction().start(self.database.name, 0, readonly=True):
                 pool.init()
         Queue = pool.get('ir.queue')
-        return Queue.pull(self.database, self.connection, name=name)
+        tasks, next_ = Queue.pull_batch(
+            self.database, self.connection, name=name, size=size,
+            running=running)
+        _counters['pulls'] += 1
+        _counters['pulled'] += len(tasks)
+        return tasks, next_
 
     def run(self, task_id):
-        return self.executor.submit(run_task, self.database.name, task_id)
+        future = self.executor.submit(run_task, self.database.name, task_id)
+        future.add_done_callback(_processed)
+        return future
 
     def get_notifications(self):
         return self.database.get_notifications(self.connection)
 
 
 class TaskList(list):
+    def __init__(self):
+        super().__init__()
+        self.names = {}
+
+    def add(self, task, name):
+        self.append(task)
+        self.names[task] = name
+
     def filter(self):
         for t in list(self):
-            if not t.running():
+            if t.done():
                 self.remove(t)
+                self.names.pop(t, None)
         return self
 
+    def running(self):
+        "Return the number of tasks per queue name"
+        return Counter(self.names.values())
+
 
 def _noop():
     pass
 
 
+def _processed(future):
+    _counters['processed'] += 1
+    if not future.cancelled() and not future.exception():
+        if timing := future.result():
+            setup, duration = timing
+            _counters['timed'] += 1
+            _counters['setup'] += setup
+            _counters['duration'] += duration
+
+
 def work(options):
     from trytond import backend
     Flavor.set(backend.Database.flavor)
@@ -78,6 +128,11 @@ def work(options):
     if sys.version_info < (3, 11):
         del executor_options["max_tasks_per_child"]
 
+    global _started
+    _started = time.monotonic()
+    status_start()
+    prefetch = config.getint('queue', 'prefetch', default=0)
+
     with \
             futures.ProcessPoolExecutor(**executor_options) as executor, \
             selectors.DefaultSelector() as selector:
@@ -88,28 +143,41 @@ def work(options):
             selector.register(
                 queue.connection, selectors.EVENT_READ, data=queue)
 
+        pulled = False
         while True:
             timeout = options.timeout
-            # Add some randomness to avoid concurrent pulling
-            time.sleep(0.1 * random.random())
-            while len(tasks.filter()) >= processes:
+            if not pulled:
+                # Add some randomness to avoid concurrent pulling
+                time.sleep(0.1 * random.random())
+            while len(tasks.filter()) >= processes + prefetch:
                 futures.wait(tasks, return_when=futures.FIRST_COMPLETED)
 
             # Probe process pool is still operative
-            # before pulling a new task
+            # before pulling new tasks
             executor.submit(_noop).result()
 
+            pulled = False
             for queue in queues:
                 try:
-                    task_id, next_ = queue.pull(options.name)
+                    pulled_tasks, next_ = queue.pull(
+                        options.name, size=processes + prefetch - len(tasks),
+                        running=tasks.running())
                 except backend.DatabaseOperationalError:
                     break
                 if next_ is not None:
                     timeout = min(next_, timeout)
-                if task_id:
-                    tasks.append(queue.run(task_id))
+                if pulled_tasks:
+                    for task_id, name in pulled_tasks:
+                        tasks.add(queue.run(task_id), name)
+                    # Start with the next database on the next loop
+                    queues.remove(queue)
+                    queues.append(queue)
+                    pulled = True
                     break
             else:
+                if tasks:
+                    # Pull again soon as the limits may have been reached
+                    timeout = min(timeout, 1)
                 for key, _ in selector.select(timeout=timeout):
                     queue = key.data
                     queue.get_notifications()
@@ -128,10 +196,18 @@ def initializer(options, worker=True):
         if database_name not in database_list:
             with Transaction().start(database_name, 0, readonly=True):
                 pool.init()
+        if worker:
+            warm_up(pool)
         pools.append(pool)
     return pools
 
 
+def warm_up(pool):
+    "Prepare the process to run the tasks of the pool"
+    with Transaction().start(pool.database_name, 0, readonly=True):
+        pool.get('ir.queue').warm_up()
+
+
 def run_task(pool, task_id):
     from trytond import backend
     if not isinstance(pool, Pool):
@@ -148,6 +224,7 @@ def run_task(pool, task_id):
     started = time.monotonic()
     name = '<Task %s@%s>' % (task_id, pool.database_name)
     retry = config.getint('database', 'retry')
+    setup = 0
     try:
         count = 0
         transaction_extras = {
@@ -167,6 +244,7 @@ def run_task(pool, task_id):
                     except ValueError:
                         # the task was rollbacked, nothing to do
                         break
+                    setup = duration()
                     with processing(name):
                         task.run()
                     break
@@ -184,7 +262,9 @@ def run_task(pool, task_id):
                 except (UserError, UserWarning) as e:
                     Error.report(task, e)
                     raise
-        logger.info("%s in %i ms", name, duration())
+        logger.info(
+            "%s in %i ms (setup %i ms)", name, duration(), setup)
+        return setup, duration()
     except backend.DatabaseOperationalError:
         logger.info(
             "%s failed after %i ms, retrying", name, duration(),